@@ -0,0 +1,209 @@
+"""
+Archive finished games and purge abandoned ones
+
+A game holds 36 rows (game, 6 categories, 30 questions) for as long as it
+exists. Completed games are collapsed into one ArchivedGame row once they
+are GAME_ARCHIVE_AFTER seconds old; SETUP and PLAYING games untouched for
+GAME_STALE_TTL seconds are deleted outright. Pooled boards are left alone.
+
+Deletes run in batches of GAME_ARCHIVE_BATCH_SIZE games, each in its own
+short transaction with a pause in between, so answer requests are never
+stuck behind one long write lock.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from . import metrics
+from .models import ArchivedGame, Game, Question
+
+logger = logging.getLogger(__name__)
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def database_bytes():
+    """
+    Bytes of the database in use by rows and indexes, or None if unknown.
+
+    SQLite moves the pages freed by a delete onto its freelist, so the
+    difference shows up here straight away (the file itself only shrinks
+    after VACUUM). Other backends only return space through their own
+    vacuuming, so nothing is reported for them.
+    """
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        page_size = cursor.execute('PRAGMA page_size').fetchone()[0]
+        page_count = cursor.execute('PRAGMA page_count').fetchone()[0]
+        freelist = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+    return (page_count - freelist) * page_size
+
+
+def _board_summaries(game_ids) -> dict:
+    """
+    {game_id: board JSON} for ArchivedGame.board, in one query. Question
+    text stays in the shared bank; the summary only references it.
+    """
+    boards = defaultdict(dict)
+    rows = (
+        Question.objects.filter(category__game_id__in=game_ids)
+        .order_by('category__game_id', 'category__order', 'value')
+        .values_list('category__game_id', 'category_id', 'category__title', 'value',
+                     'bank_question_id', 'is_answered', 'player_correct')
+    )
+    for game_id, category_id, title, value, bank_question_id, is_answered, player_correct in rows:
+        category = boards[game_id].setdefault(category_id, {'title': title, 'questions': []})
+        category['questions'].append([value, bank_question_id, player_correct if is_answered else None])
+    return {game_id: list(categories.values()) for game_id, categories in boards.items()}
+
+
+def _archive(game: Game, board: list) -> ArchivedGame:
+    accuracy = game.correct_count / game.question_count * 100 if game.question_count else 0
+    return ArchivedGame(
+        game_id=game.id,
+        created_at=game.created_at,
+        completed_at=game.updated_at,
+        score=game.score,
+        question_count=game.question_count,
+        correct_count=game.correct_count,
+        accuracy=accuracy,
+        board=board,
+    )
+
+
+def _in_batches(queryset, batch_size: int, pause: float, handle) -> tuple:
+    """
+    Repeatedly take the next `batch_size` games from `queryset` and pass
+    them to `handle` inside a fresh transaction. Returns (games, rows deleted).
+    """
+    games_done = rows_deleted = 0
+    while True:
+        with transaction.atomic():
+            games = list(queryset.order_by('id')[:batch_size])
+            if not games:
+                break
+            handle(games)
+            deleted, _ = Game.objects.filter(id__in=[game.id for game in games]).delete()
+
+        games_done += len(games)
+        rows_deleted += deleted
+        if pause:
+            time.sleep(pause)  # Let waiting writers take the lock
+    return games_done, rows_deleted
+
+
+def archive_completed_games(older_than: float = None, batch_size: int = None, pause: float = None) -> tuple:
+    """
+    Replace COMPLETE games finished more than `older_than` seconds ago with
+    ArchivedGame summaries. Returns (games archived, rows deleted).
+    """
+    older_than = getattr(settings, 'GAME_ARCHIVE_AFTER', 3600) if older_than is None else older_than
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+
+    def archive(games):
+        boards = _board_summaries([game.id for game in games])
+        ArchivedGame.objects.bulk_create(
+            [_archive(game, boards.get(game.id, [])) for game in games],
+            ignore_conflicts=True,  # Already archived by an earlier, interrupted run
+        )
+
+    archived, rows = _in_batches(
+        Game.objects.filter(phase='COMPLETE', updated_at__lt=cutoff),
+        _batch_size(batch_size), _pause(pause), archive,
+    )
+    metrics.incr('archival.archived', archived)
+    return archived, rows
+
+
+def purge_stale_games(ttl: float = None, batch_size: int = None, pause: float = None) -> tuple:
+    """
+    Delete SETUP and PLAYING games not touched for `ttl` seconds.
+    Returns (games purged, rows deleted).
+    """
+    ttl = getattr(settings, 'GAME_STALE_TTL', 7 * 24 * 3600) if ttl is None else ttl
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+
+    purged, rows = _in_batches(
+        Game.objects.filter(phase__in=['SETUP', 'PLAYING'], updated_at__lt=cutoff),
+        _batch_size(batch_size), _pause(pause), lambda games: None,
+    )
+    metrics.incr('archival.purged', purged)
+    return purged, rows
+
+
+def compact(archive_after: float = None, stale_ttl: float = None, batch_size: int = None,
+            pause: float = None, vacuum: bool = False) -> dict:
+    """Archive, purge and report what was reclaimed"""
+    start = time.perf_counter()
+    bytes_before = database_bytes()
+
+    archived, archived_rows = archive_completed_games(archive_after, batch_size, pause)
+    purged, purged_rows = purge_stale_games(stale_ttl, batch_size, pause)
+
+    bytes_after = database_bytes()
+    if vacuum and connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+
+    rows_deleted = archived_rows + purged_rows
+    metrics.incr('archival.rows_deleted', rows_deleted)
+    report = {
+        'archived': archived,
+        'purged': purged,
+        'rows_deleted': rows_deleted,
+        # Rows deleted minus the ArchivedGame rows written in their place
+        'rows_reclaimed': rows_deleted - archived,
+        'bytes_reclaimed': bytes_before - bytes_after if bytes_before is not None else None,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+    if archived or purged:
+        logger.info(f"Game compaction: {report}")
+    return report
+
+
+def _batch_size(batch_size):
+    return getattr(settings, 'GAME_ARCHIVE_BATCH_SIZE', 100) if batch_size is None else batch_size
+
+
+def _pause(pause):
+    return getattr(settings, 'GAME_ARCHIVE_PAUSE', 0.05) if pause is None else pause
+
+
+def _run_worker():
+    interval = getattr(settings, 'GAME_ARCHIVE_INTERVAL', 3600)
+
+    while True:
+        try:
+            compact()
+        except Exception as e:
+            logger.exception(f"Game compaction crashed: {e}")
+        finally:
+            close_old_connections()
+
+        time.sleep(interval)
+
+
+def ensure_worker() -> bool:
+    """
+    Start the periodic compaction thread if GAME_ARCHIVE_WORKER is enabled.
+    Safe to call on every request; only one worker runs per process.
+    """
+    global _worker
+
+    if not getattr(settings, 'GAME_ARCHIVE_WORKER', False):
+        return False
+
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name='game-archival', daemon=True)
+            _worker.start()
+    return True
@@ -0,0 +1,184 @@
+"""
+Warm pool of pre-generated boards so /new-game/ never waits on Gemini
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import metrics, question_bank
+from .models import Category, Game, Question
+
+logger = logging.getLogger(__name__)
+
+_worker = None
+_worker_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def target_depth() -> int:
+    """Number of unclaimed boards the pool tries to keep ready"""
+    return getattr(settings, 'BOARD_POOL_DEPTH', 5)
+
+
+def pool_depth() -> int:
+    """Number of unclaimed boards currently in the pool"""
+    return Game.objects.filter(phase='POOLED').count()
+
+
+def claim_board():
+    """
+    Claim an unused pooled board for a new player.
+
+    The claim is a conditional UPDATE so two concurrent requests can never
+    receive the same board. Returns None when the pool is empty.
+    """
+    for _ in range(3):
+        with transaction.atomic():
+            game_id = (
+                Game.objects.filter(phase='POOLED')
+                .order_by('id')
+                .values_list('id', flat=True)
+                .first()
+            )
+            if game_id is None:
+                break
+
+            claimed = Game.objects.filter(id=game_id, phase='POOLED').update(
+                phase='PLAYING',
+                version=F('version') + 1,
+                created_at=timezone.now(),
+                updated_at=timezone.now(),
+            )
+        if claimed:
+            metrics.incr('board_pool.hits')
+            _wake.set()
+            return Game.objects.get(id=game_id)
+
+    metrics.incr('board_pool.misses')
+    _wake.set()
+    return None
+
+
+def refill_pool(depth: int = None, num_categories: int = 6) -> int:
+    """
+    Generate boards until the pool reaches `depth`.
+
+    Boards that fell back to the dummy questions are discarded, and the
+    refill stops at the first failure so an outage doesn't spin.
+    Returns the number of boards added.
+    """
+    from .game_logic import JeopardyGame
+
+    from .gemini_client import breaker
+
+    depth = target_depth() if depth is None else depth
+    added = 0
+
+    if breaker.is_open:
+        logger.info("Board pool refill skipped: Gemini circuit is open")
+        return added
+
+    while pool_depth() < depth:
+        game_logic = JeopardyGame()
+        game = game_logic.create_new_game(num_categories=num_categories, phase='POOLED')
+
+        if game_logic.used_fallback:
+            game.delete()
+            metrics.incr('board_pool.refill_failures')
+            logger.warning("Board pool refill stopped: Gemini generation failed")
+            break
+
+        metrics.incr('board_pool.refills')
+        added += 1
+
+    return added
+
+
+def add_boards(boards: list) -> list:
+    """
+    Write already generated boards into the pool in one transaction, with
+    one bulk insert each for games, categories and questions.
+    Returns the new game ids.
+    """
+    from .game_logic import JeopardyGame
+    
+    all_categories = [cat_data for board in boards for cat_data in board]
+
+    with transaction.atomic():
+        bank_ids = question_bank.store_board(all_categories)
+        games = Game.objects.bulk_create([
+            Game(score=0, phase='POOLED', question_count=sum(len(cat_data['questions']) for cat_data in board))
+            for board in boards
+        ])
+        categories = Category.objects.bulk_create([
+            Category(game=game, title=title, order=idx)
+            for game, board in zip(games, boards)
+            for idx, title in enumerate(JeopardyGame._unique_titles(board))
+        ])
+        Question.objects.bulk_create([
+            Question(
+                category=category,
+                value=q_data['value'],
+                bank_question_id=bank_ids[question_bank.content_hash(q_data['question'], q_data['answer'])]
+            )
+            for category, cat_data in zip(categories, all_categories)
+            for q_data in cat_data['questions']
+        ])
+    metrics.incr('board_pool.bulk_added', len(games))
+    return [game.id for game in games]
+
+
+def _run_worker():
+    interval = getattr(settings, 'BOARD_POOL_REFILL_INTERVAL', 30)
+
+    while True:
+        _wake.clear()
+        try:
+            refill_pool()
+        except Exception as e:
+            logger.exception(f"Board pool refill crashed: {e}")
+        finally:
+            close_old_connections()
+
+        _wake.wait(timeout=interval)
+
+
+def ensure_worker() -> bool:
+    """
+    Start the background refill thread if BOARD_POOL_WORKER is enabled.
+    Safe to call on every request; only one worker runs per process.
+    """
+    global _worker
+
+    if not getattr(settings, 'BOARD_POOL_WORKER', False):
+        return False
+
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name='board-pool-refill', daemon=True)
+            _worker.start()
+    return True
+
+
+def get_stats() -> dict:
+    """Pool depth, refill rate and hit/miss counts"""
+    hits = metrics.get('board_pool.hits')
+    misses = metrics.get('board_pool.misses')
+    claims = hits + misses
+
+    return {
+        'depth': pool_depth(),
+        'target_depth': target_depth(),
+        'worker_running': _worker is not None and _worker.is_alive(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / claims, 3) if claims else None,
+        'refills': metrics.get('board_pool.refills'),
+        'refill_failures': metrics.get('board_pool.refill_failures'),
+        'refills_per_minute': round(metrics.rate_per_minute('board_pool.refills'), 2),
+    }
@@ -0,0 +1,132 @@
+"""
+Circuit breaker for calls to flaky external services (Gemini)
+
+Closed: calls go through and consecutive failures are counted.
+Open: after `failure_threshold` consecutive failures calls are rejected
+immediately with CircuitOpenError, so callers can fall back without
+waiting on timeouts and retry sleeps.
+Half-open: once `reset_timeout` seconds have passed, a single probe call
+is let through; success closes the circuit, failure opens it again.
+"""
+
+import logging
+import threading
+import time
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open"""
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Close the circuit and forget past failures"""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def _refresh(self, now: float):
+        # Caller holds the lock
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_started = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls would be rejected without a probe being due"""
+        return self.state == self.OPEN
+
+    def before_call(self):
+        """
+        Call before each request to the service.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a
+                probe already in flight
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._refresh(now)
+
+            if self._state == self.CLOSED:
+                return
+
+            if self._state == self.HALF_OPEN:
+                # A probe that never reported back (e.g. an abandoned stream)
+                # stops blocking new probes after reset_timeout
+                if self._probe_started is None or now - self._probe_started >= self.reset_timeout:
+                    self._probe_started = now
+                    metrics.incr(f'circuit.{self.name}.probes')
+                    return
+
+            retry_in = self._retry_in(now)
+
+        metrics.incr(f'circuit.{self.name}.rejected')
+        raise CircuitOpenError(f"{self.name} circuit is open; retry in {retry_in:.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"{self.name} circuit closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self):
+        now = time.monotonic()
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    metrics.incr(f'circuit.{self.name}.opened')
+                    logger.warning(
+                        f"{self.name} circuit opened after {self._failures} consecutive failure(s); "
+                        f"failing fast for {self.reset_timeout:.0f}s"
+                    )
+                self._state = self.OPEN
+                self._opened_at = now
+                self._probe_started = None
+
+    def _retry_in(self, now: float) -> float:
+        if self._state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (now - self._opened_at))
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            self._refresh(now)
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'retry_in': round(self._retry_in(now), 1),
+                'times_opened': metrics.get(f'circuit.{self.name}.opened'),
+                'rejected_calls': metrics.get(f'circuit.{self.name}.rejected'),
+                'probes': metrics.get(f'circuit.{self.name}.probes'),
+            }
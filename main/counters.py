@@ -0,0 +1,36 @@
+"""
+Rebuild the denormalized per-game question counters from the Question table
+"""
+
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Game, Question
+
+
+def _count(condition=Q()):
+    subquery = (
+        Question.objects.filter(condition, category__game=OuterRef('pk'))
+        .order_by()
+        .values('category__game')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+
+def rebuild_counters(game_ids=None) -> int:
+    """
+    Recompute question_count, answered_count and correct_count in a single
+    UPDATE, for the games in `game_ids`, or every game if it is None (an
+    empty list rebuilds nothing). Returns the number of games updated.
+    """
+    games = Game.objects.all()
+    if game_ids is not None:
+        games = games.filter(id__in=game_ids)
+
+    return games.update(
+        question_count=_count(),
+        answered_count=_count(Q(is_answered=True)),
+        correct_count=_count(Q(is_answered=True, player_correct=True)),
+    )
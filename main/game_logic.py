@@ -2,10 +2,42 @@
 Core Jeopardy game logic for single-player mode
 """
 
-from .models import Game, Category, Question
-from .gemini_client import ask_gemini
+import asyncio
+import logging
+import random
+import threading
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+from . import metrics, question_bank
+from .pubsub import publish_game_event
+from .json_extract import CategoryStreamParser
+from .models import AnswerEvent, Game, Category, Question
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Prefetch, Subquery
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
+# Broad areas handed to concurrent per-category requests so they don't all
+# come back with the same category
+CATEGORY_THEMES = [
+    "science and nature", "world history", "geography", "literature",
+    "sports", "movies and TV", "music", "food and drink",
+    "words and language", "technology", "art", "animals",
+]
+
+
+def generation_mode() -> str:
+    """'board' (one request for the whole board) or 'per_category' (one request per category)"""
+    return getattr(settings, 'GEMINI_GENERATION_MODE', 'board')
+
+
+def structured_output() -> bool:
+    """Whether generation requests pass a response schema (see main/schemas.py)"""
+    return getattr(settings, 'GEMINI_STRUCTURED_OUTPUT', False)
+
 
 class JeopardyGame:
     """Single-player Jeopardy game engine"""
@@ -16,36 +48,340 @@ class JeopardyGame:
             self.game = Game.objects.get(id=game_id)
         else:
             self.game = None
+        self.used_fallback = False
+        # Set by the generation queue: board writes stop once another worker takes the job over
+        self.lease = None
     
-    def create_new_game(self, num_categories: int = 6) -> Game:
+    def create_new_game(self, num_categories: int = 6, phase: str = 'PLAYING', stream: bool = False) -> Game:
         """
         Create a new Jeopardy game
         - Create game instance
         - Generate categories and questions
         - Set initial score to 0
+        
+        Pass phase='POOLED' to pre-generate a board for the board pool.
+        With stream=True each category is saved as soon as Gemini finishes it,
+        while the game sits in SETUP.
         """
-        # Create game
-        self.game = Game.objects.create(score=0, phase='PLAYING')
+        if stream:
+            self.game = Game.objects.create(score=0, phase='SETUP')
+            self._stream_categories_and_questions(num_categories, phase=phase)
+            return self.game
         
         # Generate categories and questions using Gemini
-        self._generate_categories_and_questions(num_categories)
+        board = self._generate_categories_and_questions(num_categories)
+        
+        # Create game and board in a single transaction
+        self._save_board(board, phase=phase)
         
         return self.game
     
-    def _generate_categories_and_questions(self, num_categories: int):
+    async def acreate_new_game(self, num_categories: int = 6, phase: str = 'PLAYING') -> Game:
         """
-        Use Gemini to generate random Jeopardy categories and questions.
-        Falls back to dummy questions if Gemini fails.
+        Async version of create_new_game for async views.
+        Generation awaits Gemini without holding a thread; only the DB write
+        runs in the sync thread pool.
+        """
+        board = await self._agenerate_categories_and_questions(num_categories)
+        await sync_to_async(self._save_board)(board, phase=phase)
+        return self.game
+    
+    def start_streamed_game(self, num_categories: int = 6) -> Game:
+        """
+        Create a game in SETUP and stream its board in a background thread.
+        Returns right away; categories appear in get_board_state as they land
+        and the game moves to PLAYING once the board is full.
+        """
+        self.game = Game.objects.create(score=0, phase='SETUP')
+        self.stream_thread = threading.Thread(
+            target=self._stream_in_background,
+            args=(num_categories,),
+            name=f'stream-game-{self.game.id}',
+            daemon=True
+        )
+        self.stream_thread.start()
+        return self.game
+    
+    def _stream_in_background(self, num_categories: int):
+        try:
+            self._stream_categories_and_questions(num_categories)
+        except Exception as e:
+            logger.exception(f"Streaming generation crashed for game {self.game.id}: {e}")
+        finally:
+            connection.close()
+    
+    def _stream_categories_and_questions(self, num_categories: int, phase: str = 'PLAYING') -> bool:
+        """
+        Stream a board from Gemini, saving each category the moment it is
+        complete. Slots that never arrive (or arrive invalid) are backfilled
+        with placeholder categories, then the game moves to `phase`. Returns
+        False, stopping early, if the game leaves SETUP (see _setup_game).
+        """
+        from .gemini_client import stream_gemini
+        
+        parser = CategoryStreamParser()
+        titles = []
+        
+        try:
+            for chunk in stream_gemini(self._board_prompt(num_categories)):
+                for cat_data in parser.feed(chunk):
+                    if len(titles) >= num_categories:
+                        break
+                    try:
+                        category = self._validate_category(cat_data, len(titles))
+                    except ValueError as e:
+                        logger.warning(f"Skipping streamed category: {e}")
+                        continue
+                    category['title'] = self._unique_title(category['title'], titles)
+                    if self._save_category(category, order=len(titles)) is None:
+                        return False
+                    titles.append(category['title'])
+                
+                if len(titles) >= num_categories or parser.done:
+                    break
+        except Exception as e:
+            logger.warning(f"Gemini streaming failed after {len(titles)} categories: {e}")
+        
+        missing = num_categories - len(titles)
+        if missing:
+            self.used_fallback = not titles
+            for category in self._placeholder_spares(titles, num_categories)[:missing]:
+                if self._save_category(category, order=len(titles)) is None:
+                    return False
+                titles.append(category['title'])
+            logger.warning(f"Backfilled {missing} streamed category slot(s) with placeholder questions")
+        
+        if not self._setup_game().update(phase=phase, version=F('version') + 1):
+            return False
+        self.game.refresh_from_db(fields=['phase', 'question_count', 'version'])
+        publish_game_event(self.game.id, {'type': 'phase', 'phase': self.game.phase, 'version': self.game.version})
+        return True
+    
+    def _save_category(self, category: dict, order: int) -> Category:
+        """
+        Append one validated category (and its questions) to the current
+        game. Saves nothing and returns None if the game has left SETUP.
+        """
+        with transaction.atomic():
+            if not self._setup_game().exists():
+                return None
+            bank_ids = question_bank.store_board([category])
+            saved = Category.objects.create(game=self.game, title=category['title'], order=order)
+            questions = Question.objects.bulk_create([
+                Question(
+                    category=saved,
+                    value=q_data['value'],
+                    bank_question_id=bank_ids[question_bank.content_hash(q_data['question'], q_data['answer'])]
+                )
+                for q_data in category['questions']
+            ])
+            Game.objects.filter(id=self.game.id).update(
+                question_count=F('question_count') + len(category['questions']),
+                version=F('version') + 1,
+            )
+            self.game.refresh_from_db(fields=['version'])
+            publish_game_event(self.game.id, {
+                'type': 'category',
+                'title': saved.title,
+                'order': order,
+                'questions': [
+                    {'value': q.value, 'is_answered': False, 'id': q.id}
+                    for q in sorted(questions, key=lambda q: q.value)
+                ],
+                'version': self.game.version,
+            })
+        return saved
+    
+    def _save_board(self, board: list, phase: str = 'PLAYING') -> Game:
+        """
+        Persist a validated board as a new game. Everything is written with
+        bulk inserts inside one transaction, so a game is never visible with
+        a partial board. Question text lives in the question bank; the
+        game's questions only reference it.
+        
+        A board is a list of categories as _validate_category returns them:
+        [
+            {"title": "Category Name", "questions": [
+                {"value": 200, "question": "Q?", "answer": "A"},
+                ...
+            ]},
+            ...
+        ]
+        """
+        with transaction.atomic():
+            self.game = Game.objects.create(
+                score=0,
+                phase=phase,
+                question_count=sum(len(cat_data['questions']) for cat_data in board)
+            )
+            self._insert_board(board)
+        
+        return self.game
+    
+    def _insert_board(self, board: list):
+        """Bulk insert a board's categories and questions for self.game"""
+        bank_ids = question_bank.store_board(board)
+        
+        titles = self._unique_titles(board)
+        categories = Category.objects.bulk_create([
+            Category(game=self.game, title=title, order=idx)
+            for idx, title in enumerate(titles)
+        ])
+        
+        Question.objects.bulk_create([
+            Question(
+                category=category,
+                value=q_data['value'],
+                bank_question_id=bank_ids[question_bank.content_hash(q_data['question'], q_data['answer'])]
+            )
+            for category, cat_data in zip(categories, board)
+            for q_data in cat_data['questions']
+        ])
+    
+    def fill_setup_game(self, num_categories: int = 6, stream: bool = False, placeholder: bool = False) -> bool:
+        """
+        Generate the board for this game, created empty in SETUP, and move
+        it to PLAYING. Used by the generation queue; `placeholder` skips
+        Gemini and uses the dummy board. Any categories left by an earlier,
+        interrupted attempt are replaced. Returns False (and does nothing)
+        if the game has already left SETUP, or its job's lease was taken over.
+        """
+        with transaction.atomic():
+            if not self._setup_game().exists():
+                return False
+            Category.objects.filter(game=self.game).delete()
+            Game.objects.filter(id=self.game.id).update(question_count=0)
+        
+        if stream and not placeholder:
+            return self._stream_categories_and_questions(num_categories)
+        
+        if placeholder:
+            board = self._create_dummy_categories(num_categories)
+        else:
+            board = self._generate_categories_and_questions(num_categories)
+        with transaction.atomic():
+            if not self._setup_game().exists():
+                return False
+            self._insert_board(board)
+            Game.objects.filter(id=self.game.id).update(
+                phase='PLAYING',
+                question_count=sum(len(cat_data['questions']) for cat_data in board),
+                version=F('version') + 1,
+            )
+        
+        self.game.refresh_from_db(fields=['phase', 'question_count', 'version'])
+        publish_game_event(self.game.id, {'type': 'phase', 'phase': self.game.phase, 'version': self.game.version})
+        return True
+    
+    def _setup_game(self):
+        """
+        self.game, as a queryset, while it is still in SETUP and (when run
+        from the generation queue) its job still holds self.lease
+        """
+        games = Game.objects.filter(id=self.game.id, phase='SETUP')
+        if self.lease:
+            games = games.filter(generation_job__lease=self.lease)
+        return games
+    
+    @staticmethod
+    def _unique_title(title: str, taken: list) -> str:
+        """
+        `title`, numbered if a category on the board already has it: the
+        board state is keyed by title, so a repeat would hide a column.
+        """
+        unique, n = title, 2
+        while unique in taken:
+            suffix = f" ({n})"
+            unique, n = title[:100 - len(suffix)] + suffix, n + 1
+        return unique
+    
+    @staticmethod
+    def _unique_titles(board: list) -> list:
+        """The board's category titles in order, repeats numbered (see _unique_title)"""
+        titles = []
+        for cat_data in board:
+            titles.append(JeopardyGame._unique_title(cat_data['title'], titles))
+        return titles
+    
+    def _salvage_board(self, response_data: dict, num_categories: int, avoid_titles=()) -> list:
         """
-        from .gemini_client import ask_gemini_json
-        import logging
+        Validate a board payload category by category, keeping whatever is
+        usable. Invalid categories are dropped and missing slots (e.g. from a
+        truncated response) are backfilled with placeholder categories whose
+        titles are not in `avoid_titles` (the rest of the board) if possible.
         
-        logger = logging.getLogger(__name__)
+        Raises ValueError if no category at all is usable.
+        """
+        if not isinstance(response_data, dict) or not isinstance(response_data.get('categories'), list):
+            raise ValueError("Missing 'categories' key in response")
+        
+        board = []
+        for idx, cat_data in enumerate(response_data['categories'][:num_categories]):
+            try:
+                board.append(self._validate_category(cat_data, idx))
+            except ValueError as e:
+                logger.warning(f"Dropping invalid category: {e}")
+        
+        if not board:
+            raise ValueError("No valid categories in response")
+        
+        missing = num_categories - len(board)
+        if missing:
+            metrics.incr('gemini.category_backfills', missing)
+            taken = list(avoid_titles) + [category['title'] for category in board]
+            board += self._placeholder_spares(taken, num_categories)[:missing]
+            logger.warning(f"Backfilled {missing} category slot(s) with placeholder questions")
+        
+        return board
+    
+    @staticmethod
+    def _validate_category(cat_data: dict, idx: int = 0) -> dict:
+        """
+        Validate a single category object from a Gemini payload.
+        Malformed questions, and repeats of a value already used in the
+        category, are dropped; a category with none left raises ValueError.
+        """
+        if not isinstance(cat_data, dict):
+            raise ValueError(f"Category {idx+1} is not an object")
+        
+        questions = []
+        seen_values = set()
+        for q_data in cat_data.get('questions') or []:
+            if not isinstance(q_data, dict) or not all(k in q_data for k in ['value', 'question', 'answer']):
+                continue
+            try:
+                value = int(q_data['value'])
+            except (TypeError, ValueError):
+                continue
+            if value in seen_values:
+                continue  # One question per value (see Question.Meta)
+            seen_values.add(value)
+            questions.append({
+                'value': value,
+                'question': str(q_data['question']),
+                'answer': str(q_data['answer']),
+            })
+        
+        if not questions:
+            raise ValueError(f"Category {idx+1} has no valid questions")
         
-        prompt = f"""You will respond with ONLY valid JSON, no markdown, no explanation.
+        return {
+            'title': str(cat_data.get('title') or f'Category {idx+1}')[:100],
+            'questions': questions,
+        }
+    
+    @staticmethod
+    def _avoid_line(avoid_titles) -> str:
+        """Prompt line keeping Gemini away from titles already on the board"""
+        return f"\nDo not use any of these category titles: {', '.join(avoid_titles)}." if avoid_titles else ""
+    
+    @staticmethod
+    def _board_prompt(num_categories: int, avoid_titles=()) -> str:
+        """Prompt asking Gemini for a full board as JSON"""
+        return f"""You will respond with ONLY valid JSON, no markdown, no explanation.
 
 Generate {num_categories} Jeopardy categories. Each category has a "title" and "questions" array with exactly 5 questions.
-Each question has: value (200,400,600,800,1000), question (string), answer (string).
+Each question has: value (200,400,600,800,1000), question (string), answer (string).{JeopardyGame._avoid_line(avoid_titles)}
 
 {{
   "categories": [
@@ -63,43 +399,215 @@ Each question has: value (200,400,600,800,1000), question (string), answer (stri
 }}
 
 Make questions fun, interesting, varied difficulty based on value, family-friendly. The high the value, the more difficult the question. For example, a $200 question should be easy, while a $1000 question should be challenging."""
+    
+    @staticmethod
+    def _structured_board_prompt(num_categories: int, avoid_titles=()) -> str:
+        """Board prompt for schema mode: the response schema already describes the JSON shape"""
+        return f"""Generate {num_categories} Jeopardy categories, each with exactly 5 questions worth 200, 400, 600, 800 and 1000.{JeopardyGame._avoid_line(avoid_titles)}
+
+Make questions fun, interesting, varied difficulty based on value, family-friendly. The higher the value, the more difficult the question. For example, a $200 question should be easy, while a $1000 question should be challenging."""
+    
+    def _generate_categories_and_questions(self, num_categories: int) -> list:
+        """
+        Build a board: up to QUESTION_BANK_CATEGORIES categories are reused
+        from the question bank and Gemini only generates the rest.
+        
+        Returns a validated board, ready for _save_board
+        """
+        board = question_bank.assemble_categories(question_bank.categories_per_board(num_categories))
+        if len(board) < num_categories:
+            banked = [category['title'] for category in board]
+            board += self._generate_with_gemini(num_categories - len(board), avoid_titles=banked)
+        return board
+    
+    async def _agenerate_categories_and_questions(self, num_categories: int) -> list:
+        """Async version of _generate_categories_and_questions"""
+        board = await sync_to_async(question_bank.assemble_categories)(
+            question_bank.categories_per_board(num_categories)
+        )
+        if len(board) < num_categories:
+            banked = [category['title'] for category in board]
+            board += await self._agenerate_with_gemini(num_categories - len(board), avoid_titles=banked)
+        return board
+    
+    def _generate_with_gemini(self, num_categories: int, avoid_titles=()) -> list:
+        """
+        Use Gemini to generate random Jeopardy categories and questions,
+        steering clear of `avoid_titles` (categories already on the board).
+        Falls back to dummy questions if Gemini fails.
+        """
+        from .gemini_client import ask_gemini_json, ask_gemini_structured
+        from .schemas import BoardSchema
+        
+        if generation_mode() == 'per_category':
+            return async_to_sync(self._agenerate_per_category)(num_categories, avoid_titles)
+        
+        # Boards must be random, and the board prompt never changes, so these
+        # calls bypass the response cache (it would hand out the same board)
+        if structured_output():
+            try:
+                # Anything but an exact num_categories x 5 board is rejected by the schema
+                board = ask_gemini_structured(
+                    self._structured_board_prompt(num_categories, avoid_titles), BoardSchema,
+                    context={'num_categories': num_categories}, cache=False,
+                ).to_board()
+                logger.info(f"✓ Generated {num_categories} categories from Gemini (structured)")
+                return board
+            except Exception as e:
+                logger.warning(f"Gemini generation failed: {e}. Using fallback dummy questions.")
+                return self._create_dummy_categories(num_categories)
+        
+        prompt = self._board_prompt(num_categories, avoid_titles)
         
         try:
             # Try to get JSON from Gemini
-            response_data = ask_gemini_json(prompt)
+            response_data = ask_gemini_json(prompt, cache=False)
             
-            # Validate and create categories/questions
-            if 'categories' not in response_data:
-                raise ValueError("Missing 'categories' key in response")
+            # Validate the whole payload before anything is written
+            board = self._salvage_board(response_data, num_categories, avoid_titles)
             
-            for idx, cat_data in enumerate(response_data['categories']):
-                category = Category.objects.create(
-                    game=self.game,
-                    title=cat_data.get('title', f'Category {idx+1}'),
-                    order=idx
+            logger.info(f"✓ Generated {num_categories} categories from Gemini")
+            return board
+        
+        except Exception as e:
+            logger.warning(f"Gemini generation failed: {e}. Using fallback dummy questions.")
+            return self._create_dummy_categories(num_categories)
+    
+    async def _agenerate_with_gemini(self, num_categories: int, avoid_titles=()) -> list:
+        """Async version of _generate_with_gemini"""
+        from .gemini_client import ask_gemini_json_async, ask_gemini_structured_async
+        from .schemas import BoardSchema
+        
+        if generation_mode() == 'per_category':
+            return await self._agenerate_per_category(num_categories, avoid_titles)
+        
+        if structured_output():
+            try:
+                result = await ask_gemini_structured_async(
+                    self._structured_board_prompt(num_categories, avoid_titles), BoardSchema,
+                    context={'num_categories': num_categories}, cache=False,
                 )
-                
-                # Create questions (validate each one)
-                for q_data in cat_data.get('questions', []):
-                    if all(k in q_data for k in ['value', 'question', 'answer']):
-                        Question.objects.create(
-                            category=category,
-                            value=q_data['value'],
-                            question_text=q_data['question'],
-                            answer_text=q_data['answer']
-                        )
+                logger.info(f"✓ Generated {num_categories} categories from Gemini (structured)")
+                return result.to_board()
+            except Exception as e:
+                logger.warning(f"Gemini generation failed: {e}. Using fallback dummy questions.")
+                return self._create_dummy_categories(num_categories)
+        
+        try:
+            response_data = await ask_gemini_json_async(self._board_prompt(num_categories, avoid_titles), cache=False)
+            board = self._salvage_board(response_data, num_categories, avoid_titles)
             
             logger.info(f"✓ Generated {num_categories} categories from Gemini")
+            return board
         
         except Exception as e:
             logger.warning(f"Gemini generation failed: {e}. Using fallback dummy questions.")
-            self._create_dummy_categories(num_categories)
+            return self._create_dummy_categories(num_categories)
+    
+    @staticmethod
+    def _category_prompt(theme: str, avoid_titles: list) -> str:
+        """Prompt asking Gemini for a single category as JSON"""
+        return f"""You will respond with ONLY valid JSON, no markdown, no explanation.
+
+Generate 1 Jeopardy category loosely themed around {theme}. It has a "title" and a "questions" array with exactly 5 questions.
+Each question has: value (200,400,600,800,1000), question (string), answer (string).{JeopardyGame._avoid_line(avoid_titles)}
+
+{{
+  "title": "CATEGORY_TITLE",
+  "questions": [
+    {{"value": 200, "question": "Q?", "answer": "A"}},
+    {{"value": 400, "question": "Q?", "answer": "A"}},
+    {{"value": 600, "question": "Q?", "answer": "A"}},
+    {{"value": 800, "question": "Q?", "answer": "A"}},
+    {{"value": 1000, "question": "Q?", "answer": "A"}}
+  ]
+}}
+
+Make questions fun, interesting, varied difficulty based on value, family-friendly. The high the value, the more difficult the question. For example, a $200 question should be easy, while a $1000 question should be challenging."""
+    
+    async def _agenerate_category(self, slot: int, theme: str, avoid_titles: list) -> dict:
+        """Generate and validate the category for one board slot"""
+        from .gemini_client import ask_gemini_json_async, ask_gemini_structured_async
+        from .schemas import CategorySchema
+        
+        # Retries are handled per slot by _agenerate_per_category
+        if structured_output():
+            result = await ask_gemini_structured_async(
+                self._category_prompt(theme, avoid_titles), CategorySchema, attempts=1, cache=False,
+            )
+            return result.to_board_category()
+        
+        response_data = await ask_gemini_json_async(
+            self._category_prompt(theme, avoid_titles), attempts=1, cache=False,
+        )
+        return self._validate_category(response_data, slot)
     
-    def _create_dummy_categories(self, num_categories: int):
+    async def _agenerate_per_category(self, num_categories: int, avoid_titles=()) -> list:
         """
-        Create placeholder categories/questions if Gemini fails
+        Generate a board with one concurrent Gemini request per category,
+        avoiding `avoid_titles` and the titles of slots already filled.
+        
+        Each category is validated on its own; only the failed slots are
+        retried (up to GEMINI_CATEGORY_ATTEMPTS rounds) and any slot that
+        still fails is backfilled with a placeholder category.
+        """
+        rounds = getattr(settings, 'GEMINI_CATEGORY_ATTEMPTS', 2)
+        themes = random.sample(CATEGORY_THEMES, k=min(num_categories, len(CATEGORY_THEMES)))
+        themes += random.choices(CATEGORY_THEMES, k=num_categories - len(themes))
+        slots = [None] * num_categories
+        
+        for attempt in range(1, rounds + 1):
+            pending = [idx for idx, category in enumerate(slots) if category is None]
+            if not pending:
+                break
+            if attempt > 1:
+                metrics.incr('gemini.category_retries', len(pending))
+            
+            taken = list(avoid_titles) + [category['title'] for category in slots if category is not None]
+            results = await asyncio.gather(
+                *[self._agenerate_category(idx, themes[idx], taken) for idx in pending],
+                return_exceptions=True
+            )
+            
+            for idx, result in zip(pending, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Category slot {idx+1} failed (round {attempt}/{rounds}): {result}")
+                else:
+                    slots[idx] = result
+        
+        failed = [idx for idx, category in enumerate(slots) if category is None]
+        if failed:
+            metrics.incr('gemini.category_backfills', len(failed))
+            self.used_fallback = len(failed) == num_categories
+            
+            taken = list(avoid_titles) + [category['title'] for category in slots if category is not None]
+            for idx, spare in zip(failed, self._placeholder_spares(taken, num_categories)):
+                slots[idx] = spare
+            logger.warning(f"Backfilled {len(failed)} category slot(s) with placeholder questions")
+        
+        logger.info(f"✓ Generated {num_categories - len(failed)}/{num_categories} categories from Gemini")
+        return slots
+    
+    def _create_dummy_categories(self, num_categories: int) -> list:
+        """
+        Build placeholder categories/questions if Gemini fails
         (Useful for testing without API key)
         """
+        self.used_fallback = True
+        board = self._dummy_board(num_categories)
+        
+        print("✓ Dummy questions created (Gemini not available)")
+        return board
+    
+    @staticmethod
+    def _placeholder_spares(taken_titles: list, num_categories: int) -> list:
+        """Placeholder categories for backfilling, preferring titles not already on the board"""
+        dummies = JeopardyGame._dummy_board(num_categories)
+        return [category for category in dummies if category['title'] not in taken_titles] + dummies
+    
+    @staticmethod
+    def _dummy_board(num_categories: int) -> list:
+        """The hardcoded placeholder board, in _save_board format"""
         categories_data = [
             ("Science", [
                 ("What is the chemical symbol for gold?", "Au"),
@@ -145,27 +653,24 @@ Make questions fun, interesting, varied difficulty based on value, family-friend
             ]),
         ]
         
-        for idx, (cat_title, questions) in enumerate(categories_data[:num_categories]):
-            category = Category.objects.create(
-                game=self.game,
-                title=cat_title,
-                order=idx
-            )
-            
-            for q_idx, (q_text, a_text) in enumerate(questions):
-                value = (q_idx + 1) * 200  # 200, 400, 600, 800, 1000
-                Question.objects.create(
-                    category=category,
-                    value=value,
-                    question_text=q_text,
-                    answer_text=a_text
-                )
-        
-        print("✓ Dummy questions created (Gemini not available)")
+        return [
+            {
+                'title': cat_title,
+                'questions': [
+                    {
+                        'value': (q_idx + 1) * 200,  # 200, 400, 600, 800, 1000
+                        'question': q_text,
+                        'answer': a_text,
+                    }
+                    for q_idx, (q_text, a_text) in enumerate(questions)
+                ],
+            }
+            for cat_title, questions in categories_data[:num_categories]
+        ]
     
     def get_question(self, question_id: int) -> Question:
         """Get a specific question"""
-        return Question.objects.get(id=question_id)
+        return Question.objects.select_related('category', 'bank_question').get(id=question_id)
     
     def answer_question(self, question_id: int, is_correct: bool) -> int:
         """
@@ -174,23 +679,144 @@ Make questions fun, interesting, varied difficulty based on value, family-friend
         - If incorrect: subtract points
         
         Returns the updated score
+        
+        The question is claimed with a conditional UPDATE and the score is
+        incremented in the database, so concurrent submissions for the same
+        question (double-clicks, retries, multiple tabs) only score once.
         """
-        question = Question.objects.get(id=question_id)
+        with transaction.atomic():
+            claimed = Question.objects.filter(
+                id=question_id,
+                category__game=self.game,
+                is_answered=False
+            ).update(is_answered=True, player_correct=is_correct)
+            
+            if claimed:
+                value = Subquery(Question.objects.filter(id=question_id).values('value')[:1])
+                Game.objects.filter(id=self.game.id).update(
+                    score=F('score') + value if is_correct else F('score') - value,
+                    answered_count=F('answered_count') + 1,
+                    correct_count=F('correct_count') + int(is_correct),
+                    version=F('version') + 1,
+                    updated_at=timezone.now()
+                )
+            elif not Question.objects.filter(id=question_id, category__game=self.game).exists():
+                raise Question.DoesNotExist(f"Question {question_id} is not part of game {self.game.id}")
         
-        if question.is_answered:
-            return self.game.score  # Already answered, no change
+        self.game.refresh_from_db(fields=['score', 'answered_count', 'correct_count', 'version'])
+        if claimed:
+            publish_game_event(self.game.id, {
+                'type': 'answer',
+                'question_id': question_id,
+                'is_correct': is_correct,
+                'score': self.game.score,
+                'answered_count': self.game.answered_count,
+                'version': self.game.version,
+            })
+        return self.game.score
+    
+    def apply_answers(self, answers: list) -> list:
+        """
+        Record a batch of answers, each {'key', 'question_id', 'is_correct'},
+        in one transaction with a single score update.
         
-        question.is_answered = True
-        question.player_correct = is_correct
-        question.save()
+        Returns one result per answer: {'key', 'question_id', 'status',
+        'points', 'duplicate'}. status is 'applied', 'already_answered' or
+        'not_found'. A key this game has already seen (a retried batch, or
+        the same key twice in one batch) reports its original outcome with
+        duplicate=True and changes nothing, so retries never double-apply.
+        """
+        try:
+            return self._apply_answers(answers)
+        except IntegrityError:
+            # A concurrent request recorded one of these keys first; a second
+            # pass sees it and reports it as a duplicate
+            return self._apply_answers(answers)
+    
+    def _apply_answers(self, answers: list) -> list:
+        results = []
+        events = []
+        claimed = {}  # question_id -> is_correct
         
-        if is_correct:
-            self.game.score += question.value
-        else:
-            self.game.score -= question.value
+        with transaction.atomic():
+            recorded = {
+                event.idempotency_key: event
+                for event in AnswerEvent.objects.filter(
+                    game=self.game, idempotency_key__in={answer['key'] for answer in answers}
+                )
+            }
+            questions = {
+                question_id: (value, is_answered)
+                for question_id, value, is_answered in (
+                    Question.objects.select_for_update(of=('self',))
+                    .filter(
+                        id__in={answer['question_id'] for answer in answers if answer['key'] not in recorded},
+                        category__game=self.game,
+                    )
+                    .values_list('id', 'value', 'is_answered')
+                )
+            }
+            
+            for answer in answers:
+                key, question_id, is_correct = answer['key'], answer['question_id'], answer['is_correct']
+                event = recorded.get(key)
+                if event is not None:
+                    results.append(self._answer_result(key, event.question_id, event.applied, event.points, True))
+                    continue
+                if question_id not in questions:
+                    results.append({'key': key, 'question_id': question_id, 'status': 'not_found', 'points': 0,
+                                    'duplicate': False})
+                    continue
+                
+                value, is_answered = questions[question_id]
+                applied = not is_answered and question_id not in claimed
+                points = (value if is_correct else -value) if applied else 0
+                if applied:
+                    claimed[question_id] = is_correct
+                
+                event = recorded[key] = AnswerEvent(
+                    game=self.game, idempotency_key=key, question_id=question_id,
+                    is_correct=is_correct, applied=applied, points=points,
+                )
+                events.append(event)
+                results.append(self._answer_result(key, question_id, applied, points, False))
+            
+            for correct in (True, False):
+                question_ids = [question_id for question_id, is_correct in claimed.items() if is_correct == correct]
+                if question_ids:
+                    Question.objects.filter(id__in=question_ids, is_answered=False).update(
+                        is_answered=True, player_correct=correct
+                    )
+            if claimed:
+                Game.objects.filter(id=self.game.id).update(
+                    score=F('score') + sum(event.points for event in events),
+                    answered_count=F('answered_count') + len(claimed),
+                    correct_count=F('correct_count') + sum(claimed.values()),
+                    version=F('version') + 1,
+                    updated_at=timezone.now()
+                )
+            AnswerEvent.objects.bulk_create(events)
         
-        self.game.save()
-        return self.game.score
+        self.game.refresh_from_db(fields=['score', 'answered_count', 'correct_count', 'version'])
+        if claimed:
+            publish_game_event(self.game.id, {
+                'type': 'answers',
+                'question_ids': list(claimed),
+                'score': self.game.score,
+                'answered_count': self.game.answered_count,
+                'version': self.game.version,
+            })
+        return results
+    
+    @staticmethod
+    def _answer_result(key: str, question_id: int, applied: bool, points: int, duplicate: bool) -> dict:
+        return {
+            'key': key,
+            'question_id': question_id,
+            'status': 'applied' if applied else 'already_answered',
+            'points': points,
+            'duplicate': duplicate,
+        }
     
     def get_board_state(self) -> dict:
         """
@@ -207,14 +833,17 @@ Make questions fun, interesting, varied difficulty based on value, family-friend
             }
         }
         """
-        categories = self.game.categories.all()
+        # Two queries no matter how many categories: categories + prefetched questions
+        categories = self.game.categories.prefetch_related(
+            Prefetch('questions', queryset=Question.objects.order_by('value'))
+        )
         board = {}
         
         for category in categories:
             board[category.title] = {
                 'questions': []
             }
-            for question in category.questions.all().order_by('value'):
+            for question in category.questions.all():
                 board[category.title]['questions'].append({
                     'value': question.value,
                     'is_answered': question.is_answered,
@@ -223,27 +852,30 @@ Make questions fun, interesting, varied difficulty based on value, family-friend
         
         return board
     
+    def get_state(self) -> dict:
+        """Board, score and phase as served by the state API and the live channel"""
+        return {
+            'board_state': self.get_board_state(),
+            'current_score': self.get_score(),
+            'game_phase': self.game.phase,
+            'board_complete': self.is_board_complete(),
+            'version': self.game.version,
+        }
+    
     def get_score(self) -> int:
         """Get the current score"""
         return self.game.score
     
     def is_board_complete(self) -> bool:
-        """Check if all questions have been answered"""
-        unanswered = Question.objects.filter(
-            category__game=self.game,
-            is_answered=False
-        ).count()
-        
-        return unanswered == 0
+        """Check if all questions have been answered (no query: uses the game's counters)"""
+        if self.game.phase == 'SETUP':
+            return False  # Board is still being generated
+        return self.game.answered_count >= self.game.question_count
     
     def get_final_stats(self) -> dict:
-        """Get final game statistics"""
-        total_questions = Question.objects.filter(category__game=self.game).count()
-        correct_answers = Question.objects.filter(
-            category__game=self.game,
-            is_answered=True,
-            player_correct=True
-        ).count()
+        """Get final game statistics from the game's counters"""
+        total_questions = self.game.question_count
+        correct_answers = self.game.correct_count
         
         accuracy = (correct_answers / total_questions * 100) if total_questions > 0 else 0
         
@@ -0,0 +1,299 @@
+"""
+Stand-ins for genai.Client, selected by GEMINI_BACKEND
+
+    live    the real API
+    record  the real API, saving every response under GEMINI_RECORDINGS_DIR
+    replay  recorded responses, instantly; prompts never recorded get a fake board
+    fake    synthesized boards, instantly, with no key or network
+
+Each backend offers the slice of the genai client that gemini_client uses
+(models.generate_content, models.generate_content_stream and
+aio.models.generate_content), so retries, the circuit breaker, parsing
+and the response cache all behave exactly as with the live API.
+
+Recordings are one JSON file per (model, response schema, prompt), keyed
+like the response cache but without the prompt's "Do not use any of these
+category titles" line: those titles come from the question bank and earlier
+slots, so they differ on nearly every run, and replayed boards still get
+repeated titles numbered when saved. Per-category themes stay in the key;
+there are only len(CATEGORY_THEMES) of them, so recording a few games
+covers them all.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+
+from . import llm_cache, metrics
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('live', 'record', 'replay', 'fake')
+
+# Every synthesized category is titled FAKE_TITLE_PREFIX + ids, so fake content
+# can be told apart wherever it ends up (the question bank never reuses it)
+FAKE_TITLE_PREFIX = 'Fake Category '
+
+_CATEGORY_COUNT = re.compile(r'Generate (\d+) Jeopardy categor(y|ies)')
+# The avoid-titles line JeopardyGame._avoid_line appends to prompts
+_AVOID_LINE = re.compile(r'\n?Do not use any of these category titles: [^\n]*')
+
+
+class FakeGeminiError(RuntimeError):
+    """Raised by FakeGeminiClient for its injected failures"""
+
+
+class _Response:
+    """The parts of a GenerateContentResponse that gemini_client reads"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.usage_metadata = None
+
+
+def _kind(config) -> str:
+    schema = getattr(config, 'response_schema', None)
+    return getattr(schema, '__name__', 'text')
+
+
+def _chunks(text: str, size: int = 200):
+    for start in range(0, len(text), size):
+        yield _Response(text[start:start + size])
+
+
+class _FakeModels:
+
+    def __init__(self, latency: float, failure_rate: float, seed: int):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        self.calls = 0
+        self.failures = 0
+
+    def respond(self, contents: str) -> _Response:
+        with self.lock:
+            self.calls += 1
+            fail = self.rng.random() < self.failure_rate
+            self.failures += fail
+            call_id = next(self.ids)
+        if fail:
+            raise FakeGeminiError('injected failure')
+        return _Response(json.dumps(fake_response(contents, call_id)))
+
+    def generate_content(self, model, contents, config=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.respond(contents)
+
+    def generate_content_stream(self, model, contents, config=None):
+        yield from _chunks(self.generate_content(model, contents, config).text)
+
+
+class _FakeAsyncModels:
+
+    def __init__(self, models: _FakeModels):
+        self._models = models
+
+    async def generate_content(self, model, contents, config=None):
+        if self._models.latency:
+            await asyncio.sleep(self._models.latency)
+        return self._models.respond(contents)
+
+
+class _Aio:
+
+    def __init__(self, models):
+        self.models = models
+
+
+class FakeGeminiClient:
+    """
+    Synthesizes a well-formed board (or single category) for each prompt.
+    Content is unique per call, so the question bank grows as it would with
+    real generation, and deterministic for a given `seed` and call order.
+    `latency` and `failure_rate` let load tests model a slow or flaky API.
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.models = _FakeModels(latency, failure_rate, seed)
+        self.aio = _Aio(_FakeAsyncModels(self.models))
+
+
+class _UnconfiguredModels:
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def generate_content(self, model, contents, config=None):
+        raise ImproperlyConfigured(self.message)
+
+    def generate_content_stream(self, model, contents, config=None):
+        raise ImproperlyConfigured(self.message)
+
+
+class _UnconfiguredAsyncModels(_UnconfiguredModels):
+
+    async def generate_content(self, model, contents, config=None):
+        raise ImproperlyConfigured(self.message)
+
+
+class UnconfiguredGeminiClient:
+    """
+    Stands in for the live client when there is no API key. Every call
+    raises ImproperlyConfigured, which callers treat as "no Gemini": no
+    retries, no circuit breaker failure, straight to the fallback board.
+    """
+
+    def __init__(self, message: str):
+        self.models = _UnconfiguredModels(message)
+        self.aio = _Aio(_UnconfiguredAsyncModels(message))
+
+
+def fake_response(prompt: str, call_id: int) -> dict:
+    """The JSON a prompt from game_logic asks for, with placeholder-free content"""
+    def category(c):
+        return {
+            'title': f'{FAKE_TITLE_PREFIX}{call_id}-{c}',
+            'questions': [
+                {'value': v, 'question': f'Fake question {call_id}-{c}-{v}?', 'answer': f'Fake answer {call_id}-{c}-{v}'}
+                for v in (200, 400, 600, 800, 1000)
+            ],
+        }
+
+    match = _CATEGORY_COUNT.search(prompt)
+    if match and match.group(2) == 'y':
+        return category(0)
+    return {'categories': [category(c) for c in range(int(match.group(1)) if match else 6)]}
+
+
+def is_fake_title(title: str) -> bool:
+    """Whether a category title came from FakeGeminiClient"""
+    return title.startswith(FAKE_TITLE_PREFIX)
+
+
+class _Recordings:
+    """Responses on disk, one file per model/kind/prompt"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    @staticmethod
+    def _replay_prompt(prompt: str) -> str:
+        """The prompt without its run-to-run avoid-titles line"""
+        return _AVOID_LINE.sub('', prompt)
+
+    def _path(self, model: str, prompt: str, kind: str) -> Path:
+        key = llm_cache.make_key(model, self._replay_prompt(prompt), kind)
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return self.directory / f'{digest}.json'
+
+    def load(self, model: str, prompt: str, kind: str):
+        try:
+            return json.loads(self._path(model, prompt, kind).read_text(encoding='utf-8'))['text']
+        except FileNotFoundError:
+            return None
+
+    def save(self, model: str, prompt: str, kind: str, text: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(model, prompt, kind)
+        record = {'model': model, 'kind': kind, 'prompt': llm_cache.normalize_prompt(self._replay_prompt(prompt)), 'text': text}
+        # Write then rename, so a concurrent replay never reads half a file
+        tmp = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        tmp.write_text(json.dumps(record, indent=2), encoding='utf-8')
+        tmp.replace(path)
+        metrics.incr('gemini.recorded')
+
+
+class _RecordingModels:
+
+    def __init__(self, models, recordings: _Recordings):
+        self._models = models
+        self._recordings = recordings
+
+    def generate_content(self, model, contents, config=None):
+        kwargs = {'config': config} if config is not None else {}
+        response = self._models.generate_content(model=model, contents=contents, **kwargs)
+        if response.text:
+            self._recordings.save(model, contents, _kind(config), response.text)
+        return response
+
+    def generate_content_stream(self, model, contents, config=None):
+        kwargs = {'config': config} if config is not None else {}
+        parts = []
+        for chunk in self._models.generate_content_stream(model=model, contents=contents, **kwargs):
+            parts.append(chunk.text or '')
+            yield chunk
+        self._recordings.save(model, contents, _kind(config), ''.join(parts))
+
+
+class _RecordingAsyncModels:
+
+    def __init__(self, models, recordings: _Recordings):
+        self._models = models
+        self._recordings = recordings
+
+    async def generate_content(self, model, contents, config=None):
+        kwargs = {'config': config} if config is not None else {}
+        response = await self._models.generate_content(model=model, contents=contents, **kwargs)
+        if response.text:
+            self._recordings.save(model, contents, _kind(config), response.text)
+        return response
+
+
+class RecordingGeminiClient:
+    """Passes calls through to a live client and saves each response"""
+
+    def __init__(self, live_client, directory):
+        recordings = _Recordings(directory)
+        self.models = _RecordingModels(live_client.models, recordings)
+        self.aio = _Aio(_RecordingAsyncModels(live_client.aio.models, recordings))
+
+
+class _ReplayModels:
+
+    def __init__(self, recordings: _Recordings, fallback: _FakeModels):
+        self._recordings = recordings
+        self._fallback = fallback
+
+    def respond(self, model, contents, config=None) -> _Response:
+        text = self._recordings.load(model, contents, _kind(config))
+        if text is not None:
+            metrics.incr('gemini.replay.hits')
+            return _Response(text)
+        metrics.incr('gemini.replay.misses')
+        logger.info("No recorded Gemini response for this prompt; serving a fake one")
+        return self._fallback.respond(contents)
+
+    def generate_content(self, model, contents, config=None):
+        return self.respond(model, contents, config)
+
+    def generate_content_stream(self, model, contents, config=None):
+        yield from _chunks(self.respond(model, contents, config).text)
+
+
+class _ReplayAsyncModels:
+
+    def __init__(self, models: _ReplayModels):
+        self._models = models
+
+    async def generate_content(self, model, contents, config=None):
+        return self._models.respond(model, contents, config)
+
+
+class ReplayGeminiClient:
+    """Serves recorded responses; falls back to FakeGeminiClient content"""
+
+    def __init__(self, directory, seed: int = 0):
+        self.models = _ReplayModels(_Recordings(directory), FakeGeminiClient(seed=seed).models)
+        self.aio = _Aio(_ReplayAsyncModels(self.models))
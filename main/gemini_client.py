@@ -1,28 +1,290 @@
-from google import genai
+"""
+Gemini calls with retries, response caching and a circuit breaker
+
+google-genai (and the httpx/pydantic stack under it) takes most of a
+second to import, so it is only imported, and the client only built, when
+the first call is made; see get_client(). Importing this module is cheap,
+which keeps manage.py commands and worker boot fast.
+"""
+
 from django.conf import settings
+import asyncio
 import json
-import re
+import random
+import threading
 import time
 import logging
 
+from django.core.exceptions import ImproperlyConfigured
+
+from . import gemini_backends, llm_cache, metrics
+from .instrumentation import timed_gemini
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .json_extract import extract_json
+
 logger = logging.getLogger(__name__)
 
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
+_client_lock = threading.Lock()
 
-def ask_gemini(prompt: str) -> str:
-    """Basic text response from Gemini"""
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
+
+def backend() -> str:
+    """GEMINI_BACKEND: 'live', 'record', 'replay' or 'fake' (see gemini_backends.py)"""
+    name = getattr(settings, 'GEMINI_BACKEND', 'live')
+    if name not in gemini_backends.BACKENDS:
+        raise ImproperlyConfigured(f"GEMINI_BACKEND must be one of {gemini_backends.BACKENDS}, not {name!r}")
+    return name
+
+
+def _build_client(max_connections: int = None):
+    """
+    A genai.Client, or the stand-in for one that GEMINI_BACKEND selects.
+    `max_connections` caps the async client's HTTP connection pool.
+    """
+    name = backend()
+    recordings = getattr(settings, 'GEMINI_RECORDINGS_DIR', 'gemini_recordings')
+    if name == 'fake':
+        return gemini_backends.FakeGeminiClient(latency=getattr(settings, 'GEMINI_FAKE_LATENCY', 0.0))
+    if name == 'replay':
+        return gemini_backends.ReplayGeminiClient(recordings)
+    
+    if not settings.GEMINI_API_KEY:
+        return gemini_backends.UnconfiguredGeminiClient(
+            f"GEMINI_API_KEY is not set (GEMINI_BACKEND={name!r}); set GEMINI_BACKEND=fake for offline runs"
         )
+    
+    from google import genai
+    from google.genai import types
+    
+    options = {}
+    if max_connections:
+        import httpx
+        options['http_options'] = types.HttpOptions(
+            async_client_args={
+                'limits': httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+            },
+        )
+    live = genai.Client(api_key=settings.GEMINI_API_KEY, **options)
+    if name == 'record':
+        return gemini_backends.RecordingGeminiClient(live, recordings)
+    return live
+
+
+def get_client():
+    """
+    The process-wide client, built on first use (thread-safe). Sync calls
+    use client.models; async ones use client.aio on the Gemini loop, whose
+    connection pool is capped at GEMINI_MAX_CONCURRENCY.
+    """
+    current = globals().get('client')
+    if current is None:
+        with _client_lock:
+            current = globals().get('client')
+            if current is None:
+                current = globals()['client'] = _build_client(
+                    max_connections=getattr(settings, 'GEMINI_MAX_CONCURRENCY', 4)
+                )
+    return current
+
+
+def __getattr__(name):
+    # `gemini_client.client` still works, and builds the client if needed
+    if name == 'client':
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Every async Gemini call runs on one long-lived event loop in its own thread
+# (see _on_gemini_loop). The async client's pooled connections and the
+# concurrency semaphore belong to that loop, so they are shared by the whole
+# process: ASGI requests, and sync code that goes through async_to_sync
+# (which makes a new loop per call) alike.
+_loop = None
+_loop_lock = threading.Lock()
+_semaphore = None
+
+# Shared by every Gemini call in the process: during an outage requests fail
+# fast with CircuitOpenError instead of each one sitting through retries
+breaker = CircuitBreaker(
+    'gemini',
+    failure_threshold=getattr(settings, 'GEMINI_BREAKER_FAILURES', 3),
+    reset_timeout=getattr(settings, 'GEMINI_BREAKER_RESET', 30),
+)
+
+
+def _parse_json(response) -> tuple:
+    """
+    Extract and parse the JSON object from a Gemini response.
+    Returns (data, complete); complete is False for salvaged output.
+    """
+    text = response.text if hasattr(response, 'text') else str(response)
+    
+    data, report = extract_json(text)
+    
+    if not report['complete']:
+        metrics.incr('gemini.json_salvaged')
+        logger.warning(
+            f"Salvaged truncated Gemini JSON: {report['recovered_categories']} complete "
+            f"categories recovered, {report['malformed_categories']} malformed"
+        )
+    
+    return data, report['complete']
+
+
+def _cache_key(cache: bool, model: str, prompt: str, kind: str):
+    """Response cache key for a call, or None when it must not be cached"""
+    if not (cache and llm_cache.enabled()):
+        return None
+    return llm_cache.make_key(model, prompt, kind)
+
+
+def _record_usage(path: str, response):
+    """Count a completed Gemini call and its tokens under gemini.<path>.*"""
+    metrics.incr(f'gemini.{path}.calls')
+    usage = getattr(response, 'usage_metadata', None)
+    tokens = getattr(usage, 'total_token_count', None)
+    if isinstance(tokens, int):
+        metrics.incr(f'gemini.{path}.tokens', tokens)
+
+
+def get_stats() -> dict:
+    """
+    Retry rate and token spend per generation path ('json' = free-form
+    JSON prompts, 'structured' = response-schema mode), plus the response
+    cache's hit ratio and size. A success is one validated response: a
+    board, or a category in per-category mode.
+    """
+    stats = {}
+    for path in ('json', 'structured'):
+        calls = metrics.get(f'gemini.{path}.calls')
+        retries = metrics.get(f'gemini.{path}.retries')
+        successes = metrics.get(f'gemini.{path}.successes')
+        tokens = metrics.get(f'gemini.{path}.tokens')
+        stats[path] = {
+            'calls': calls,
+            'retries': retries,
+            'successes': successes,
+            'failures': metrics.get(f'gemini.{path}.failures'),
+            'retry_rate': round(retries / calls, 3) if calls else None,
+            'tokens': tokens,
+            'tokens_per_success': round(tokens / successes, 1) if successes else None,
+        }
+    stats['cache'] = llm_cache.get_stats()
+    return stats
+
+
+def _generate(model: str, prompt: str, config=None):
+    """
+    One generate_content call behind the circuit breaker. API errors count
+    as breaker failures; a response that later fails parsing does not.
+    """
+    breaker.before_call()
+    kwargs = {'model': model, 'contents': prompt}
+    if config is not None:
+        kwargs['config'] = config
+    try:
+        response = get_client().models.generate_content(**kwargs)
+    except ImproperlyConfigured:
+        raise  # A missing key is not an API failure
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return response
+
+
+def _gemini_loop():
+    """The process-wide loop async Gemini calls run on, started on first use"""
+    global _loop
+    
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='gemini-async', daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+async def _on_gemini_loop(coro):
+    """Await `coro` on the Gemini loop from whatever loop the caller is on"""
+    loop = _gemini_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    # Cancelling the caller (e.g. a timeout) cancels the call on the Gemini loop too
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+async def _bounded(semaphore, call, timeout: float):
+    async with semaphore:
+        return await asyncio.wait_for(call, timeout=timeout)
+
+
+async def _agenerate(aio, semaphore, model: str, prompt: str, timeout: float, config=None):
+    """Async _generate, bounded by the concurrency semaphore and `timeout`"""
+    breaker.before_call()
+    kwargs = {'model': model, 'contents': prompt}
+    if config is not None:
+        kwargs['config'] = config
+    try:
+        response = await _on_gemini_loop(_bounded(semaphore, aio.models.generate_content(**kwargs), timeout))
+    except ImproperlyConfigured:
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return response
+
+
+@timed_gemini
+def ask_gemini(prompt: str, model="gemini-2.5-flash", cache=True) -> str:
+    """Basic text response from Gemini (pass cache=False for prompts that must vary)"""
+    key = _cache_key(cache, model, prompt, 'text')
+    cached = llm_cache.get(key) if key else None
+    if cached is not None:
+        return cached
+    
+    try:
+        response = _generate(model, prompt)
+        if key:
+            llm_cache.set(key, response.text)
         return response.text
     except Exception as e:
         logger.error(f"Gemini API error: {e}")
         raise
 
 
-def ask_gemini_json(prompt: str, model="gemini-2.5-flash", attempts=3, backoff=1.5) -> dict:
+def stream_gemini(prompt: str, model="gemini-2.5-flash"):
+    """
+    Yield response text chunks from Gemini as they are generated.
+    
+    The first chunk counts as the breaker success: callers usually stop
+    reading once they have what they need, so the end of the stream may
+    never be reached.
+    """
+    breaker.before_call()
+    succeeded = False
+    try:
+        for chunk in get_client().models.generate_content_stream(model=model, contents=prompt):
+            if chunk.text:
+                if not succeeded:
+                    breaker.record_success()
+                    succeeded = True
+                yield chunk.text
+    except ImproperlyConfigured:
+        raise
+    except Exception as e:
+        breaker.record_failure()
+        logger.error(f"Gemini streaming error: {e}")
+        raise
+    if not succeeded:
+        breaker.record_success()  # An empty stream still got an answer
+
+
+@timed_gemini
+def ask_gemini_json(prompt: str, model="gemini-2.5-flash", attempts=3, backoff=1.5, cache=True) -> dict:
     """
     Request JSON-formatted response from Gemini with retries.
     
@@ -31,6 +293,8 @@ def ask_gemini_json(prompt: str, model="gemini-2.5-flash", attempts=3, backoff=1
         model: Gemini model to use
         attempts: Number of retry attempts
         backoff: Exponential backoff multiplier between retries
+        cache: Serve/store the response from the response cache; pass
+            False for prompts whose answer should differ on every call
     
     Returns:
         Parsed JSON dict
@@ -38,28 +302,30 @@ def ask_gemini_json(prompt: str, model="gemini-2.5-flash", attempts=3, backoff=1
     Raises:
         ValueError: If no valid JSON is found after all attempts
     """
+    key = _cache_key(cache, model, prompt, 'json')
+    cached = llm_cache.get(key) if key else None
+    if cached is not None:
+        return json.loads(cached)
+    
     last_exc = None
     
     for attempt in range(1, attempts + 1):
+        if attempt > 1:
+            metrics.incr('gemini.json.retries')
         try:
-            response = client.models.generate_content(
-                model=model,
-                contents=prompt,
-            )
-            
-            text = response.text if hasattr(response, 'text') else str(response)
-            
-            # Extract JSON object from response
-            json_match = re.search(r'\{.*\}', text, re.DOTALL)
+            response = _generate(model, prompt)
+            _record_usage('json', response)
             
-            if not json_match:
-                raise ValueError("No JSON object found in response")
-            
-            # Parse and validate JSON
-            data = json.loads(json_match.group())
+            data, complete = _parse_json(response)
             logger.info(f"✓ Gemini JSON received on attempt {attempt}")
+            metrics.incr('gemini.json.successes')
+            if key and complete:
+                llm_cache.set(key, json.dumps(data))
             return data
         
+        except (CircuitOpenError, ImproperlyConfigured):
+            metrics.incr('gemini.json.failures')
+            raise
         except json.JSONDecodeError as e:
             last_exc = e
             logger.warning(f"JSON decode error (attempt {attempt}/{attempts}): {e}")
@@ -73,5 +339,207 @@ def ask_gemini_json(prompt: str, model="gemini-2.5-flash", attempts=3, backoff=1
             time.sleep(wait_time)
     
     # All attempts failed
+    metrics.incr('gemini.json.failures')
+    logger.error(f"Failed to get valid JSON from Gemini after {attempts} attempts")
+    raise ValueError(f"Gemini JSON parsing failed: {last_exc}")
+
+
+def _cached_structured(key, schema, context: dict):
+    """Cached response for `key` validated against `schema`, or None"""
+    import pydantic  # Already loaded by whoever defined `schema`
+    
+    cached = llm_cache.get(key) if key else None
+    if cached is None:
+        return None
+    try:
+        return schema.model_validate_json(cached, context=context)
+    except pydantic.ValidationError:
+        return None  # Cached under a different context (e.g. board size); refetch
+
+
+def _structured_config(schema):
+    """Ask Gemini for JSON conforming to a Pydantic model"""
+    from google.genai import types
+    
+    return types.GenerateContentConfig(
+        response_mime_type='application/json',
+        response_schema=schema,
+    )
+
+
+@timed_gemini
+def ask_gemini_structured(prompt: str, schema, model="gemini-2.5-flash", attempts=3, backoff=1.5,
+                          context: dict = None, cache=True):
+    """
+    Request a response matching a Pydantic schema.
+    
+    The schema is sent as Gemini's response schema, so no JSON has to be
+    dug out of prose. The reply is then validated against the model (with
+    `context`, e.g. {'num_categories': 6}) so rules the schema can't express,
+    like an exact board shape, are enforced before anything is written.
+    
+    Returns:
+        A validated instance of `schema`
+    
+    Raises:
+        ValueError: If no valid response is received after all attempts
+    """
+    import pydantic  # Already loaded by whoever defined `schema`
+    
+    key = _cache_key(cache, model, prompt, schema.__name__)
+    cached = _cached_structured(key, schema, context)
+    if cached is not None:
+        return cached
+    
+    config = _structured_config(schema)
+    last_exc = None
+    
+    for attempt in range(1, attempts + 1):
+        if attempt > 1:
+            metrics.incr('gemini.structured.retries')
+        try:
+            response = _generate(model, prompt, config)
+            _record_usage('structured', response)
+            
+            result = schema.model_validate_json(response.text, context=context)
+            logger.info(f"✓ Gemini structured {schema.__name__} received on attempt {attempt}")
+            metrics.incr('gemini.structured.successes')
+            if key:
+                llm_cache.set(key, result.model_dump_json())
+            return result
+        
+        except (CircuitOpenError, ImproperlyConfigured):
+            metrics.incr('gemini.structured.failures')
+            raise
+        except pydantic.ValidationError as e:
+            last_exc = e
+            logger.warning(f"Schema validation failed (attempt {attempt}/{attempts}): {e.error_count()} error(s)")
+        except Exception as e:
+            last_exc = e
+            logger.warning(f"Gemini error (attempt {attempt}/{attempts}): {e}")
+        
+        if attempt < attempts:
+            time.sleep(backoff ** attempt)
+    
+    metrics.incr('gemini.structured.failures')
+    logger.error(f"Failed to get a valid {schema.__name__} from Gemini after {attempts} attempts")
+    raise ValueError(f"Gemini structured output failed: {last_exc}")
+
+
+def _get_async_state():
+    """The shared async client and the process-wide concurrency semaphore"""
+    global _semaphore
+    
+    with _loop_lock:
+        if _semaphore is None:
+            _semaphore = asyncio.Semaphore(getattr(settings, 'GEMINI_MAX_CONCURRENCY', 4))
+    return get_client().aio, _semaphore
+
+
+@timed_gemini
+async def ask_gemini_json_async(prompt: str, model="gemini-2.5-flash", attempts=3, backoff=1.5,
+                                timeout: float = None, cache=True) -> dict:
+    """
+    Asyncio-native version of ask_gemini_json.
+    
+    Each call is bounded by `timeout` seconds (GEMINI_TIMEOUT by default),
+    concurrent requests are capped at GEMINI_MAX_CONCURRENCY, and retries
+    back off with full jitter without blocking the event loop.
+    
+    Raises:
+        ValueError: If no valid JSON is found after all attempts
+    """
+    key = _cache_key(cache, model, prompt, 'json')
+    cached = llm_cache.get(key) if key else None
+    if cached is not None:
+        return json.loads(cached)
+    
+    aio, semaphore = _get_async_state()
+    timeout = timeout if timeout is not None else getattr(settings, 'GEMINI_TIMEOUT', 30)
+    last_exc = None
+    
+    for attempt in range(1, attempts + 1):
+        if attempt > 1:
+            metrics.incr('gemini.json.retries')
+        try:
+            response = await _agenerate(aio, semaphore, model, prompt, timeout)
+            _record_usage('json', response)
+            
+            data, complete = _parse_json(response)
+            logger.info(f"✓ Gemini JSON received on attempt {attempt}")
+            metrics.incr('gemini.json.successes')
+            if key and complete:
+                llm_cache.set(key, json.dumps(data))
+            return data
+        
+        except asyncio.TimeoutError as e:
+            last_exc = e
+            logger.warning(f"Gemini timed out after {timeout}s (attempt {attempt}/{attempts})")
+        except (CircuitOpenError, ImproperlyConfigured):
+            metrics.incr('gemini.json.failures')
+            raise
+        except json.JSONDecodeError as e:
+            last_exc = e
+            logger.warning(f"JSON decode error (attempt {attempt}/{attempts}): {e}")
+        except Exception as e:
+            last_exc = e
+            logger.warning(f"Gemini error (attempt {attempt}/{attempts}): {e}")
+        
+        # Jittered exponential backoff that yields to the event loop
+        if attempt < attempts:
+            await asyncio.sleep(random.uniform(0, backoff ** attempt))
+    
+    metrics.incr('gemini.json.failures')
     logger.error(f"Failed to get valid JSON from Gemini after {attempts} attempts")
-    raise ValueError(f"Gemini JSON parsing failed: {last_exc}")
\ No newline at end of file
+    raise ValueError(f"Gemini JSON parsing failed: {last_exc}")
+
+
+@timed_gemini
+async def ask_gemini_structured_async(prompt: str, schema, model="gemini-2.5-flash", attempts=3, backoff=1.5,
+                                      context: dict = None, timeout: float = None, cache=True):
+    """Asyncio-native version of ask_gemini_structured (see ask_gemini_json_async)"""
+    import pydantic  # Already loaded by whoever defined `schema`
+    
+    key = _cache_key(cache, model, prompt, schema.__name__)
+    cached = _cached_structured(key, schema, context)
+    if cached is not None:
+        return cached
+    
+    aio, semaphore = _get_async_state()
+    timeout = timeout if timeout is not None else getattr(settings, 'GEMINI_TIMEOUT', 30)
+    config = _structured_config(schema)
+    last_exc = None
+    
+    for attempt in range(1, attempts + 1):
+        if attempt > 1:
+            metrics.incr('gemini.structured.retries')
+        try:
+            response = await _agenerate(aio, semaphore, model, prompt, timeout, config)
+            _record_usage('structured', response)
+            
+            result = schema.model_validate_json(response.text, context=context)
+            logger.info(f"✓ Gemini structured {schema.__name__} received on attempt {attempt}")
+            metrics.incr('gemini.structured.successes')
+            if key:
+                llm_cache.set(key, result.model_dump_json())
+            return result
+        
+        except asyncio.TimeoutError as e:
+            last_exc = e
+            logger.warning(f"Gemini timed out after {timeout}s (attempt {attempt}/{attempts})")
+        except (CircuitOpenError, ImproperlyConfigured):
+            metrics.incr('gemini.structured.failures')
+            raise
+        except pydantic.ValidationError as e:
+            last_exc = e
+            logger.warning(f"Schema validation failed (attempt {attempt}/{attempts}): {e.error_count()} error(s)")
+        except Exception as e:
+            last_exc = e
+            logger.warning(f"Gemini error (attempt {attempt}/{attempts}): {e}")
+        
+        if attempt < attempts:
+            await asyncio.sleep(random.uniform(0, backoff ** attempt))
+    
+    metrics.incr('gemini.structured.failures')
+    logger.error(f"Failed to get a valid {schema.__name__} from Gemini after {attempts} attempts")
+    raise ValueError(f"Gemini structured output failed: {last_exc}")
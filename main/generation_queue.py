@@ -0,0 +1,254 @@
+"""
+Database-backed queue for board generation
+
+/new-game/ creates the Game in SETUP, enqueues a GenerationJob and
+redirects at once; the board page polls (or listens on the WebSocket)
+until the phase moves to PLAYING. Generation no longer lives inside the
+HTTP request, so a client that times out and retries doesn't start a
+second Gemini call for the same board.
+
+Jobs are claimed with a conditional UPDATE, so any number of workers, in
+this process or in `manage.py process_generation_jobs`, can share the
+queue without a broker. Each process runs GENERATION_WORKERS threads,
+which bounds how many boards it generates at once. A job that raises is
+retried up to GENERATION_JOB_ATTEMPTS times; after that the game gets
+the placeholder board so the player is never stuck in SETUP. Jobs left
+RUNNING by a crashed worker are requeued after GENERATION_JOB_TIMEOUT.
+
+Every claim gets a fresh lease token. A job that was only slow, not
+crashed, may be requeued and claimed again while its first worker is
+still generating; the board writes and the final status update check the
+lease, so only the newest claim fills the game and the other's result is
+dropped.
+"""
+
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import metrics
+from .models import Game, GenerationJob
+
+logger = logging.getLogger(__name__)
+
+_workers = []
+_worker_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def enabled() -> bool:
+    return getattr(settings, 'GENERATION_QUEUE', True)
+
+
+def max_attempts() -> int:
+    return getattr(settings, 'GENERATION_JOB_ATTEMPTS', 3)
+
+
+def enqueue(game: Game, num_categories: int = 6) -> GenerationJob:
+    """
+    Queue generation for a SETUP game. Enqueueing a game that already has
+    a job returns that job, so each board is generated at most once.
+    """
+    job, created = GenerationJob.objects.get_or_create(game=game, defaults={'num_categories': num_categories})
+    if created:
+        metrics.incr('generation.enqueued')
+        transaction.on_commit(_wake.set)
+    return job
+
+
+def create_game(num_categories: int = 6) -> Game:
+    """Create an empty SETUP game and queue its board"""
+    with transaction.atomic():
+        game = Game.objects.create(score=0, phase='SETUP')
+        enqueue(game, num_categories)
+    return game
+
+
+def claim_next():
+    """
+    Claim the oldest queued job, or return None if the queue is empty.
+    Like board_pool.claim_board, the claim is a conditional UPDATE so two
+    workers never run the same job.
+    """
+    for _ in range(3):
+        job_id = (
+            GenerationJob.objects.filter(status='QUEUED')
+            .order_by('id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+
+        claimed = GenerationJob.objects.filter(id=job_id, status='QUEUED').update(
+            status='RUNNING',
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1,
+            lease=uuid.uuid4().hex,
+        )
+        if claimed:
+            return GenerationJob.objects.get(id=job_id)
+    return None
+
+
+def _finish(job: GenerationJob, status: str, error: str = ''):
+    now = timezone.now()
+    updated = GenerationJob.objects.filter(id=job.id, lease=job.lease).update(
+        status=status,
+        error=error,
+        finished_at=now if status != 'QUEUED' else None,
+    )
+    if not updated:
+        metrics.incr('generation.lease_lost')
+        logger.warning(f"Generation job for game {job.game_id} was taken over by another worker; dropping attempt {job.attempts}")
+        return
+    if status == 'QUEUED':
+        metrics.incr('generation.retries')
+        return
+
+    metrics.incr('generation.completed' if status == 'DONE' else 'generation.failed')
+    metrics.incr('generation.wait_ms', int((job.started_at - job.created_at).total_seconds() * 1000))
+    metrics.incr('generation.run_ms', int((now - job.started_at).total_seconds() * 1000))
+
+
+def run_job(job: GenerationJob):
+    """Generate the board for a claimed job and record the outcome"""
+    from .game_logic import JeopardyGame
+
+    from .gemini_client import breaker
+
+    game_logic = JeopardyGame()
+    game_logic.game = job.game
+    game_logic.lease = job.lease
+    # Out of attempts (e.g. requeued after repeated crashes): go straight to placeholders
+    exhausted = job.attempts > max_attempts()
+    # While the Gemini circuit is open, generation falls back instantly, so there is nothing to stream
+    stream = settings.GEMINI_STREAMING and not breaker.is_open
+
+    try:
+        game_logic.fill_setup_game(job.num_categories, stream=stream, placeholder=exhausted)
+    except Exception as e:
+        logger.exception(f"Board generation failed for game {job.game_id} (attempt {job.attempts}): {e}")
+        if job.attempts < max_attempts():
+            _finish(job, 'QUEUED', error=str(e))
+            _wake.set()
+            return
+        try:
+            game_logic.fill_setup_game(job.num_categories, placeholder=True)
+        except Exception as e2:
+            logger.exception(f"Placeholder board failed for game {job.game_id}: {e2}")
+        _finish(job, 'FAILED', error=str(e))
+        return
+
+    _finish(job, 'FAILED' if exhausted else 'DONE')
+
+
+def run_next() -> bool:
+    """Claim and run one job. Returns False if the queue was empty."""
+    job = claim_next()
+    if job is None:
+        return False
+    run_job(job)
+    return True
+
+
+def run_pending(limit: int = None) -> int:
+    """Run queued jobs in this thread until the queue is empty (or `limit` jobs ran)"""
+    done = 0
+    while (limit is None or done < limit) and run_next():
+        done += 1
+    return done
+
+
+def requeue_stale(timeout: float = None) -> int:
+    """Put RUNNING jobs claimed more than `timeout` seconds ago back in the queue, revoking their lease"""
+    timeout = getattr(settings, 'GENERATION_JOB_TIMEOUT', 300) if timeout is None else timeout
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    requeued = GenerationJob.objects.filter(status='RUNNING', started_at__lt=cutoff).update(status='QUEUED', lease='')
+    if requeued:
+        metrics.incr('generation.requeued', requeued)
+        logger.warning(f"Requeued {requeued} stale generation job(s)")
+    return requeued
+
+
+def _run_worker():
+    interval = getattr(settings, 'GENERATION_POLL_INTERVAL', 2)
+
+    while True:
+        _wake.clear()
+        try:
+            requeue_stale()
+            run_pending()
+        except Exception as e:
+            logger.exception(f"Generation worker crashed: {e}")
+        finally:
+            close_old_connections()
+
+        _wake.wait(timeout=interval)
+
+
+def start_workers(count: int) -> int:
+    """Top this process up to `count` live worker threads. Returns the number running."""
+    with _worker_lock:
+        _workers[:] = [worker for worker in _workers if worker.is_alive()]
+        while len(_workers) < count:
+            worker = threading.Thread(target=_run_worker, name=f'board-generation-{len(_workers)}', daemon=True)
+            worker.start()
+            _workers.append(worker)
+        return len(_workers)
+
+
+def ensure_workers() -> int:
+    """
+    Start GENERATION_WORKERS worker threads if the queue is enabled. Safe
+    to call on every request. With 0 workers, jobs are only run by
+    `manage.py process_generation_jobs`.
+    """
+    if not enabled():
+        return 0
+    return start_workers(getattr(settings, 'GENERATION_WORKERS', 2))
+
+
+def get_stats(recent: int = 100) -> dict:
+    """Queue depth, jobs running, and wait/run latency over the most recent finished jobs"""
+    counts = dict(
+        GenerationJob.objects.filter(status__in=['QUEUED', 'RUNNING'])
+        .values('status')
+        .annotate(n=Count('id'))
+        .values_list('status', 'n')
+    )
+    oldest = (
+        GenerationJob.objects.filter(status='QUEUED')
+        .order_by('id')
+        .values_list('created_at', flat=True)
+        .first()
+    )
+    finished = list(
+        GenerationJob.objects.filter(status__in=['DONE', 'FAILED'])
+        .order_by('-id')
+        .values_list('created_at', 'started_at', 'finished_at')[:recent]
+    )
+    waits = [(started - created).total_seconds() * 1000 for created, started, _ in finished]
+    runs = [(done - started).total_seconds() * 1000 for _, started, done in finished]
+
+    return {
+        'depth': counts.get('QUEUED', 0),
+        'running': counts.get('RUNNING', 0),
+        'workers': sum(1 for worker in _workers if worker.is_alive()),
+        'oldest_queued_seconds': round((timezone.now() - oldest).total_seconds(), 1) if oldest else None,
+        'avg_wait_ms': round(sum(waits) / len(waits), 1) if waits else None,
+        'avg_run_ms': round(sum(runs) / len(runs), 1) if runs else None,
+        'max_wait_ms': round(max(waits), 1) if waits else None,
+        'enqueued': metrics.get('generation.enqueued'),
+        'completed': metrics.get('generation.completed'),
+        'failed': metrics.get('generation.failed'),
+        'retries': metrics.get('generation.retries'),
+        'requeued': metrics.get('generation.requeued'),
+        'lease_lost': metrics.get('generation.lease_lost'),
+    }
@@ -0,0 +1,288 @@
+"""
+Per-request timing: wall time, DB queries and Gemini time for each view
+
+InstrumentationMiddleware opens a RequestStats for every request. A query
+hook installed on each new database connection, and the @timed_gemini
+decorator on the gemini_client entry points, add to whichever request is
+current (a context variable, so it follows the request through
+sync_to_async and async_to_sync). Totals are aggregated per view and
+served in Prometheus text format by /metrics, along with every counter in
+main.metrics.
+
+The hooks are a context-variable lookup and a few additions per query, so
+they can stay on in production. SQL text is only kept when the slow
+request log (SLOW_REQUEST_MS) is enabled.
+"""
+
+import bisect
+import contextvars
+import functools
+import heapq
+import inspect
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+slow_logger = logging.getLogger('main.slow_requests')
+
+# Upper bounds in seconds for the request duration histogram
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+_lock = threading.Lock()
+_views = defaultdict(lambda: {
+    'requests': defaultdict(int),  # status class -> count
+    'buckets': [0] * len(BUCKETS),
+    'seconds': 0.0,
+    'db_queries': 0,
+    'db_seconds': 0.0,
+    'gemini_calls': 0,
+    'gemini_seconds': 0.0,
+    'cache_hits': 0,
+})
+
+
+class RequestStats:
+    """What one request spent its time on"""
+
+    __slots__ = ('db_queries', 'db_seconds', 'gemini_calls', 'gemini_seconds', 'cache_hits', 'slow_queries',
+                 'keep_sql')
+
+    def __init__(self, keep_sql: bool = False):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.gemini_calls = 0
+        self.gemini_seconds = 0.0
+        self.cache_hits = 0
+        self.slow_queries = []  # min-heap of (seconds, sql), the slowest few
+        self.keep_sql = keep_sql
+
+    def add_query(self, seconds: float, sql: str):
+        self.db_queries += 1
+        self.db_seconds += seconds
+        if self.keep_sql:
+            entry = (seconds, sql)
+            if len(self.slow_queries) < 5:
+                heapq.heappush(self.slow_queries, entry)
+            elif seconds > self.slow_queries[0][0]:
+                heapq.heapreplace(self.slow_queries, entry)
+
+
+def enabled() -> bool:
+    return getattr(settings, 'INSTRUMENTATION_ENABLED', True)
+
+
+def current():
+    """RequestStats for the request being handled, or None"""
+    return _current.get()
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(time.perf_counter() - start, sql)
+
+
+def _install_query_hook(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install_query_hook, dispatch_uid='main.instrumentation')
+
+
+def timed_gemini(func):
+    """Add a Gemini call's wall time, retries and backoff included, to the current request"""
+    def record(start):
+        stats = _current.get()
+        if stats is not None:
+            stats.gemini_calls += 1
+            stats.gemini_seconds += time.perf_counter() - start
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                record(start)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(start)
+    return wrapper
+
+
+def record_cache_hit():
+    """Count a response-cache hit against the current request"""
+    stats = _current.get()
+    if stats is not None:
+        stats.cache_hits += 1
+
+
+class InstrumentationMiddleware:
+    """Time every request and attribute DB and Gemini time to its view"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+
+        stats, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, stats, start)
+        return response
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+
+        stats, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, stats, start)
+        return response
+
+    @staticmethod
+    def _start():
+        stats = RequestStats(keep_sql=_slow_threshold() is not None)
+        return stats, _current.set(stats), time.perf_counter()
+
+    @staticmethod
+    def _finish(request, response, stats: RequestStats, start: float):
+        elapsed = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        record_request(view, response.status_code, elapsed, stats)
+
+        threshold = _slow_threshold()
+        if threshold is not None and elapsed >= threshold:
+            _log_slow_request(request, response, view, elapsed, stats)
+
+
+def _slow_threshold():
+    ms = getattr(settings, 'SLOW_REQUEST_MS', 0)
+    return ms / 1000 if ms else None
+
+
+def _log_slow_request(request, response, view, elapsed, stats):
+    queries = ''.join(
+        f"\n  {seconds * 1000:8.1f} ms  {sql}"
+        for seconds, sql in sorted(stats.slow_queries, reverse=True)
+    )
+    slow_logger.warning(
+        f"Slow request {request.method} {request.path} ({view}) -> {response.status_code} "
+        f"in {elapsed * 1000:.0f} ms: {stats.db_queries} queries / {stats.db_seconds * 1000:.0f} ms, "
+        f"Gemini {stats.gemini_calls} call(s) / {stats.gemini_seconds * 1000:.0f} ms, "
+        f"{stats.cache_hits} cache hit(s). Slowest SQL:{queries or ' none'}"
+    )
+
+
+def record_request(view: str, status: int, seconds: float, stats: RequestStats):
+    """Fold one finished request into the per-view totals"""
+    bucket = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        totals = _views[view]
+        totals['requests'][f'{status // 100}xx'] += 1
+        if bucket < len(BUCKETS):
+            totals['buckets'][bucket] += 1
+        totals['seconds'] += seconds
+        totals['db_queries'] += stats.db_queries
+        totals['db_seconds'] += stats.db_seconds
+        totals['gemini_calls'] += stats.gemini_calls
+        totals['gemini_seconds'] += stats.gemini_seconds
+        totals['cache_hits'] += stats.cache_hits
+
+
+def reset():
+    """Clear the per-view totals (used by tests)"""
+    with _lock:
+        _views.clear()
+
+
+def _metric_name(name: str) -> str:
+    return 'jeopardy_' + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def render_prometheus() -> str:
+    """Per-view request metrics and all main.metrics counters, in Prometheus text format"""
+    with _lock:
+        views = {
+            view: {**totals, 'requests': dict(totals['requests']), 'buckets': list(totals['buckets'])}
+            for view, totals in _views.items()
+        }
+
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(f'{name}{labels} {value}' for labels, value in samples)
+
+    family('jeopardy_http_requests_total', 'counter', 'Requests handled, by view and status class', [
+        (f'{{view="{view}",status="{status}"}}', count)
+        for view, totals in sorted(views.items()) for status, count in sorted(totals['requests'].items())
+    ])
+
+    histogram = []
+    for view, totals in sorted(views.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS, totals['buckets']):
+            cumulative += count
+            histogram.append((f'_bucket{{view="{view}",le="{bound}"}}', cumulative))
+        histogram.append((f'_bucket{{view="{view}",le="+Inf"}}', sum(totals['requests'].values())))
+        histogram.append((f'_sum{{view="{view}"}}', round(totals['seconds'], 6)))
+        histogram.append((f'_count{{view="{view}"}}', sum(totals['requests'].values())))
+    # Histogram samples are (suffix + labels, value): name_bucket{...}, name_sum{...}, name_count{...}
+    family('jeopardy_http_request_duration_seconds', 'histogram', 'Request wall time, by view', histogram)
+
+    for key, name, help_text in (
+        ('db_queries', 'jeopardy_db_queries_total', 'Database queries run while handling requests, by view'),
+        ('db_seconds', 'jeopardy_db_seconds_total', 'Time spent in database queries, by view'),
+        ('gemini_calls', 'jeopardy_gemini_calls_total', 'Gemini requests (retries included) made by requests, by view'),
+        ('gemini_seconds', 'jeopardy_gemini_seconds_total', 'Time spent waiting on Gemini, by view'),
+        ('cache_hits', 'jeopardy_gemini_cache_hits_total', 'Gemini response cache hits, by view'),
+    ):
+        family(name, 'counter', help_text, [
+            (f'{{view="{view}"}}', round(totals[key], 6)) for view, totals in sorted(views.items())
+        ])
+
+    for name, value in sorted(metrics.snapshot().items()):
+        family(_metric_name(name) + '_total', 'counter', f'main.metrics counter {name}', [('', value)])
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,192 @@
+"""
+Helpers for pulling JSON out of Gemini text responses
+"""
+
+import json
+import re
+
+_FENCE = re.compile(r'^[ \t]*```[\w-]*[ \t]*$', re.MULTILINE)
+_TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+_DECODER = json.JSONDecoder()
+_STRUCTURE = re.compile(r'[{}"]')
+_STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)  # Rest of a JSON string, closing quote included
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove markdown code fence lines (```json ... ```)"""
+    return _FENCE.sub('', text) if '```' in text else text
+
+
+def _top_level_objects(text: str):
+    """
+    Yield (start, end) spans of balanced top-level {...} objects in a single
+    left-to-right pass, ignoring braces inside JSON strings. Plain text and
+    string bodies are skipped with compiled regexes rather than per character.
+    """
+    pos = text.find('{')
+
+    while pos != -1:
+        start = pos
+        depth = 1
+        pos += 1
+
+        while depth:
+            match = _STRUCTURE.search(text, pos)
+            if not match:
+                return  # Unbalanced: the rest of the text is truncated
+
+            ch = match.group()
+            if ch == '"':
+                string_end = _STRING_BODY.match(text, match.end())
+                if not string_end:
+                    return  # Unterminated string
+                pos = string_end.end()
+                continue
+
+            depth += 1 if ch == '{' else -1
+            pos = match.end()
+
+        yield start, pos
+        pos = text.find('{', pos)
+
+
+def extract_json(text: str) -> tuple:
+    """
+    Tolerantly pull a JSON object out of a model response.
+
+    Handles code fences, prose before/after the payload and trailing
+    commas. If no complete object parses (e.g. the response was cut off),
+    complete categories are salvaged from a truncated "categories" array.
+
+    Returns (data, report) where report is
+        {"complete": True}
+    or, for salvaged output,
+        {"complete": False, "recovered_categories": 4, "malformed_categories": 0}
+
+    Raises:
+        ValueError: If nothing usable was found
+    """
+    text = text or ''
+
+    # Fast path: the payload is the first object, possibly wrapped in a code
+    # fence or followed by prose. raw_decode stops at the end of the object.
+    first = text.find('{')
+    if first != -1:
+        try:
+            data, _ = _DECODER.raw_decode(text, first)
+        except json.JSONDecodeError:
+            pass
+        else:
+            if isinstance(data, dict):
+                return data, {'complete': True}
+
+    text = strip_code_fences(text)
+    for start, end in _top_level_objects(text):
+        candidate = text[start:end]
+        for attempt in (candidate, _TRAILING_COMMA.sub(r'\1', candidate)):
+            try:
+                data = json.loads(attempt)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(data, dict):
+                return data, {'complete': True}
+
+    parser = CategoryStreamParser()
+    categories = parser.feed(text)
+    if categories:
+        return {'categories': categories}, {
+            'complete': False,
+            'recovered_categories': len(categories),
+            'malformed_categories': parser.errors,
+        }
+
+    raise ValueError("No JSON object found in response")
+
+
+class CategoryStreamParser:
+    """
+    Incrementally extract complete category objects from a streamed
+    {"categories": [{...}, {...}, ...]} response.
+
+    feed() each text chunk as it arrives; it returns the categories that
+    were completed by that chunk. Parsing is a single pass that jumps
+    between structural characters, so consumed text is never rescanned
+    (only a string left unterminated at the end of a chunk is).
+    """
+
+    _ARRAY_START = re.compile(r'"categories"\s*:\s*\[')
+    _TOKENS = re.compile(r'[{}\]"]')
+
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._start = None
+        self.errors = 0  # category objects that were complete but not valid JSON
+
+    @property
+    def done(self) -> bool:
+        """True once the closing bracket of the categories array was seen"""
+        return self._done
+
+    def feed(self, chunk: str) -> list:
+        """Add a chunk of text; return any category dicts it completed"""
+        if self._done:
+            return []
+
+        self._buffer += chunk
+        found = []
+
+        if not self._in_array:
+            match = self._ARRAY_START.search(self._buffer)
+            if not match:
+                return found
+            self._in_array = True
+            self._pos = match.end()
+
+        buf = self._buffer
+        i = self._pos
+        while True:
+            match = self._TOKENS.search(buf, i)
+            if not match:
+                i = len(buf)
+                break
+
+            ch = match.group()
+            if ch == '"':
+                string_end = _STRING_BODY.match(buf, match.end())
+                if not string_end:
+                    i = match.start()  # Wait for the rest of the string
+                    break
+                i = string_end.end()
+            elif ch == '{':
+                if self._depth == 0:
+                    self._start = match.start()
+                self._depth += 1
+                i = match.end()
+            elif ch == '}' and self._depth > 0:
+                self._depth -= 1
+                i = match.end()
+                if self._depth == 0:
+                    try:
+                        found.append(json.loads(buf[self._start:i]))
+                    except json.JSONDecodeError:
+                        self.errors += 1
+                    self._start = None
+            elif ch == ']' and self._depth == 0:
+                self._done = True
+                i = match.start()
+                break
+            else:
+                i = match.end()
+
+        # Drop text that has been fully consumed
+        keep_from = self._start if self._start is not None else i
+        self._buffer = buf[keep_from:]
+        if self._start is not None:
+            self._start = 0
+        self._pos = i - keep_from
+
+        return found
@@ -0,0 +1,150 @@
+"""
+Two-tier cache for Gemini responses
+
+Responses are keyed on model + normalized prompt. An in-process
+cachetools TTLCache (LRU eviction, bounded by bytes) sits in front of a
+Django cache alias (file-backed by default) so cached responses survive
+restarts and are shared between worker processes.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+from . import instrumentation, metrics
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_memory = None
+
+
+def enabled() -> bool:
+    return getattr(settings, 'GEMINI_CACHE_ENABLED', False)
+
+
+def ttl() -> int:
+    return getattr(settings, 'GEMINI_CACHE_TTL', 86400)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so formatting-only differences share an entry"""
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def make_key(model: str, prompt: str, kind: str = 'text') -> str:
+    """Cache key for a prompt; `kind` separates text, JSON and schema responses"""
+    digest = hashlib.sha256(f"{model}\x1f{kind}\x1f{normalize_prompt(prompt)}".encode('utf-8')).hexdigest()
+    return f"gemini:{digest}"
+
+
+def _memory_tier() -> TTLCache:
+    global _memory
+    if _memory is None:
+        _memory = TTLCache(
+            maxsize=getattr(settings, 'GEMINI_CACHE_MEMORY_BYTES', 16 * 1024 * 1024),
+            ttl=ttl(),
+            getsizeof=len,
+        )
+    return _memory
+
+
+def _persistent_tier():
+    """The Django cache backing the in-process tier, or None if not configured"""
+    try:
+        return caches[getattr(settings, 'GEMINI_CACHE_ALIAS', 'gemini')]
+    except InvalidCacheBackendError:
+        return None
+
+
+def get(key: str):
+    """Cached response text for `key`, or None"""
+    with _lock:
+        text = _memory_tier().get(key)
+    if text is not None:
+        metrics.incr('llm_cache.hits.memory')
+        instrumentation.record_cache_hit()
+        return text
+
+    backend = _persistent_tier()
+    if backend is not None:
+        try:
+            text = backend.get(key)
+        except Exception as e:
+            logger.warning(f"Gemini cache read failed: {e}")
+            text = None
+        if text is not None:
+            metrics.incr('llm_cache.hits.persistent')
+            instrumentation.record_cache_hit()
+            _remember(key, text)
+            return text
+
+    metrics.incr('llm_cache.misses')
+    return None
+
+
+def _remember(key: str, text: str):
+    memory = _memory_tier()
+    if len(text) > memory.maxsize:
+        return  # Would evict the whole tier
+    with _lock:
+        memory[key] = text
+
+
+def set(key: str, text: str):
+    """Store a response that was successfully parsed/validated"""
+    if not text:
+        return
+    _remember(key, text)
+
+    backend = _persistent_tier()
+    if backend is not None:
+        try:
+            backend.set(key, text, timeout=ttl())
+        except Exception as e:
+            logger.warning(f"Gemini cache write failed: {e}")
+
+    metrics.incr('llm_cache.stores')
+    metrics.incr('llm_cache.bytes_written', len(text.encode('utf-8')))
+
+
+def clear():
+    """Drop both tiers (used by tests)"""
+    global _memory
+    with _lock:
+        _memory = None
+    backend = _persistent_tier()
+    if backend is not None:
+        backend.clear()
+
+
+def get_stats() -> dict:
+    """Hit ratio and size of the Gemini response cache"""
+    memory_hits = metrics.get('llm_cache.hits.memory')
+    persistent_hits = metrics.get('llm_cache.hits.persistent')
+    misses = metrics.get('llm_cache.misses')
+    lookups = memory_hits + persistent_hits + misses
+
+    with _lock:
+        memory = _memory_tier()
+        entries, memory_bytes = len(memory), memory.currsize
+
+    return {
+        'enabled': enabled(),
+        'ttl_seconds': ttl(),
+        'memory_hits': memory_hits,
+        'persistent_hits': persistent_hits,
+        'misses': misses,
+        'hit_ratio': round((memory_hits + persistent_hits) / lookups, 3) if lookups else None,
+        'memory_entries': entries,
+        'memory_bytes': memory_bytes,
+        'memory_max_bytes': memory.maxsize,
+        'stores': metrics.get('llm_cache.stores'),
+        'bytes_written': metrics.get('llm_cache.bytes_written'),
+    }
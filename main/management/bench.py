@@ -0,0 +1,56 @@
+"""
+Helpers shared by the bench_* management commands
+"""
+
+import math
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client
+
+
+def client() -> Client:
+    """
+    A test client for driving views from benchmark threads. Server errors
+    come back as 500s: re-raising them would also hit other threads'
+    clients, since the test client listens on a global signal. DEBUG
+    allows localhost without ALLOWED_HOSTS.
+    """
+    return Client(HTTP_HOST='localhost', raise_request_exception=False)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile, so small samples still report their slowest values"""
+    values = sorted(values)
+    return values[max(0, math.ceil(len(values) * pct) - 1)] if values else 0
+
+
+@contextmanager
+def scratch_sqlite(path, fresh: bool = False):
+    """
+    Point the default database at the SQLite file `path`, migrated, for
+    the duration of the block, then back at the configured database.
+    Every thread's connection follows, since they share the settings dict.
+    With `fresh`, the file is deleted before and after, so nothing from
+    one run leaks into the next.
+    """
+    db = connections.settings['default']
+    original_name = db['NAME']
+    files = [Path(f'{path}{suffix}') for suffix in ('', '-wal', '-shm')]
+
+    connections.close_all()
+    if fresh:
+        for file in files:
+            file.unlink(missing_ok=True)
+    db['NAME'] = str(path)
+    try:
+        call_command('migrate', verbosity=0)
+        yield
+    finally:
+        connections.close_all()
+        db['NAME'] = original_name
+        if fresh:
+            for file in files:
+                file.unlink(missing_ok=True)
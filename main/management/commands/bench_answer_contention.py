@@ -0,0 +1,143 @@
+import json
+import logging
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from main.game_logic import JeopardyGame
+from main.management import bench
+from main.models import Game, Question
+
+# SQLite connection options compared by --modes. 'baseline' is Django's
+# default rollback journal (journal_mode is persistent, so it is reset
+# explicitly); 'tuned' is the configured SQLite setup.
+SQLITE_MODES = {
+    'baseline': {'init_command': 'PRAGMA journal_mode=DELETE;'},
+}
+
+
+class Command(BaseCommand):
+    help = ("Benchmark concurrent POSTs to the answer endpoint (one game per writer, "
+            "optional state-polling readers) in a scratch SQLite database, under each "
+            "connection setup")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--readers', type=int, default=4,
+                            help="Threads polling the state endpoint while answers are written")
+        parser.add_argument('--modes', nargs='+', default=['baseline', 'tuned'],
+                            help="Connection setups to compare")
+        parser.add_argument('--db-path', default=str(settings.BASE_DIR / 'bench_answer_contention.sqlite3'),
+                            help="Scratch database, recreated for every run and deleted afterwards")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stderr.write("This benchmark writes to a scratch SQLite file; the configured database must be SQLite")
+            return
+
+        # Failed requests are counted in the table rather than logged
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        db = connections.settings['default']
+        tuned_options = dict(db.get('OPTIONS', {}))
+        board = JeopardyGame()._create_dummy_categories(6)
+
+        self.stdout.write(f"{'mode':<12}{'writers':>8}{'answers':>9}{'errors':>8}{'reads':>8}"
+                          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'answers/s':>11}")
+        # The baseline's journal_mode is persistent, so it must never touch the real database
+        with bench.scratch_sqlite(options['db_path'], fresh=True):
+            try:
+                for mode in options['modes']:
+                    connection.close()
+                    db['OPTIONS'] = SQLITE_MODES.get(mode, tuned_options)
+
+                    for writers in options['writers']:
+                        row = self._run(board, writers, options['readers'])
+                        self.stdout.write(f"{mode:<12}{writers:>8}{row['answers']:>9}{row['errors']:>8}"
+                                          f"{row['reads']:>8}{row['p50']:>9.1f}{row['p95']:>9.1f}"
+                                          f"{row['p99']:>9.1f}{row['rate']:>11.1f}")
+            finally:
+                connection.close()
+                db['OPTIONS'] = tuned_options
+
+    def _run(self, board, writers, readers):
+        games = [JeopardyGame()._save_board(board) for _ in range(writers)]
+        question_ids = {
+            game.id: list(Question.objects.filter(category__game=game).values_list('id', flat=True))
+            for game in games
+        }
+        connection.close()
+
+        latencies = []
+        errors = []
+        reads = [0]
+        lock = threading.Lock()
+        writing = threading.Event()
+        writing.set()
+
+        def write(game):
+            client = bench.client()
+            try:
+                for question_id in question_ids[game.id]:
+                    start = time.perf_counter()
+                    try:
+                        response = client.post(
+                            f'/api/game/{game.id}/answer/{question_id}/',
+                            data=json.dumps({'is_correct': question_id % 2 == 0}),
+                            content_type='application/json',
+                        )
+                        # 500s are typically OperationalError: database is locked
+                        failure = None if response.status_code == 200 else response.status_code
+                    except Exception as e:
+                        failure = e
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        if failure is None:
+                            latencies.append(elapsed)
+                        else:
+                            errors.append(failure)
+            finally:
+                connections.close_all()
+
+        def read():
+            client = bench.client()
+            try:
+                while writing.is_set():
+                    for game in games:
+                        client.get(f'/api/game/{game.id}/state/')
+                        with lock:
+                            reads[0] += 1
+            finally:
+                connections.close_all()
+
+        reader_threads = [threading.Thread(target=read) for _ in range(readers)]
+        writer_threads = [threading.Thread(target=write, args=(game,)) for game in games]
+
+        for t in reader_threads:
+            t.start()
+        wall_start = time.perf_counter()
+        for t in writer_threads:
+            t.start()
+        for t in writer_threads:
+            t.join()
+        wall = time.perf_counter() - wall_start
+        writing.clear()
+        for t in reader_threads:
+            t.join()
+
+        Game.objects.filter(id__in=[game.id for game in games]).delete()
+
+        ms = [latency * 1000 for latency in latencies]
+        return {
+            'answers': len(latencies),
+            'errors': len(errors),
+            'reads': reads[0],
+            'p50': statistics.median(ms) if ms else 0,
+            'p95': bench.percentile(ms, 0.95),
+            'p99': bench.percentile(ms, 0.99),
+            'rate': len(latencies) / wall,
+        }
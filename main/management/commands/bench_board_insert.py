@@ -0,0 +1,91 @@
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from main import question_bank
+from main.game_logic import JeopardyGame
+from main.management import bench
+from main.models import BankQuestion, Game, Category, Question
+
+
+def _insert_per_row(board):
+    """The original write path: one autocommit round trip per row"""
+    game = Game.objects.create(score=0, phase='PLAYING')
+    for idx, cat_data in enumerate(board):
+        category = Category.objects.create(game=game, title=cat_data['title'], order=idx)
+        for q_data in cat_data['questions']:
+            bank_question, _ = BankQuestion.objects.get_or_create(
+                content_hash=question_bank.content_hash(q_data['question'], q_data['answer']),
+                defaults={
+                    'category_title': cat_data['title'],
+                    'value': q_data['value'],
+                    'question_text': q_data['question'],
+                    'answer_text': q_data['answer'],
+                }
+            )
+            Question.objects.create(category=category, value=q_data['value'], bank_question=bank_question)
+    return game
+
+
+def _insert_bulk(board):
+    """The current write path: bulk inserts inside one transaction"""
+    return JeopardyGame()._save_board(board)
+
+
+class Command(BaseCommand):
+    help = "Benchmark per-game board insert latency, per-row vs bulk, at several concurrency levels"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 100])
+        parser.add_argument('--games', type=int, default=5,
+                            help="Games created by each concurrent worker")
+        parser.add_argument('--db-path', default=str(settings.BASE_DIR / 'bench_board_insert.sqlite3'),
+                            help="Scratch database, recreated for every run and deleted afterwards")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stderr.write("This benchmark writes to a scratch SQLite file; the configured database must be SQLite")
+            return
+
+        board = JeopardyGame()._create_dummy_categories(6)
+
+        self.stdout.write(f"{'mode':<10}{'workers':>8}{'games':>8}{'errors':>8}"
+                          f"{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'games/s':>10}")
+
+        with bench.scratch_sqlite(options['db_path'], fresh=True):
+            for concurrency in options['concurrency']:
+                for mode, insert in (('per-row', _insert_per_row), ('bulk', _insert_bulk)):
+                    latencies = []
+                    errors = []
+
+                    def worker():
+                        try:
+                            for _ in range(options['games']):
+                                start = time.perf_counter()
+                                try:
+                                    insert(board)
+                                except Exception as e:
+                                    errors.append(e)
+                                    continue
+                                latencies.append(time.perf_counter() - start)
+                        finally:
+                            connection.close()
+
+                    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+                    wall_start = time.perf_counter()
+                    for t in threads:
+                        t.start()
+                    for t in threads:
+                        t.join()
+                    wall = time.perf_counter() - wall_start
+
+                    p50 = statistics.median(latencies) * 1000 if latencies else 0
+                    p95 = bench.percentile(latencies, 0.95) * 1000
+                    worst = max(latencies, default=0) * 1000
+
+                    self.stdout.write(f"{mode:<10}{concurrency:>8}{len(latencies):>8}{len(errors):>8}"
+                                      f"{p50:>10.1f}{p95:>10.1f}{worst:>10.1f}{len(latencies) / wall:>10.1f}")
@@ -0,0 +1,174 @@
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from main import gemini_client
+from main.gemini_backends import FakeGeminiClient
+from main.management import bench
+from main.models import Game, Question
+
+ENDPOINTS = ['new_game', 'board', 'question', 'answer']
+
+
+class Command(BaseCommand):
+    help = ("Drive the full game flow (new game, board, question fetch, answer) at each "
+            "concurrency level against the fake Gemini backend in a scratch SQLite "
+            "database, and report throughput, latency percentiles and queries per "
+            "request for every endpoint")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, nargs='+', default=[1, 4, 16],
+                            help="Concurrent players to simulate, one run per value")
+        parser.add_argument('--games', type=int, default=2, help="Games each player plays")
+        parser.add_argument('--answers', type=int, default=30, help="Questions answered per game")
+        parser.add_argument('--latency', type=float, default=0.2, help="Fake Gemini latency in seconds")
+        parser.add_argument('--failure-rate', type=float, default=0.0,
+                            help="Fraction of fake Gemini calls that raise")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--setup-timeout', type=float, default=60,
+                            help="Seconds to wait for a queued board before giving up on the game")
+        parser.add_argument('--db-path', default=str(settings.BASE_DIR / 'bench_game_flow.sqlite3'),
+                            help="Scratch database, recreated for every run and deleted afterwards")
+        parser.add_argument('--output', help="Also write the results as JSON, for comparing runs")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stderr.write("This benchmark plays games in a scratch SQLite file; the configured database must be SQLite")
+            return
+
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        logging.getLogger('main').setLevel(logging.ERROR)
+
+        fake = FakeGeminiClient(options['latency'], options['failure_rate'], options['seed'])
+        random.seed(options['seed'])
+        results = []
+
+        self.stdout.write(f"{'users':>5}  {'endpoint':<10}{'requests':>9}{'errors':>8}{'req/s':>9}"
+                          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+        # Whatever GEMINI_BACKEND is configured, this run uses its own fake.
+        # The scratch database keeps the run away from real games and pooled boards.
+        with mock.patch.object(gemini_client, 'client', fake), \
+                mock.patch.object(gemini_client, '_build_client', return_value=fake), \
+                bench.scratch_sqlite(options['db_path'], fresh=True):
+            for users in options['users']:
+                gemini_client.breaker.reset()
+                run = self._run(users, options['games'], options['answers'], options['setup_timeout'])
+                results.append(run)
+                for endpoint in ENDPOINTS:
+                    row = run['endpoints'][endpoint]
+                    self.stdout.write(f"{users:>5}  {endpoint:<10}{row['requests']:>9}{row['errors']:>8}"
+                                      f"{row['rate']:>9.1f}{row['p50']:>9.1f}{row['p95']:>9.1f}"
+                                      f"{row['p99']:>9.1f}{row['queries']:>9.1f}")
+                self.stdout.write(f"{users:>5}  {'games/s':<10}{run['games_per_s']:>35.2f}")
+                if run['setup_timeouts']:
+                    self.stderr.write(self.style.WARNING(
+                        f"{run['setup_timeouts']} game(s) were still in SETUP after {options['setup_timeout']:.0f}s "
+                        f"and were skipped; is anything running the generation queue (GENERATION_WORKERS)?"
+                    ))
+
+        self.stdout.write(f"Fake Gemini: {fake.models.calls} calls, {fake.models.failures} injected failures")
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'options': {k: options[k] for k in ('users', 'games', 'answers', 'latency',
+                                                               'failure_rate', 'seed')},
+                           'runs': results}, f, indent=2)
+
+    @staticmethod
+    def _wait_for_board(game_id, timeout) -> bool:
+        """A queued or streamed board keeps filling in after the redirect; False if it never arrives"""
+        deadline = time.monotonic() + timeout
+        while Game.objects.filter(id=game_id, phase='SETUP').exists():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _run(self, users, games, answers, setup_timeout):
+        samples = {endpoint: [] for endpoint in ENDPOINTS}  # (seconds, queries, ok)
+        game_ids = []
+        setup_timeouts = []
+        lock = threading.Lock()
+
+        def timed(endpoint, request):
+            queries = [0]
+
+            def count(execute, sql, params, many, context):
+                queries[0] += 1
+                return execute(sql, params, many, context)
+
+            start = time.perf_counter()
+            with connection.execute_wrapper(count):
+                response = request()
+            elapsed = time.perf_counter() - start
+            ok = response.status_code < 400
+            with lock:
+                samples[endpoint].append((elapsed, queries[0], ok))
+            return response if ok else None
+
+        def play():
+            client = bench.client()
+            try:
+                for _ in range(games):
+                    response = timed('new_game', lambda: client.get('/new-game/'))
+                    if response is None:
+                        continue
+                    game_id = int(response.url.strip('/').split('/')[-1])
+                    with lock:
+                        game_ids.append(game_id)
+
+                    timed('board', lambda: client.get(f'/game/{game_id}/'))
+
+                    if not self._wait_for_board(game_id, setup_timeout):
+                        with lock:
+                            setup_timeouts.append(game_id)
+                        continue
+                    question_ids = list(
+                        Question.objects.filter(category__game_id=game_id).values_list('id', flat=True)
+                    )
+                    random.shuffle(question_ids)
+
+                    for question_id in question_ids[:answers]:
+                        timed('question', lambda: client.get(f'/api/question/{question_id}/'))
+                        timed('answer', lambda: client.post(
+                            f'/api/game/{game_id}/answer/{question_id}/',
+                            data=json.dumps({'is_correct': random.random() < 0.5}),
+                            content_type='application/json',
+                        ))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=play) for _ in range(users)]
+        wall_start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - wall_start
+
+        endpoints = {}
+        for endpoint, rows in samples.items():
+            ms = [seconds * 1000 for seconds, _, ok in rows if ok]
+            endpoints[endpoint] = {
+                'requests': len(rows),
+                'errors': sum(1 for _, _, ok in rows if not ok),
+                'rate': len(rows) / wall,
+                'p50': statistics.median(ms) if ms else 0,
+                'p95': bench.percentile(ms, 0.95),
+                'p99': bench.percentile(ms, 0.99),
+                'queries': statistics.mean(queries for _, queries, _ in rows) if rows else 0,
+            }
+        return {
+            'users': users,
+            'seconds': wall,
+            'games_per_s': (len(game_ids) - len(setup_timeouts)) / wall,
+            'endpoints': endpoints,
+            'setup_timeouts': len(setup_timeouts),
+        }
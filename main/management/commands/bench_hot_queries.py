@@ -0,0 +1,126 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from main import question_bank
+from main.game_logic import JeopardyGame
+from main.management import bench
+from main.models import BankQuestion, Category, Game, Question
+
+# Before 0006_hot_path_indexes: only the single-column foreign key indexes
+LEGACY_SQLITE_SCHEMA = [
+    'DROP INDEX main_cat_game_order_idx',
+    'DROP INDEX main_q_cat_answered_idx',
+    'CREATE INDEX bench_category_game_id ON main_category (game_id)',
+    'CREATE INDEX bench_question_category_id ON main_question (category_id)',
+]
+
+HOT_QUERIES = {
+    'board state (3 queries)': lambda game_id: JeopardyGame(game_id).get_board_state(),
+    'categories by order': lambda game_id: list(
+        Category.objects.filter(game_id=game_id).order_by('order')
+    ),
+    'unanswered in game': lambda game_id: Question.objects.filter(
+        category__game_id=game_id, is_answered=False
+    ).count(),
+    'questions by value': lambda game_id: list(
+        Question.objects.filter(category__game_id=game_id, category__order=0).order_by('value')
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = ("Seed a scratch SQLite database with many games and time the hot board "
+            "queries with the composite indexes and with the old single-column ones")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=100_000)
+        parser.add_argument('--iterations', type=int, default=2000)
+        parser.add_argument('--db-path', default=str(settings.BASE_DIR / 'bench_hot_queries.sqlite3'),
+                            help="Scratch database, kept between runs so seeding happens once")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stderr.write("This benchmark seeds a scratch SQLite file; the configured database must be SQLite")
+            return
+
+        with bench.scratch_sqlite(options['db_path']):
+            self._seed(options['games'])
+            game_ids = list(Game.objects.values_list('id', flat=True))
+            self._show_plans(game_ids[0])
+
+            self.stdout.write(f"\n{'query':<26}{'schema':<10}{'mean us':>10}{'p95 us':>10}")
+            for name, query in HOT_QUERIES.items():
+                for schema in ('indexed', 'legacy'):
+                    with transaction.atomic():
+                        if schema == 'legacy':
+                            with connection.cursor() as cursor:
+                                for statement in LEGACY_SQLITE_SCHEMA:
+                                    cursor.execute(statement)
+                        timings = self._time(query, game_ids, options['iterations'])
+                        transaction.set_rollback(True)  # Restore the indexes
+                    self.stdout.write(f"{name:<26}{schema:<10}{statistics.mean(timings):>10.0f}"
+                                      f"{bench.percentile(timings, 0.95):>10.0f}")
+
+    def _seed(self, target):
+        existing = Game.objects.count()
+        if existing >= target:
+            self.stdout.write(f"Using {existing} seeded games in {connection.settings_dict['NAME']}")
+            return
+
+        board = JeopardyGame._dummy_board(6)
+        bank_ids = question_bank.store_board(board)
+        start = time.perf_counter()
+        batch = 2000
+
+        for offset in range(existing, target, batch):
+            count = min(batch, target - offset)
+            with transaction.atomic():
+                games = Game.objects.bulk_create([
+                    Game(phase='PLAYING', question_count=30) for _ in range(count)
+                ])
+                categories = Category.objects.bulk_create([
+                    Category(game=game, title=cat_data['title'], order=order)
+                    for game in games
+                    for order, cat_data in enumerate(board)
+                ])
+                Question.objects.bulk_create([
+                    Question(
+                        category=category,
+                        value=q_data['value'],
+                        bank_question_id=bank_ids[question_bank.content_hash(q_data['question'], q_data['answer'])],
+                        is_answered=random.random() < 0.5,
+                    )
+                    for category, cat_data in zip(categories, board * count)
+                    for q_data in cat_data['questions']
+                ], batch_size=5000)
+            self.stdout.write(f"Seeded {offset + count}/{target} games", ending='\r')
+
+        self.stdout.write(f"Seeded {target - existing} games in {time.perf_counter() - start:.0f}s "
+                          f"({BankQuestion.objects.count()} bank entries)")
+
+    def _show_plans(self, game_id):
+        self.stdout.write("\nQuery plans:")
+        plans = {
+            'categories by order': Category.objects.filter(game_id=game_id).order_by('order'),
+            'unanswered in game': Question.objects.filter(category__game_id=game_id, is_answered=False),
+            'questions by value': Question.objects.filter(category__game_id=game_id, category__order=0)
+                                                  .order_by('value'),
+        }
+        for name, queryset in plans.items():
+            self.stdout.write(f"  {name}:")
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f"    {line}")
+
+    @staticmethod
+    def _time(query, game_ids, iterations):
+        timings = []
+        for game_id in random.choices(game_ids, k=iterations):
+            start = time.perf_counter()
+            query(game_id)
+            timings.append((time.perf_counter() - start) * 1_000_000)
+        return timings
@@ -0,0 +1,66 @@
+import json
+import re
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from main.json_extract import extract_json
+
+CORPUS_DIR = Path(__file__).resolve().parents[2] / 'test_data' / 'gemini_responses'
+
+
+def _regex_extract(text):
+    """The original extraction: greedy regex, then json.loads"""
+    json_match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not json_match:
+        raise ValueError("No JSON object found in response")
+    return json.loads(json_match.group())
+
+
+def _tolerant_extract(text):
+    return extract_json(text)[0]
+
+
+class Command(BaseCommand):
+    help = "Compare the greedy-regex JSON extraction with json_extract over the malformed-response corpus"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200,
+                            help="Timing iterations per corpus file")
+
+    def handle(self, *args, **options):
+        corpus = {path.name: path.read_text() for path in sorted(CORPUS_DIR.glob('*.txt'))}
+        # A long response with trailing prose, where the greedy pattern backtracks the most
+        base = corpus['clean.txt']
+        corpus['large_with_prose (synthetic)'] = base[:-2] + ', ' + ', '.join([base[16:-2]] * 50) + ']}' + ' Thanks! ' * 2000
+
+        self.stdout.write(f"{'file':<32}{'regex':>10}{'us/call':>10}{'tolerant':>10}{'us/call':>10}{'cats':>6}")
+        totals = {'regex': 0, 'tolerant': 0}
+
+        for name, text in corpus.items():
+            row = [f"{name:<32}"]
+            categories = 0
+            for label, extract in (('regex', _regex_extract), ('tolerant', _tolerant_extract)):
+                try:
+                    data = extract(text)
+                    ok = True
+                    if label == 'tolerant':
+                        categories = len(data.get('categories', []))
+                except ValueError:
+                    ok = False
+                totals[label] += ok
+
+                start = time.perf_counter()
+                for _ in range(options['repeat']):
+                    try:
+                        extract(text)
+                    except ValueError:
+                        pass
+                per_call = (time.perf_counter() - start) / options['repeat'] * 1e6
+
+                row.append(f"{'ok' if ok else 'FAIL':>10}{per_call:>10.1f}")
+            row.append(f"{categories:>6}")
+            self.stdout.write(''.join(row))
+
+        self.stdout.write(f"\nParsed: regex {totals['regex']}/{len(corpus)}, tolerant {totals['tolerant']}/{len(corpus)}")
@@ -0,0 +1,133 @@
+import asyncio
+import statistics
+import threading
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from main.game_logic import JeopardyGame
+from main.management import bench
+from main.models import Game
+from main.pubsub import game_channel, get_pubsub
+from main.websocket import websocket_application
+
+
+class _Connection:
+    """One fake WebSocket client driving the ASGI app directly"""
+
+    def __init__(self, game_id):
+        self.scope = {'type': 'websocket', 'path': f'/ws/game/{game_id}/'}
+        self.inbox = asyncio.Queue()
+        self.received = []
+        self.accepted = asyncio.Event()
+        self.waiting_for = None
+        self.arrived = None
+
+    async def receive(self):
+        return await self.inbox.get()
+
+    async def send(self, message):
+        if message['type'] == 'websocket.accept':
+            self.accepted.set()
+        elif message['type'] == 'websocket.send':
+            self.received.append(time.perf_counter())
+            if self.waiting_for is not None and len(self.received) >= self.waiting_for:
+                self.arrived.set()
+
+
+class Command(BaseCommand):
+    help = ("Hold many live-update WebSocket connections on one worker and measure "
+            "memory per connection and broadcast fan-out latency")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, nargs='+', default=[100, 1000, 5000])
+        parser.add_argument('--messages', type=int, default=20,
+                            help="Broadcasts published at each connection level")
+        parser.add_argument('--url', help="Instead of running in-process, open real connections to a "
+                                          "running ASGI server, e.g. ws://127.0.0.1:8000/ws/game/1/")
+        parser.add_argument('--hold', type=float, default=10.0,
+                            help="With --url: seconds to hold the connections open")
+
+    def handle(self, *args, **options):
+        if options['url']:
+            asyncio.run(self._hold_remote(options['url'], max(options['connections']), options['hold']))
+            return
+
+        game_logic = JeopardyGame()
+        game = game_logic._save_board(game_logic._create_dummy_categories(6))
+        try:
+            self.stdout.write(f"{'conns':>7}{'accept s':>10}{'KiB/conn':>10}"
+                              f"{'fanout p50 ms':>15}{'fanout p95 ms':>15}{'msgs/s':>12}")
+            for count in options['connections']:
+                row = asyncio.run(self._run_local(game.id, count, options['messages']))
+                self.stdout.write(f"{count:>7}{row['accept']:>10.2f}{row['kib_per_conn']:>10.1f}"
+                                  f"{row['p50']:>15.1f}{row['p95']:>15.1f}{row['delivered_per_s']:>12.0f}")
+        finally:
+            Game.objects.filter(id=game.id).delete()
+
+    async def _run_local(self, game_id, count, messages):
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+        connections = [_Connection(game_id) for _ in range(count)]
+        start = time.perf_counter()
+        tasks = []
+        for conn in connections:
+            conn.inbox.put_nowait({'type': 'websocket.connect'})
+            tasks.append(asyncio.ensure_future(websocket_application(conn.scope, conn.receive, conn.send)))
+        await asyncio.gather(*(conn.accepted.wait() for conn in connections))
+        while get_pubsub().subscriber_count() < count:
+            await asyncio.sleep(0.01)
+        accept_time = time.perf_counter() - start
+
+        held = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+
+        # Publish from another thread, as a request thread would
+        latencies = []
+        channel = game_channel(game_id)
+        loop_start = time.perf_counter()
+        for n in range(messages):
+            for conn in connections:
+                conn.waiting_for = len(conn.received) + 1
+                conn.arrived = asyncio.Event()
+            sent_at = time.perf_counter()
+            thread = threading.Thread(target=get_pubsub().publish,
+                                      args=(channel, {'type': 'answer', 'version': n}))
+            thread.start()
+            await asyncio.gather(*(conn.arrived.wait() for conn in connections))
+            thread.join()
+            latencies.append((max(conn.received[-1] for conn in connections) - sent_at) * 1000)
+        elapsed = time.perf_counter() - loop_start
+
+        for conn in connections:
+            conn.inbox.put_nowait({'type': 'websocket.disconnect'})
+        await asyncio.gather(*tasks)
+
+        return {
+            'accept': accept_time,
+            'kib_per_conn': held / count / 1024,
+            'p50': statistics.median(latencies),
+            'p95': bench.percentile(latencies, 0.95),
+            'delivered_per_s': count * messages / elapsed,
+        }
+
+    async def _hold_remote(self, url, count, hold):
+        from websockets.asyncio.client import connect
+
+        async def open_one():
+            start = time.perf_counter()
+            socket = await connect(url)
+            await socket.recv()  # The snapshot
+            return socket, time.perf_counter() - start
+
+        results = await asyncio.gather(*(open_one() for _ in range(count)), return_exceptions=True)
+        sockets = [r[0] for r in results if not isinstance(r, BaseException)]
+        latencies = [r[1] * 1000 for r in results if not isinstance(r, BaseException)]
+        self.stdout.write(f"Opened {len(sockets)}/{count} connections "
+                          f"(snapshot p50 {statistics.median(latencies) if latencies else 0:.1f} ms, "
+                          f"p95 {bench.percentile(latencies, 0.95):.1f} ms); holding for {hold:.0f}s")
+
+        await asyncio.sleep(hold)
+        await asyncio.gather(*(socket.close() for socket in sockets))
@@ -0,0 +1,108 @@
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# What a worker imports before it can serve: settings, apps and the URLconf
+# (and through it every view module)
+BOOT = 'import django; django.setup(); import mysite.urls'
+
+TRACKED_MODULES = ['django', 'google.genai', 'pydantic', 'httpx', 'main.gemini_client', 'main.game_logic',
+                   'main.views']
+
+_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| *(\S+)$')
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = ("Measure worker startup: import time per module (python -X importtime), "
+            "process boot time and time from process start to first HTTP response")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--path', default='/', help="URL requested for time-to-first-response")
+        parser.add_argument('--timeout', type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        runs = options['runs']
+        imports = [self._import_times() for _ in range(runs)]
+        boots = [self._boot_time() for _ in range(runs)]
+        first = [self._first_response(options['path'], options['timeout']) for _ in range(runs)]
+
+        self.stdout.write(f"Import time (cumulative ms, median of {runs} runs):")
+        for module in ['(total)'] + TRACKED_MODULES:
+            values = [run.get(module) for run in imports]
+            if any(value is None for value in values):
+                self.stdout.write(f"  {module:<24}{'not imported':>12}")
+            else:
+                self.stdout.write(f"  {module:<24}{statistics.median(values):>12.1f}")
+
+        self.stdout.write(f"\n{'':<26}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+        for label, values in (('process boot', boots), ('time to first response', first)):
+            ms = [value * 1000 for value in values]
+            self.stdout.write(f"{label:<26}{statistics.median(ms):>12.0f}{min(ms):>10.0f}{max(ms):>10.0f}")
+
+    def _import_times(self) -> dict:
+        """{module: cumulative ms} from one cold `python -X importtime` boot"""
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT],
+            cwd=settings.BASE_DIR, env=_env(), capture_output=True, text=True, check=True,
+        )
+        times = {}
+        total_us = 0
+        for line in result.stderr.splitlines():
+            match = _IMPORTTIME.match(line)
+            if not match:
+                continue
+            self_us, cumulative_us, module = match.groups()
+            total_us += int(self_us)
+            # A module imported at several depths: keep its outermost (largest) figure
+            times[module] = max(times.get(module, 0), int(cumulative_us) / 1000)
+        times['(total)'] = total_us / 1000
+        return times
+
+    def _boot_time(self) -> float:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', BOOT], cwd=settings.BASE_DIR, env=_env(), check=True)
+        return time.perf_counter() - start
+
+    def _first_response(self, path: str, timeout: float) -> float:
+        """Seconds from spawning a dev server to its first response on `path`"""
+        port = _free_port()
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload', '--skip-checks'],
+            cwd=settings.BASE_DIR, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            while time.perf_counter() - start < timeout:
+                try:
+                    urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=timeout).close()
+                    return time.perf_counter() - start
+                except urllib.error.HTTPError:
+                    return time.perf_counter() - start  # Any response counts
+                except OSError:
+                    time.sleep(0.005)  # Not listening yet
+            raise TimeoutError(f"No response from the dev server within {timeout}s")
+        finally:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from main import archival
+
+
+class Command(BaseCommand):
+    help = "Archive completed games into compact summaries and delete abandoned ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archive-after', type=float, default=None,
+                            help="Seconds after completion before a game is archived "
+                                 "(defaults to GAME_ARCHIVE_AFTER)")
+        parser.add_argument('--stale-ttl', type=float, default=None,
+                            help="Seconds of inactivity before a SETUP/PLAYING game is deleted "
+                                 "(defaults to GAME_STALE_TTL)")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Games per delete transaction (defaults to GAME_ARCHIVE_BATCH_SIZE)")
+        parser.add_argument('--pause', type=float, default=None,
+                            help="Seconds to sleep between batches (defaults to GAME_ARCHIVE_PAUSE)")
+        parser.add_argument('--vacuum', action='store_true',
+                            help="SQLite only: VACUUM afterwards to shrink the database file")
+
+    def handle(self, *args, **options):
+        report = archival.compact(
+            archive_after=options['archive_after'],
+            stale_ttl=options['stale_ttl'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            vacuum=options['vacuum'],
+        )
+        reclaimed = report['bytes_reclaimed']
+        size = f"{reclaimed / 1024:.1f} KiB" if reclaimed is not None else "unknown (not SQLite)"
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {report['archived']} completed game(s), purged {report['purged']} stale game(s) "
+            f"in {report['seconds']:.2f}s: {report['rows_deleted']} rows deleted "
+            f"({report['rows_reclaimed']} net), {size} reclaimed"
+        ))
@@ -0,0 +1,180 @@
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+# Nothing that touches the app registry is imported at module level: worker
+# processes may be spawned, and they import this module (for
+# _generate_board) before _init_worker has set Django up.
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _generate_board(num_categories: int) -> tuple:
+    """Runs in a worker process: (board, used_fallback). Boards are plain data, written by the parent."""
+    from main.game_logic import JeopardyGame
+
+    game_logic = JeopardyGame()
+    board = game_logic._generate_with_gemini(num_categories)
+    return board, game_logic.used_fallback
+
+
+class _InlineExecutor:
+    """--workers 0: generate in this process, one board at a time"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Command(BaseCommand):
+    help = ("Generate boards in bulk into the board pool across a process pool, rate limited "
+            "to a Gemini requests-per-minute quota, checkpointing progress so an interrupted "
+            "run resumes where it stopped")
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help="Boards to add to the pool")
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Generator processes (0 generates in this process)")
+        parser.add_argument('--rpm', type=float, default=0,
+                            help="Gemini requests per minute to stay under (0 = no limit)")
+        parser.add_argument('--batch-size', type=int, default=20, help="Boards per bulk write")
+        parser.add_argument('--num-categories', type=int, default=6)
+        parser.add_argument('--max-failures', type=int, default=20,
+                            help="Stop (keeping the checkpoint) after this many failed boards")
+        parser.add_argument('--checkpoint', default=None,
+                            help="Progress file (defaults to pregenerate_boards.checkpoint.json "
+                                 "in the project directory)")
+        parser.add_argument('--fresh', action='store_true', help="Ignore an existing checkpoint")
+
+    def handle(self, *args, **options):
+        from main import board_pool, gemini_client
+        from main.game_logic import generation_mode
+
+        if gemini_client.backend() in ('fake', 'replay'):
+            self.stderr.write(self.style.WARNING(
+                f"GEMINI_BACKEND={gemini_client.backend()}: these boards hold synthesized placeholder "
+                f"content and players will be served them from the pool"
+            ))
+
+        target = options['count']
+        num_categories = options['num_categories']
+        checkpoint = Path(options['checkpoint'] or Path(settings.BASE_DIR) / 'pregenerate_boards.checkpoint.json')
+
+        progress = {'target': target, 'written': 0, 'failed': 0, 'seconds': 0.0}
+        if checkpoint.exists() and not options['fresh']:
+            progress.update(json.loads(checkpoint.read_text()), target=target)
+            self.stdout.write(f"Resuming from {checkpoint}: {progress['written']} board(s) already written")
+        run_written = run_failed = 0
+
+        # Per-category mode makes one request per category, board mode one per board
+        calls_per_board = num_categories if generation_mode() == 'per_category' else 1
+        interval = 60 * calls_per_board / options['rpm'] if options['rpm'] else 0
+        workers = options['workers']
+        in_flight_limit = max(1, workers * 2)
+
+        if workers > 0:
+            # Forked children must not share this process's database connections
+            connections.close_all()
+            executor = ProcessPoolExecutor(workers, initializer=_init_worker)
+        else:
+            executor = _InlineExecutor()
+
+        start = time.perf_counter()
+        mark = [start]  # When progress['seconds'] was last brought up to date
+        buffer = []
+        pending = set()
+        to_submit = max(0, target - progress['written'])
+        next_at = time.monotonic()
+
+        def flush():
+            nonlocal run_written
+            if buffer:
+                board_pool.add_boards(buffer)
+                progress['written'] += len(buffer)
+                run_written += len(buffer)
+                buffer.clear()
+            progress['seconds'] = round(progress['seconds'] + time.perf_counter() - mark[0], 3)
+            mark[0] = time.perf_counter()
+            tmp = checkpoint.with_suffix('.tmp')
+            tmp.write_text(json.dumps(progress))
+            tmp.replace(checkpoint)
+
+        try:
+            with executor as pool:
+                while to_submit or pending:
+                    # Submit while under the in-flight cap and the rate limit allows
+                    while to_submit and len(pending) < in_flight_limit and time.monotonic() >= next_at:
+                        pending.add(pool.submit(_generate_board, num_categories))
+                        to_submit -= 1
+                        next_at = max(next_at, time.monotonic() - interval) + interval
+
+                    can_submit = to_submit and len(pending) < in_flight_limit
+                    timeout = max(0.0, next_at - time.monotonic()) if can_submit else None
+                    done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        try:
+                            board, used_fallback = future.result()
+                        except Exception as e:
+                            self.stderr.write(f"Board generation crashed: {e}")
+                            used_fallback = True
+                        if used_fallback:
+                            # Placeholder boards aren't pooled; generate another in their place
+                            progress['failed'] += 1
+                            run_failed += 1
+                            to_submit += 1
+                        else:
+                            buffer.append(board)
+
+                    if len(buffer) >= options['batch_size']:
+                        flush()
+                        self._report_progress(progress, run_written, run_failed, start)
+
+                    if run_failed >= options['max_failures']:
+                        for future in pending:
+                            future.cancel()
+                        flush()
+                        raise CommandError(
+                            f"Stopped after {run_failed} failed boards; {progress['written']}/{target} written. "
+                            f"Run again to resume from {checkpoint}"
+                        )
+        except KeyboardInterrupt:
+            flush()
+            self.stderr.write(f"Interrupted; {progress['written']}/{target} written. Run again to resume.")
+            return
+
+        flush()
+        checkpoint.unlink()
+
+        elapsed = time.perf_counter() - start
+        attempts = run_written + run_failed
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {run_written} board(s) in {elapsed:.1f}s: {run_written / elapsed * 60:.1f} boards/min, "
+            f"{run_failed} failed ({run_failed / attempts * 100 if attempts else 0:.1f}% failure rate); "
+            f"pool depth is {board_pool.pool_depth()}"
+        ))
+
+    def _report_progress(self, progress, run_written, run_failed, start):
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{progress['written']}/{progress['target']} boards, "
+            f"{run_written / elapsed * 60:.1f} boards/min, {run_failed} failed"
+        )
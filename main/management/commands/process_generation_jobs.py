@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main import generation_queue
+
+
+class Command(BaseCommand):
+    help = ("Run queued board generation jobs: drain the queue once, or keep worker "
+            "threads running alongside (or instead of) the web processes' own workers")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Run every queued job in this thread, then exit")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Worker threads to run (defaults to GENERATION_WORKERS, at least 1)")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            requeued = generation_queue.requeue_stale()
+            done = generation_queue.run_pending()
+            stats = generation_queue.get_stats()
+            self.stdout.write(self.style.SUCCESS(
+                f"Ran {done} generation job(s) ({requeued} requeued as stale); "
+                f"{stats['depth']} queued, {stats['running']} running elsewhere"
+            ))
+            return
+
+        workers = options['workers'] or max(1, getattr(settings, 'GENERATION_WORKERS', 2))
+        generation_queue.start_workers(workers)
+        self.stdout.write(f"Processing generation jobs with {workers} worker(s); Ctrl-C to stop")
+        try:
+            while True:
+                time.sleep(60)
+                generation_queue.start_workers(workers)  # Replace any worker that died
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from main.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute each game's question/answered/correct counters from its questions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('game_ids', nargs='*', type=int,
+                            help="Only rebuild these games (default: all)")
+
+    def handle(self, *args, **options):
+        updated = rebuild_counters(game_ids=options['game_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters for {updated} game(s)"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from main import board_pool
+
+
+class Command(BaseCommand):
+    help = "Generate boards until the board pool reaches its target depth"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--depth', type=int, default=None,
+                            help="Target pool depth (defaults to BOARD_POOL_DEPTH)")
+
+    def handle(self, *args, **options):
+        added = board_pool.refill_pool(depth=options['depth'])
+        stats = board_pool.get_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {added} board(s); pool depth is {stats['depth']}/{stats['target_depth']}"
+        ))
@@ -0,0 +1,46 @@
+"""
+Lightweight in-process counters for operational stats
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_events = defaultdict(lambda: deque(maxlen=1000))
+
+
+def incr(name: str, amount: int = 1):
+    """Increment a named counter"""
+    with _lock:
+        _counters[name] += amount
+        _events[name].append((time.monotonic(), amount))
+
+
+def get(name: str) -> int:
+    """Current value of a named counter"""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def rate_per_minute(name: str, window: float = 600.0) -> float:
+    """Average increments per minute over the last `window` seconds"""
+    cutoff = time.monotonic() - window
+    with _lock:
+        total = sum(amount for ts, amount in _events.get(name, ()) if ts >= cutoff)
+    return total / (window / 60.0)
+
+
+def snapshot() -> dict:
+    """Copy of all counters"""
+    with _lock:
+        return dict(_counters)
+
+
+def reset():
+    """Clear all counters (used by tests)"""
+    with _lock:
+        _counters.clear()
+        _events.clear()
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='game',
+            name='phase',
+            field=models.CharField(choices=[('POOLED', 'Pooled'), ('SETUP', 'Setup'), ('PLAYING', 'Playing'), ('COMPLETE', 'Complete')], default='SETUP', max_length=20),
+        ),
+    ]
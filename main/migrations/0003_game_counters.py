@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:17
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(Question, condition=Q()):
+    subquery = (
+        Question.objects.filter(condition, category__game=OuterRef('pk'))
+        .order_by()
+        .values('category__game')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+
+def rebuild_counters(Game, Question, game_ids=None):
+    """Frozen copy of main.counters.rebuild_counters as of this migration"""
+    games = Game.objects.all()
+    if game_ids:
+        games = games.filter(id__in=game_ids)
+
+    games.update(
+        question_count=_count(Question),
+        answered_count=_count(Question, Q(is_answered=True)),
+        correct_count=_count(Question, Q(is_answered=True, player_correct=True)),
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    rebuild_counters(apps.get_model('main', 'Game'), apps.get_model('main', 'Question'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_game_pooled_phase'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='answered_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='correct_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='question_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:21
+
+import hashlib
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize(text):
+    """Frozen copy of main.question_bank.normalize as of this migration"""
+    text = re.sub(r'\s+', ' ', str(text)).strip().lower()
+    return text.strip(' .?!"\'')
+
+
+def content_hash(question, answer):
+    """Frozen copy of main.question_bank.content_hash as of this migration"""
+    key = f"{normalize(question)}\x1f{normalize(answer)}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def fold_questions_into_bank(apps, schema_editor):
+    """Move every existing question's text into the bank, deduplicating as we go"""
+    BankQuestion = apps.get_model('main', 'BankQuestion')
+    Question = apps.get_model('main', 'Question')
+
+    bank_ids = {}
+    questions = list(Question.objects.select_related('category').order_by('id'))
+
+    for question in questions:
+        digest = content_hash(question.question_text, question.answer_text)
+        if digest not in bank_ids:
+            bank_ids[digest] = BankQuestion.objects.create(
+                content_hash=digest,
+                category_title=question.category.title,
+                value=question.value,
+                question_text=question.question_text,
+                answer_text=question.answer_text,
+            ).id
+        question.bank_question_id = bank_ids[digest]
+
+    Question.objects.bulk_update(questions, ['bank_question'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_game_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('category_title', models.CharField(max_length=100)),
+                ('value', models.IntegerField(default=200)),
+                ('question_text', models.TextField()),
+                ('answer_text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='bank_question',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='uses', to='main.bankquestion'),
+        ),
+        migrations.RunPython(fold_questions_into_bank),
+        migrations.RemoveField(
+            model_name='question',
+            name='answer_text',
+        ),
+        migrations.RemoveField(
+            model_name='question',
+            name='question_text',
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='bank_question',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='uses', to='main.bankquestion'),
+        ),
+    ]
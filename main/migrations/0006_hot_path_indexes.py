@@ -0,0 +1,84 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Min, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(Question, condition=Q()):
+    subquery = (
+        Question.objects.filter(condition, category__game=OuterRef('pk'))
+        .order_by()
+        .values('category__game')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+
+def rebuild_counters(Game, Question, game_ids=None):
+    """Frozen copy of main.counters.rebuild_counters as of this migration"""
+    games = Game.objects.all()
+    if game_ids:
+        games = games.filter(id__in=game_ids)
+
+    games.update(
+        question_count=_count(Question),
+        answered_count=_count(Question, Q(is_answered=True)),
+        correct_count=_count(Question, Q(is_answered=True, player_correct=True)),
+    )
+
+
+def drop_duplicate_values(apps, schema_editor):
+    """Keep the first question for each (category, value) so the constraint can be added"""
+    Game = apps.get_model('main', 'Game')
+    Question = apps.get_model('main', 'Question')
+
+    duplicates = (
+        Question.objects.values('category', 'value')
+        .annotate(copies=Count('id'), keep=Min('id'))
+        .filter(copies__gt=1)
+    )
+    game_ids = set()
+    for dup in duplicates:
+        extra = Question.objects.filter(category=dup['category'], value=dup['value']).exclude(id=dup['keep'])
+        game_ids.update(extra.values_list('category__game', flat=True))
+        extra.delete()
+
+    if game_ids:
+        rebuild_counters(Game, Question, game_ids=game_ids)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_game_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['game', 'order'], name='main_cat_game_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['category', 'is_answered'], name='main_q_cat_answered_idx'),
+        ),
+        migrations.RunPython(drop_duplicate_values, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='question',
+            constraint=models.UniqueConstraint(fields=('category', 'value'), name='main_q_cat_value_uniq'),
+        ),
+        # The composite indexes above lead with these columns
+        migrations.AlterField(
+            model_name='category',
+            name='game',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='categories', to='main.game'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='main.category'),
+        ),
+    ]
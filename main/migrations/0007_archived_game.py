@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedGame',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game_id', models.BigIntegerField(unique=True)),
+                ('created_at', models.DateTimeField()),
+                ('completed_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('score', models.IntegerField(default=0)),
+                ('question_count', models.IntegerField(default=0)),
+                ('correct_count', models.IntegerField(default=0)),
+                ('accuracy', models.FloatField(default=0)),
+                ('board', models.JSONField(default=list)),
+            ],
+        ),
+    ]
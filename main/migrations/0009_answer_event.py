@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_generation_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64)),
+                ('is_correct', models.BooleanField()),
+                ('applied', models.BooleanField()),
+                ('points', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('game', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='answer_events', to='main.game')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_events', to='main.question')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('game', 'idempotency_key'), name='main_answer_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:27
+
+from django.db import migrations, models
+
+
+def exclude_fake_content(apps, schema_editor):
+    """Boards synthesized by the fake Gemini backend were banked before this flag existed"""
+    BankQuestion = apps.get_model('main', 'BankQuestion')
+    # Frozen copy of gemini_backends.FAKE_TITLE_PREFIX
+    BankQuestion.objects.filter(category_title__startswith='Fake Category ').update(reusable=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_answer_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankquestion',
+            name='reusable',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(exclude_fake_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_bank_question_reusable'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bankquestion',
+            index=models.Index(condition=models.Q(('reusable', True)), fields=['category_title', 'value'], name='main_bank_title_value_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_bank_question_title_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='lease',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
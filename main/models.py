@@ -9,12 +9,19 @@ class Game(models.Model):
     phase = models.CharField(
         max_length=20,
         choices=[
+            ('POOLED', 'Pooled'),
             ('SETUP', 'Setup'),
             ('PLAYING', 'Playing'),
             ('COMPLETE', 'Complete')
         ],
         default='SETUP'
     )
+    # Maintained by JeopardyGame so completion and stats need no COUNT queries
+    question_count = models.IntegerField(default=0)
+    answered_count = models.IntegerField(default=0)
+    correct_count = models.IntegerField(default=0)
+    # Bumped on every change to the board state; used as the state API's ETag
+    version = models.PositiveIntegerField(default=0)
     
     def __str__(self):
         return f"Game {self.id} - Score: {self.score}"
@@ -22,25 +29,150 @@ class Game(models.Model):
 
 class Category(models.Model):
     """Represents a category on the Jeopardy board"""
-    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='categories')
+    # Indexed by (game, order) below, which also serves lookups by game alone
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='categories', db_index=False)
     title = models.CharField(max_length=100)
     order = models.IntegerField(default=0)  # Position on board
     
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['game', 'order'], name='main_cat_game_order_idx'),
+        ]
     
     def __str__(self):
         return self.title
 
 
-class Question(models.Model):
-    """Represents a Jeopardy question"""
-    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='questions')
-    value = models.IntegerField(default=200)  # Jeopardy values: 200, 400, 600, 800, 1000
+class BankQuestion(models.Model):
+    """A unique question/answer pair, shared by every game that uses it"""
+    content_hash = models.CharField(max_length=64, unique=True)  # See question_bank.content_hash
+    category_title = models.CharField(max_length=100)
+    value = models.IntegerField(default=200)
     question_text = models.TextField()
     answer_text = models.TextField()
+    # False for synthesized content (fake Gemini backend): kept so games can
+    # reference it, but never offered to new boards
+    reusable = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            # question_bank.assemble_categories groups reusable entries by
+            # title on every new board; this keeps that a walk in index order
+            models.Index(
+                fields=['category_title', 'value'], condition=models.Q(reusable=True),
+                name='main_bank_title_value_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.category_title} - ${self.value}: {self.question_text[:50]}"
+
+
+class Question(models.Model):
+    """Represents a Jeopardy question on a specific game's board"""
+    # Indexed by the (category, value) constraint below
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='questions', db_index=False)
+    bank_question = models.ForeignKey(BankQuestion, on_delete=models.PROTECT, related_name='uses')
+    value = models.IntegerField(default=200)  # Jeopardy values: 200, 400, 600, 800, 1000
     is_answered = models.BooleanField(default=False)
     player_correct = models.BooleanField(default=False)  # Did the player get it right?
     
+    class Meta:
+        constraints = [
+            # One question per value on each category; its index serves the
+            # board's per-category ordering by value
+            models.UniqueConstraint(fields=['category', 'value'], name='main_q_cat_value_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['category', 'is_answered'], name='main_q_cat_answered_idx'),
+        ]
+    
+    @property
+    def question_text(self):
+        return self.bank_question.question_text
+    
+    @property
+    def answer_text(self):
+        return self.bank_question.answer_text
+    
     def __str__(self):
         return f"{self.category.title} - ${self.value}: {self.question_text[:50]}"
+
+
+class ArchivedGame(models.Model):
+    """Compact summary of a completed game, kept after its board rows are deleted (see archival.py)"""
+    game_id = models.BigIntegerField(unique=True)  # The original Game's id
+    created_at = models.DateTimeField()
+    completed_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    score = models.IntegerField(default=0)
+    question_count = models.IntegerField(default=0)
+    correct_count = models.IntegerField(default=0)
+    accuracy = models.FloatField(default=0)  # Percent of questions answered correctly
+    # [{"title": ..., "questions": [[value, bank_question_id, player_correct or null if unanswered]]}]
+    board = models.JSONField(default=list)
+    
+    def get_final_stats(self) -> dict:
+        """Same shape as JeopardyGame.get_final_stats()"""
+        return {
+            'final_score': self.score,
+            'total_questions': self.question_count,
+            'correct_answers': self.correct_count,
+            'accuracy': f"{self.accuracy:.1f}%"
+        }
+    
+    def __str__(self):
+        return f"Archived game {self.game_id} - Score: {self.score}"
+
+
+class GenerationJob(models.Model):
+    """Queued board generation for a game created in SETUP (see generation_queue.py)"""
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    # One job per game: enqueueing the same game twice returns the existing job
+    game = models.OneToOneField(Game, on_delete=models.CASCADE, related_name='generation_job')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    num_categories = models.IntegerField(default=6)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Token of the claim currently running the job; a requeue and re-claim replaces it
+    lease = models.CharField(max_length=32, blank=True)
+    
+    class Meta:
+        indexes = [
+            # Workers claim the oldest queued job; stale RUNNING jobs are found by start time
+            models.Index(fields=['status', 'id'], name='main_job_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Generation job for game {self.game_id} - {self.status}"
+
+
+class AnswerEvent(models.Model):
+    """An answer submitted to the batch endpoint, keyed by the client's idempotency key"""
+    # Lookups are by (game, idempotency_key), covered by the unique constraint
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='answer_events', db_index=False)
+    idempotency_key = models.CharField(max_length=64)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='answer_events')
+    is_correct = models.BooleanField()
+    applied = models.BooleanField()  # False if the question had already been answered
+    points = models.IntegerField(default=0)  # Score change this answer caused
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'idempotency_key'], name='main_answer_key_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"Answer {self.idempotency_key} to question {self.question_id} - {'applied' if self.applied else 'ignored'}"
@@ -0,0 +1,107 @@
+"""
+Publish/subscribe for live game updates
+
+Publishers are ordinary sync code (request threads, the streaming
+thread); subscribers are asyncio queues owned by WebSocket connections on
+the ASGI event loop. The backend is chosen by LIVE_UPDATES_BACKEND. The
+default only reaches subscribers in the same process; a cross-process
+broker (e.g. Redis pub/sub) can replace it by implementing the same
+subscribe / unsubscribe / publish / subscriber_count methods.
+"""
+
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class InProcessPubSub:
+    """Fan-out to asyncio queues in this process, safe to publish from any thread"""
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(dict)  # channel -> {queue: loop}
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        """Register a queue on the running event loop for `channel`"""
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers[channel][queue] = loop
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.pop(queue, None)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channel: str, message: dict) -> int:
+        """Queue `message` for every subscriber of `channel`; returns how many there were"""
+        by_loop = defaultdict(list)
+        with self._lock:
+            for queue, loop in self._subscribers.get(channel, {}).items():
+                by_loop[loop].append(queue)
+
+        # One wake-up per event loop rather than one per subscriber
+        for loop, queues in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(self._deliver, queues, message)
+            except RuntimeError:
+                for queue in queues:
+                    self.unsubscribe(channel, queue)  # Their event loop has closed
+
+        metrics.incr('live.published')
+        return sum(len(queues) for queues in by_loop.values())
+
+    @staticmethod
+    def _deliver(queues: list, message: dict):
+        delivered = 0
+        for queue in queues:
+            try:
+                queue.put_nowait(message)
+                delivered += 1
+            except asyncio.QueueFull:
+                # Slow client: it will see a gap in `version` and resync
+                metrics.incr('live.dropped')
+        metrics.incr('live.delivered', delivered)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+def get_pubsub():
+    """The process-wide backend named by LIVE_UPDATES_BACKEND"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            backend_class = import_string(
+                getattr(settings, 'LIVE_UPDATES_BACKEND', 'main.pubsub.InProcessPubSub')
+            )
+            _backend = backend_class(max_queue=getattr(settings, 'LIVE_UPDATES_QUEUE_SIZE', 100))
+        return _backend
+
+
+def game_channel(game_id: int) -> str:
+    return f"game.{game_id}"
+
+
+def publish_game_event(game_id: int, event: dict):
+    """
+    Broadcast a board/score delta to everyone watching a game. Sent once the
+    current transaction commits, so subscribers never see rolled-back state.
+    """
+    message = {'game_id': game_id, **event}
+    transaction.on_commit(lambda: get_pubsub().publish(game_channel(game_id), message))
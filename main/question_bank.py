@@ -0,0 +1,161 @@
+"""
+Content-addressed question bank shared across games
+
+Every question/answer pair is stored once, keyed by a hash of its
+normalized text. Games reference bank entries, and new boards can be
+assembled from the bank so Gemini is only asked to top them up.
+"""
+
+import hashlib
+import random
+import re
+
+from django.conf import settings
+from django.db.models import Count
+
+from . import gemini_backends, metrics
+from .models import BankQuestion, Question
+
+BOARD_VALUES = [200, 400, 600, 800, 1000]
+
+_placeholder_hashes = None
+
+
+def normalize(text: str) -> str:
+    """Case-fold, collapse whitespace and strip surrounding punctuation"""
+    text = re.sub(r'\s+', ' ', str(text)).strip().lower()
+    return text.strip(' .?!"\'')
+
+
+def content_hash(question: str, answer: str) -> str:
+    """Stable key for a question/answer pair"""
+    key = f"{normalize(question)}\x1f{normalize(answer)}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def store_board(board: list) -> dict:
+    """
+    Make sure every question in a validated board is in the bank.
+    Returns {content_hash: BankQuestion id}.
+    """
+    entries = {}
+    for category in board:
+        for q_data in category['questions']:
+            digest = content_hash(q_data['question'], q_data['answer'])
+            entries.setdefault(digest, BankQuestion(
+                content_hash=digest,
+                category_title=category['title'],
+                value=q_data['value'],
+                question_text=q_data['question'],
+                answer_text=q_data['answer'],
+                reusable=not gemini_backends.is_fake_title(category['title']),
+            ))
+
+    ids = dict(
+        BankQuestion.objects.filter(content_hash__in=entries)
+        .values_list('content_hash', 'id')
+    )
+    missing = [entry for digest, entry in entries.items() if digest not in ids]
+    metrics.incr('question_bank.duplicates', len(entries) - len(missing))
+
+    if missing:
+        # ignore_conflicts: a concurrent writer may have banked the same question
+        BankQuestion.objects.bulk_create(missing, ignore_conflicts=True)
+        ids.update(
+            BankQuestion.objects.filter(content_hash__in=[entry.content_hash for entry in missing])
+            .values_list('content_hash', 'id')
+        )
+        metrics.incr('question_bank.new_entries', len(missing))
+
+    return ids
+
+
+def _placeholders() -> set:
+    """Hashes of the hardcoded fallback questions, which are never reused"""
+    global _placeholder_hashes
+    if _placeholder_hashes is None:
+        from .game_logic import JeopardyGame
+        _placeholder_hashes = {
+            content_hash(q_data['question'], q_data['answer'])
+            for category in JeopardyGame._dummy_board(6)
+            for q_data in category['questions']
+        }
+    return _placeholder_hashes
+
+
+def categories_per_board(num_categories: int) -> int:
+    """How many categories of a new board may come from the bank"""
+    return min(num_categories, getattr(settings, 'QUESTION_BANK_CATEGORIES', 0))
+
+
+def _reusable():
+    return BankQuestion.objects.filter(reusable=True).exclude(content_hash__in=_placeholders())
+
+
+def full_category_titles(exclude_titles=()):
+    """
+    Titles with a banked question at every board value. Served by
+    main_bank_title_value_idx: a walk in title order, no sort.
+    """
+    return (
+        _reusable().filter(value__in=BOARD_VALUES)
+        .exclude(category_title__in=list(exclude_titles))
+        .values('category_title')
+        .annotate(values=Count('value', distinct=True))
+        .filter(values=len(BOARD_VALUES))
+        .values_list('category_title', flat=True)
+    )
+
+
+def assemble_categories(count: int, exclude_titles=()) -> list:
+    """
+    Build up to `count` complete categories from the bank, in the same
+    format as JeopardyGame._save_board takes. Returns fewer (possibly none)
+    when the bank doesn't hold enough full categories.
+    """
+    if count <= 0:
+        return []
+
+    banked = _reusable()
+    titles = list(full_category_titles(exclude_titles))
+    titles = random.sample(titles, k=min(count, len(titles)))
+    if not titles:
+        return []
+
+    candidates = {}
+    for entry in banked.filter(category_title__in=titles, value__in=BOARD_VALUES):
+        candidates.setdefault((entry.category_title, entry.value), []).append(entry)
+
+    board = [
+        {
+            'title': title,
+            'questions': [
+                {
+                    'value': value,
+                    'question': entry.question_text,
+                    'answer': entry.answer_text,
+                }
+                for value in BOARD_VALUES
+                for entry in [random.choice(candidates[(title, value)])]
+            ],
+        }
+        for title in titles
+    ]
+
+    metrics.incr('question_bank.reused_categories', len(board))
+    return board
+
+
+def get_stats() -> dict:
+    """Bank size and how much reuse it is getting"""
+    entries = BankQuestion.objects.count()
+    references = Question.objects.count()
+
+    return {
+        'bank_entries': entries,
+        'question_references': references,
+        'dedup_ratio': round(references / entries, 3) if entries else None,
+        'new_entries': metrics.get('question_bank.new_entries'),
+        'duplicates': metrics.get('question_bank.duplicates'),
+        'reused_categories': metrics.get('question_bank.reused_categories'),
+    }
@@ -0,0 +1,67 @@
+"""
+Pydantic schemas for Gemini structured output
+
+Passed to google-genai as the response schema so the model returns a typed
+board, then validated here so nothing but an exact board reaches the DB.
+"""
+
+from pydantic import BaseModel, ValidationInfo, field_validator, model_validator
+
+BOARD_VALUES = [200, 400, 600, 800, 1000]
+
+
+class QuestionSchema(BaseModel):
+    value: int
+    question: str
+    answer: str
+
+    @field_validator('question', 'answer')
+    @classmethod
+    def not_blank(cls, text: str) -> str:
+        text = text.strip()
+        if not text:
+            raise ValueError("must not be blank")
+        return text
+
+
+class CategorySchema(BaseModel):
+    title: str
+    questions: list[QuestionSchema]
+
+    @field_validator('title')
+    @classmethod
+    def title_fits(cls, title: str) -> str:
+        title = title.strip()
+        if not title:
+            raise ValueError("must not be blank")
+        return title[:100]
+
+    @model_validator(mode='after')
+    def one_question_per_value(self):
+        values = sorted(q.value for q in self.questions)
+        if values != BOARD_VALUES:
+            raise ValueError(f"category '{self.title}' has values {values}, expected {BOARD_VALUES}")
+        self.questions.sort(key=lambda q: q.value)
+        return self
+
+    def to_board_category(self) -> dict:
+        """Same format as JeopardyGame._validate_category"""
+        return {
+            'title': self.title,
+            'questions': [q.model_dump() for q in self.questions],
+        }
+
+
+class BoardSchema(BaseModel):
+    categories: list[CategorySchema]
+
+    @model_validator(mode='after')
+    def exact_size(self, info: ValidationInfo):
+        expected = (info.context or {}).get('num_categories')
+        if expected is not None and len(self.categories) != expected:
+            raise ValueError(f"board has {len(self.categories)} categories, expected {expected}")
+        return self
+
+    def to_board(self) -> list:
+        """Same format as JeopardyGame._save_board takes"""
+        return [category.to_board_category() for category in self.categories]
@@ -1,3 +1,1530 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import (archival, board_pool, gemini_backends, gemini_client, generation_queue, instrumentation, llm_cache,
+               metrics, question_bank)
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .counters import rebuild_counters
+from .game_logic import JeopardyGame
+from .json_extract import CategoryStreamParser, extract_json
+from .management.commands import bench_game_flow
+from .models import AnswerEvent, ArchivedGame, BankQuestion, Category, Game, GenerationJob, Question
+from .pubsub import InProcessPubSub
+from .schemas import BoardSchema
+from .websocket import websocket_application
+
+
+GEMINI_RESPONSES = Path(__file__).resolve().parent / 'test_data' / 'gemini_responses'
+
+
+def make_board_payload(num_categories=6):
+    """A well-formed Gemini board response"""
+    return {
+        'categories': [
+            {
+                'title': f'Category {c}',
+                'questions': [
+                    {'value': v, 'question': f'Q {c}-{v}?', 'answer': f'A {c}-{v}'}
+                    for v in (200, 400, 600, 800, 1000)
+                ],
+            }
+            for c in range(num_categories)
+        ]
+    }
+
+
+def make_board(payload):
+    """A board payload validated into the format JeopardyGame._save_board takes"""
+    return [JeopardyGame._validate_category(cat_data, idx) for idx, cat_data in enumerate(payload['categories'])]
+
+
+class BoardPoolTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    @override_settings(BOARD_POOL_DEPTH=2)
+    def test_refill_fills_pool_to_depth(self):
+        with mock.patch('main.gemini_client.ask_gemini_json', return_value=make_board_payload()):
+            added = board_pool.refill_pool()
+
+        self.assertEqual(added, 2)
+        self.assertEqual(board_pool.pool_depth(), 2)
+        self.assertEqual(Question.objects.filter(category__game__phase='POOLED').count(), 60)
+
+    def test_refill_discards_fallback_boards(self):
+        with mock.patch('main.gemini_client.ask_gemini_json', side_effect=ValueError('down')):
+            added = board_pool.refill_pool(depth=3)
+
+        self.assertEqual(added, 0)
+        self.assertEqual(Game.objects.count(), 0)
+        self.assertEqual(metrics.get('board_pool.refill_failures'), 1)
+
+    def test_claim_takes_pooled_board(self):
+        with mock.patch('main.gemini_client.ask_gemini_json', return_value=make_board_payload()):
+            board_pool.refill_pool(depth=1)
+
+        game = board_pool.claim_board()
+
+        self.assertEqual(game.phase, 'PLAYING')
+        self.assertEqual(board_pool.pool_depth(), 0)
+        self.assertIsNone(board_pool.claim_board())
+        self.assertEqual(board_pool.get_stats()['hits'], 1)
+        self.assertEqual(board_pool.get_stats()['misses'], 1)
+
+    def test_repeated_titles_keep_every_column(self):
+        board = JeopardyGame._dummy_board(6)
+        board[1]['title'] = board[0]['title']
+
+        [game_id] = board_pool.add_boards([board])
+
+        titles = list(Category.objects.filter(game_id=game_id).order_by('order').values_list('title', flat=True))
+        self.assertEqual(titles[:2], [board[0]['title'], f"{board[0]['title']} (2)"])
+        self.assertEqual(len(JeopardyGame(game_id).get_board_state()), 6)
+
+    @override_settings(GENERATION_WORKERS=0)
+    def test_new_game_view_uses_pool(self):
+        with mock.patch('main.gemini_client.ask_gemini_json', return_value=make_board_payload()):
+            board_pool.refill_pool(depth=1)
+        pooled_id = Game.objects.get(phase='POOLED').id
+
+        with mock.patch('main.gemini_client.ask_gemini_json') as ask:
+            response = self.client.get('/new-game/')
+
+        ask.assert_not_called()
+        self.assertRedirects(response, f'/game/{pooled_id}/')
+
+
+class PregenerateBoardsTests(TestCase):
+
+    def setUp(self):
+        gemini_client.breaker.reset()
+        self.addCleanup(gemini_client.breaker.reset)
+        self.checkpoint = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'progress.json'
+
+    def _pregenerate(self, count, fake, **options):
+        out = StringIO()
+        with mock.patch.object(gemini_client, 'client', fake):
+            call_command('pregenerate_boards', count, workers=0, checkpoint=str(self.checkpoint),
+                         stdout=out, stderr=StringIO(), **options)
+        return out.getvalue()
+
+    def test_boards_are_bulk_written_and_checkpoint_resumes(self):
+        self.checkpoint.write_text(json.dumps({'target': 5, 'written': 2, 'failed': 0, 'seconds': 1.0}))
+        fake = gemini_backends.FakeGeminiClient()
+
+        out = self._pregenerate(5, fake, batch_size=2)
+
+        self.assertIn('2 board(s) already written', out)
+        self.assertIn('Added 3 board(s)', out)
+        self.assertEqual(fake.models.calls, 3)
+        self.assertEqual(Game.objects.filter(phase='POOLED', question_count=30).count(), 3)
+        self.assertEqual(Question.objects.count(), 90)
+        self.assertFalse(self.checkpoint.exists())
+
+    @mock.patch('main.gemini_client.time.sleep')
+    def test_failures_stop_the_run_and_keep_the_checkpoint(self, sleep):
+        with self.assertRaisesMessage(CommandError, 'Stopped after 2 failed boards'):
+            self._pregenerate(3, gemini_backends.FakeGeminiClient(failure_rate=1.0), max_failures=2)
+
+        self.assertEqual(Game.objects.count(), 0)
+        self.assertEqual(json.loads(self.checkpoint.read_text())['failed'], 2)
+
+
+class BoardCreationTests(TestCase):
+
+    def test_board_saved_with_bulk_inserts(self):
+        game_logic = JeopardyGame()
+        board = make_board(make_board_payload())
+
+        # Bank lookup/insert/lookup, game, categories, questions, plus the savepoint pair
+        with self.assertNumQueries(8):
+            game = game_logic._save_board(board)
+
+        self.assertEqual(game.categories.count(), 6)
+        self.assertEqual(Question.objects.filter(category__game=game).count(), 30)
+        self.assertEqual(list(game.categories.values_list('order', flat=True)), list(range(6)))
+
+    def test_short_board_is_backfilled_before_writing(self):
+        with mock.patch('main.gemini_client.ask_gemini_json', return_value=make_board_payload(3)):
+            game_logic = JeopardyGame()
+            game = game_logic.create_new_game()
+
+        titles = list(game.categories.values_list('title', flat=True))
+        self.assertFalse(game_logic.used_fallback)
+        self.assertEqual(Game.objects.count(), 1)
+        self.assertEqual(titles, ['Category 0', 'Category 1', 'Category 2', 'Science', 'History', 'Geography'])
+
+    def test_unusable_board_falls_back_before_writing(self):
+        payload = {'categories': [{'title': 'Empty', 'questions': []}]}
+        with mock.patch('main.gemini_client.ask_gemini_json', return_value=payload):
+            game_logic = JeopardyGame()
+            game = game_logic.create_new_game()
+
+        self.assertTrue(game_logic.used_fallback)
+        self.assertEqual(Game.objects.count(), 1)
+        self.assertEqual(game.categories.first().title, 'Science')
+
+    def test_malformed_questions_are_dropped(self):
+        payload = make_board_payload(1)
+        payload['categories'][0]['questions'].append({'value': 'lots', 'question': 'Q?', 'answer': 'A'})
+        payload['categories'][0]['questions'].append({'question': 'No value?'})
+        payload['categories'][0]['questions'].append({'value': 400, 'question': 'Again?', 'answer': 'A'})
+
+        category = JeopardyGame._validate_category(payload['categories'][0])
+
+        self.assertEqual(len(category['questions']), 5)
+        self.assertEqual(category['questions'][1]['question'], 'Q 0-400?')
+
+
+class BoardStateTests(TestCase):
+
+    def _make_game(self, num_categories):
+        game_logic = JeopardyGame()
+        game_logic._save_board(make_board(make_board_payload(num_categories)))
+        return game_logic
+
+    def test_board_state_query_count_is_constant(self):
+        for num_categories in (1, 6, 12):
+            game_logic = self._make_game(num_categories)
+
+            with self.assertNumQueries(2):
+                board = game_logic.get_board_state()
+
+            self.assertEqual(len(board), num_categories)
+
+    def test_board_state_orders_questions_by_value(self):
+        game_logic = self._make_game(1)
+        Question.objects.filter(value=200).update(value=1200)
+
+        values = [q['value'] for q in game_logic.get_board_state()['Category 0']['questions']]
+
+        self.assertEqual(values, [400, 600, 800, 1000, 1200])
+
+
+class QueryPlanTests(TestCase):
+    """The hot board queries are served by the composite indexes, without sorting"""
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Plans are asserted in SQLite's EXPLAIN QUERY PLAN format")
+        game_logic = JeopardyGame()
+        self.game = game_logic._save_board(make_board(make_board_payload(2)))
+        self.category = self.game.categories.first()
+
+    def test_categories_in_board_order(self):
+        plan = Category.objects.filter(game=self.game).order_by('order').explain()
+
+        self.assertIn('main_cat_game_order_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_questions_by_value_within_category(self):
+        plan = Question.objects.filter(category=self.category).order_by('value').explain()
+
+        self.assertRegex(plan, r'SEARCH main_question USING (COVERING )?INDEX sqlite_autoindex_main_question')
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_unanswered_questions_in_game(self):
+        plan = Question.objects.filter(category__game=self.game, is_answered=False).explain()
+
+        self.assertIn('main_cat_game_order_idx', plan)
+        self.assertIn('main_q_cat_answered_idx', plan)
+        self.assertNotIn('SCAN main_question', plan)
+
+    def test_full_bank_categories_by_title(self):
+        plan = question_bank.full_category_titles(['Category 0']).explain()
+
+        self.assertIn('main_bank_title_value_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_one_question_per_value(self):
+        with self.assertRaises(IntegrityError):
+            Question.objects.create(
+                category=self.category, value=200, bank_question=Question.objects.first().bank_question,
+            )
+
+
+class AnswerQuestionTests(TestCase):
+
+    def setUp(self):
+        self.game_logic = JeopardyGame()
+        self.game_logic._save_board(make_board(make_board_payload(1)))
+        self.questions = list(Question.objects.order_by('value'))
+
+    def test_correct_and_incorrect_answers_update_score(self):
+        self.assertEqual(self.game_logic.answer_question(self.questions[4].id, True), 1000)
+        self.assertEqual(self.game_logic.answer_question(self.questions[0].id, False), 800)
+        self.assertEqual(Game.objects.get().score, 800)
+
+    def test_answering_twice_scores_once(self):
+        self.game_logic.answer_question(self.questions[1].id, True)
+        score = self.game_logic.answer_question(self.questions[1].id, True)
+
+        self.assertEqual(score, 400)
+
+    def test_question_from_another_game_is_rejected(self):
+        other = JeopardyGame()
+        other._save_board(make_board(make_board_payload(1)))
+        foreign_id = Question.objects.filter(category__game=other.game).first().id
+
+        with self.assertRaises(Question.DoesNotExist):
+            self.game_logic.answer_question(foreign_id, True)
+        self.assertEqual(Game.objects.get(id=self.game_logic.game.id).score, 0)
+
+    def test_answer_endpoint_404s_for_unknown_game_or_question(self):
+        other = JeopardyGame()
+        other._save_board(make_board(make_board_payload(1)))
+        foreign_id = Question.objects.filter(category__game=other.game).first().id
+        body = json.dumps({'is_correct': True})
+
+        foreign = self.client.post(f'/api/game/{self.game_logic.game.id}/answer/{foreign_id}/',
+                                   data=body, content_type='application/json')
+        missing = self.client.post(f'/api/game/999999/answer/{self.questions[0].id}/',
+                                   data=body, content_type='application/json')
+
+        self.assertEqual((foreign.status_code, foreign.json()), (404, {'error': 'Question not found'}))
+        self.assertEqual((missing.status_code, missing.json()), (404, {'error': 'Game not found'}))
+        self.assertEqual(Game.objects.get(id=self.game_logic.game.id).score, 0)
+
+
+class AnswerBatchTests(TestCase):
+
+    def setUp(self):
+        self.game_logic = JeopardyGame()
+        self.game = self.game_logic._save_board(make_board(make_board_payload(2)))
+        self.questions = list(Question.objects.order_by('category__order', 'value'))
+        self.url = f'/api/game/{self.game.id}/answers/'
+
+    def _post(self, *answers):
+        return self.client.post(self.url, data=json.dumps({'answers': [
+            {'key': key, 'question_id': question.id, 'is_correct': is_correct}
+            for key, question, is_correct in answers
+        ]}), content_type='application/json')
+
+    def test_batch_is_applied_once_and_retries_change_nothing(self):
+        batch = [('a1', self.questions[4], True), ('a2', self.questions[0], False), ('a3', self.questions[0], True)]
+
+        first = self._post(*batch).json()
+        retry = self._post(*batch).json()
+
+        self.assertEqual([r['status'] for r in first['results']], ['applied', 'applied', 'already_answered'])
+        self.assertEqual([r['points'] for r in first['results']], [1000, -200, 0])
+        self.assertEqual(first['current_score'], 800)
+        self.assertEqual(retry['results'], [{**r, 'duplicate': True} for r in first['results']])
+        self.assertEqual(retry['current_score'], 800)
+        self.assertEqual(retry['version'], first['version'])
+
+        game = Game.objects.get()
+        self.assertEqual((game.score, game.answered_count, game.correct_count), (800, 2, 1))
+        self.assertEqual(AnswerEvent.objects.count(), 3)
+
+    def test_one_score_update_for_the_whole_batch(self):
+        queries = []
+        with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+            response = self._post(*[(f'k{i}', question, True) for i, question in enumerate(self.questions[:5])])
+
+        self.assertEqual(response.json()['current_score'], 3000)
+        self.assertEqual(sum(1 for sql in queries if sql.startswith('UPDATE "main_game"')), 1)
+
+    def test_answering_every_question_completes_the_game(self):
+        response = self._post(*[(f'k{i}', question, i % 2 == 0) for i, question in enumerate(self.questions)])
+
+        data = response.json()
+        self.assertTrue(data['game_complete'])
+        self.assertEqual(data['final_stats']['correct_answers'], 5)
+        self.assertEqual(Game.objects.get().phase, 'COMPLETE')
+
+    def test_foreign_questions_and_bad_payloads_are_rejected(self):
+        other = JeopardyGame()
+        other._save_board(make_board(make_board_payload(1)))
+        foreign = Question.objects.filter(category__game=other.game).first()
+
+        result = self._post(('f1', foreign, True)).json()['results'][0]
+        self.assertEqual(result['status'], 'not_found')
+
+        for body in ('not json', {'answers': []}, {'answers': [{'key': 'x', 'question_id': '1', 'is_correct': True}]}):
+            response = self.client.post(self.url, data=body if isinstance(body, str) else json.dumps(body),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.url = '/api/game/999999/answers/'
+        self.assertEqual(self._post(('m1', self.questions[0], True)).status_code, 404)
+        self.assertEqual(Game.objects.get(id=self.game.id).score, 0)
+
+
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        instrumentation.reset()
+        gemini_client.breaker.reset()
+
+    def _metrics(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return {
+            line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+            for line in response.content.decode().splitlines() if not line.startswith('#')
+        }
+
+    def test_requests_are_timed_per_view(self):
+        game_logic = JeopardyGame()
+        game = game_logic._save_board(game_logic._dummy_board(6))
+
+        self.client.get(f'/api/game/{game.id}/state/')
+        self.client.get(f'/api/game/{game.id}/state/')
+        self.client.get('/api/game/999999/state/')
+        samples = self._metrics()
+
+        self.assertEqual(samples['jeopardy_http_requests_total{view="get_game_state",status="2xx"}'], 2)
+        self.assertEqual(samples['jeopardy_http_requests_total{view="get_game_state",status="4xx"}'], 1)
+        self.assertEqual(samples['jeopardy_http_request_duration_seconds_count{view="get_game_state"}'], 3)
+        self.assertEqual(samples['jeopardy_http_request_duration_seconds_bucket{view="get_game_state",le="+Inf"}'], 3)
+        # ETag lookup, game, categories and prefetched questions twice; ETag and game for the 404
+        self.assertEqual(samples['jeopardy_db_queries_total{view="get_game_state"}'], 10)
+        self.assertGreater(samples['jeopardy_db_seconds_total{view="get_game_state"}'], 0)
+
+    @override_settings(GEMINI_CACHE_ENABLED=False, GENERATION_QUEUE=False)
+    def test_gemini_time_is_attributed_to_async_view(self):
+        fake = gemini_backends.FakeGeminiClient(latency=0.05)
+
+        with mock.patch.object(gemini_client, 'client', fake):
+            response = self.client.get('/new-game/')
+        samples = self._metrics()
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(samples['jeopardy_gemini_calls_total{view="new_game"}'], 1)
+        self.assertGreaterEqual(samples['jeopardy_gemini_seconds_total{view="new_game"}'], 0.05)
+        # Queries run through sync_to_async are still counted
+        self.assertGreater(samples['jeopardy_db_queries_total{view="new_game"}'], 5)
+
+    def test_counters_are_exported(self):
+        metrics.incr('board_pool.hits', 3)
+
+        self.assertEqual(self._metrics()['jeopardy_board_pool_hits_total'], 3)
+
+    @override_settings(SLOW_REQUEST_MS=1, GEMINI_CACHE_ENABLED=False, GENERATION_QUEUE=False)
+    def test_slow_requests_are_logged_with_sql(self):
+        fake = gemini_backends.FakeGeminiClient(latency=0.01)
+
+        with mock.patch.object(gemini_client, 'client', fake), \
+                self.assertLogs('main.slow_requests', 'WARNING') as logs:
+            self.client.get('/new-game/')
+
+        self.assertIn('Slow request GET /new-game/ (new_game) -> 302', logs.output[0])
+        self.assertIn('Gemini 1 call(s)', logs.output[0])
+        self.assertIn('INSERT INTO "main_question"', logs.output[0])
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.game_logic = JeopardyGame()
+        self.game = self.game_logic._save_board(make_board(make_board_payload(1)))
+        self.question = Question.objects.order_by('value').first()
+
+    def test_unchanged_board_state_is_not_modified(self):
+        url = f'/api/game/{self.game.id}/state/'
+        first = self.client.get(url)
+        self.assertIn('no-cache', first['Cache-Control'])
+
+        with self.assertNumQueries(1):
+            repeat = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+
+        self.game_logic.answer_question(self.question.id, True)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertEqual(changed.json()['current_score'], 200)
+
+    def test_question_payload_is_cacheable(self):
+        url = f'/api/question/{self.question.id}/'
+        first = self.client.get(url)
+        self.assertIn('max-age=86400', first['Cache-Control'])
+        self.assertFalse(first['ETag'].startswith('W/'))
+
+        self.game_logic.answer_question(self.question.id, False)
+        with self.assertNumQueries(1):
+            repeat = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertIn('max-age=86400', repeat['Cache-Control'])
+
+    def test_missing_question_is_not_cached(self):
+        response = self.client.get('/api/question/999999/')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('max-age', response.get('Cache-Control', ''))
+        self.assertNotIn('public', response.get('Cache-Control', ''))
+
+    def test_missing_question_still_404s(self):
+        self.assertEqual(self.client.get('/api/question/999999/').status_code, 404)
+
+
+class DatabaseProfileTests(TestCase):
+
+    def test_sqlite_connections_are_tuned(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite profile only")
+
+        with connection.cursor() as cursor:
+            pragmas = {}
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout'):
+                cursor.execute(f'PRAGMA {pragma}')
+                pragmas[pragma] = cursor.fetchone()[0]
+
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 20000})
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class AnswerQuestionConcurrencyTests(TransactionTestCase):
+
+    def test_concurrent_submissions_score_exactly_once(self):
+        game_logic = JeopardyGame()
+        game = game_logic._save_board(make_board(make_board_payload(2)))
+        question_ids = list(Question.objects.values_list('id', flat=True))
+        expected = sum(Question.objects.values_list('value', flat=True))
+        errors = []
+        barrier = threading.Barrier(8)
+
+        def submit_all():
+            try:
+                barrier.wait()
+                worker = JeopardyGame(game.id)
+                # Every thread answers every question; only the first claim counts
+                for question_id in question_ids:
+                    worker.answer_question(question_id, True)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit_all) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Game.objects.get(id=game.id).score, expected)
+        self.assertEqual(Question.objects.filter(is_answered=True).count(), len(question_ids))
+
+
+@override_settings(ALLOWED_HOSTS=['localhost'], GENERATION_QUEUE=False)
+class GameFlowBenchmarkTests(TransactionTestCase):
+
+    def test_benchmark_plays_games_in_a_scratch_database(self):
+        board_pool.add_boards([JeopardyGame._dummy_board(6)])
+        out = StringIO()
+        scratch = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        output = scratch / 'flow.json'
+
+        call_command('bench_game_flow', users=[2], games=1, answers=3, latency=0,
+                     output=str(output), db_path=str(scratch / 'flow.sqlite3'), stdout=out)
+
+        runs = json.loads(output.read_text())['runs']
+        endpoints = runs[0]['endpoints']
+        self.assertEqual(endpoints['new_game']['requests'], 2)
+        self.assertEqual(endpoints['answer']['requests'], 6)
+        self.assertEqual(sum(row['errors'] for row in endpoints.values()), 0)
+        self.assertEqual(runs[0]['setup_timeouts'], 0)
+        self.assertGreater(endpoints['answer']['queries'], 0)
+        self.assertIn('Fake Gemini: 2 calls, 0 injected failures', out.getvalue())
+        # The configured database's pooled board was never claimed
+        self.assertEqual(list(Game.objects.values_list('phase', flat=True)), ['POOLED'])
+        self.assertEqual(sorted(path.name for path in scratch.iterdir()), ['flow.json'])
+
+    def test_answer_contention_leaves_the_configured_database_alone(self):
+        scratch = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+        call_command('bench_answer_contention', writers=[1], readers=0, modes=['baseline'],
+                     db_path=str(scratch / 'contention.sqlite3'), stdout=StringIO())
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+        self.assertEqual(Game.objects.count(), 0)
+        self.assertEqual(list(scratch.iterdir()), [])
+
+    def test_waiting_for_a_board_gives_up(self):
+        game = Game.objects.create(phase='SETUP')
+
+        self.assertFalse(bench_game_flow.Command._wait_for_board(game.id, timeout=0.1))
+        Game.objects.filter(id=game.id).update(phase='PLAYING')
+        self.assertTrue(bench_game_flow.Command._wait_for_board(game.id, timeout=0.1))
+
+
+class GameCounterTests(TestCase):
+
+    def setUp(self):
+        self.game_logic = JeopardyGame()
+        self.game = self.game_logic._save_board(make_board(make_board_payload(1)))
+        self.question_ids = list(Question.objects.order_by('value').values_list('id', flat=True))
+
+    def test_counters_track_answers(self):
+        self.game_logic.answer_question(self.question_ids[0], True)
+        self.game_logic.answer_question(self.question_ids[1], False)
+
+        with self.assertNumQueries(0):
+            self.assertFalse(self.game_logic.is_board_complete())
+            stats = self.game_logic.get_final_stats()
+
+        self.assertEqual(stats['total_questions'], 5)
+        self.assertEqual(stats['correct_answers'], 1)
+        self.assertEqual(self.game_logic.game.answered_count, 2)
+
+    def test_last_answer_completes_game(self):
+        for question_id in self.question_ids:
+            response = self.client.post(
+                f'/api/game/{self.game.id}/answer/{question_id}/',
+                data={'is_correct': True},
+                content_type='application/json'
+            )
+
+        data = response.json()
+        self.assertTrue(data['game_complete'])
+        self.assertEqual(data['final_stats']['accuracy'], '100.0%')
+        self.assertEqual(Game.objects.get(id=self.game.id).phase, 'COMPLETE')
+
+    def test_rebuild_command_recomputes_counters(self):
+        Question.objects.filter(id__in=self.question_ids[:3]).update(is_answered=True, player_correct=True)
+        Game.objects.update(question_count=0, answered_count=0, correct_count=0)
+
+        call_command('rebuild_game_counters', stdout=StringIO())
+
+        game = Game.objects.get(id=self.game.id)
+        self.assertEqual((game.question_count, game.answered_count, game.correct_count), (5, 3, 3))
+
+    def test_rebuild_counters_with_no_game_ids_updates_nothing(self):
+        Game.objects.update(question_count=0)
+
+        self.assertEqual(rebuild_counters(game_ids=[]), 0)
+        self.assertEqual(Game.objects.get(id=self.game.id).question_count, 0)
+        self.assertEqual(rebuild_counters(game_ids=[self.game.id]), 1)
+        self.assertEqual(Game.objects.get(id=self.game.id).question_count, 5)
+
+
+class ArchivalTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def _game(self, phase, age_hours, answered=0):
+        game_logic = JeopardyGame()
+        game = game_logic._save_board(make_board(make_board_payload()))
+        for question in Question.objects.filter(category__game=game).order_by('id')[:answered]:
+            game_logic.answer_question(question.id, is_correct=question.value == 200)
+        Game.objects.filter(id=game.id).update(
+            phase=phase, updated_at=timezone.now() - timedelta(hours=age_hours)
+        )
+        return game
+
+    def test_completed_games_are_archived(self):
+        game = self._game('COMPLETE', age_hours=2, answered=30)
+        recent = self._game('COMPLETE', age_hours=0, answered=30)
+
+        archived, rows = archival.archive_completed_games(older_than=3600)
+
+        self.assertEqual((archived, rows), (1, 37))
+        self.assertFalse(Game.objects.filter(id=game.id).exists())
+        self.assertTrue(Game.objects.filter(id=recent.id).exists())
+
+        summary = ArchivedGame.objects.get(game_id=game.id)
+        self.assertEqual(summary.score, 6 * (200 - 400 - 600 - 800 - 1000))
+        self.assertEqual(summary.accuracy, 20.0)
+        self.assertEqual(len(summary.board), 6)
+        self.assertEqual(summary.board[0]['title'], 'Category 0')
+        bank_id = BankQuestion.objects.get(question_text='Q 0-200?').id
+        self.assertEqual(summary.board[0]['questions'][0], [200, bank_id, True])
+        self.assertEqual(summary.get_final_stats()['accuracy'], '20.0%')
+
+    def test_stale_games_are_purged_in_batches(self):
+        stale = [self._game(phase, age_hours=200) for phase in ('SETUP', 'PLAYING', 'PLAYING')]
+        active = self._game('PLAYING', age_hours=1)
+        pooled = self._game('POOLED', age_hours=200)
+
+        purged, rows = archival.purge_stale_games(ttl=7 * 24 * 3600, batch_size=2, pause=0)
+
+        self.assertEqual((purged, rows), (3, 3 * 37))
+        self.assertFalse(Game.objects.filter(id__in=[game.id for game in stale]).exists())
+        self.assertEqual(set(Game.objects.values_list('id', flat=True)), {active.id, pooled.id})
+        self.assertFalse(ArchivedGame.objects.exists())
+        # Bank entries are shared between games and outlive them
+        self.assertEqual(BankQuestion.objects.count(), 30)
+
+    def test_command_reports_reclaimed_space(self):
+        self._game('COMPLETE', age_hours=2, answered=30)
+        self._game('PLAYING', age_hours=200)
+        out = StringIO()
+
+        call_command('compact_games', '--pause=0', stdout=out)
+
+        self.assertIn('Archived 1 completed game(s), purged 1 stale game(s)', out.getvalue())
+        self.assertIn('74 rows deleted (73 net)', out.getvalue())
+        self.assertEqual(Game.objects.count(), 0)
+        self.assertEqual(metrics.get('archival.rows_deleted'), 74)
+
+
+@override_settings(GEMINI_CACHE_ENABLED=False)
+class AsyncGeminiClientTests(SimpleTestCase):
+
+    def setUp(self):
+        gemini_client.breaker.reset()
+        self.addCleanup(gemini_client.breaker.reset)
+
+    def _fake_aio(self, delay, text='{"ok": true}'):
+        in_flight = {'now': 0, 'max': 0}
+
+        async def generate_content(model, contents):
+            in_flight['now'] += 1
+            in_flight['max'] = max(in_flight['max'], in_flight['now'])
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                in_flight['now'] -= 1
+            return mock.Mock(text=text)
+
+        aio = mock.Mock()
+        aio.models.generate_content = generate_content
+        return aio, in_flight
+
+    def test_concurrency_is_capped_by_semaphore(self):
+        aio, in_flight = self._fake_aio(delay=0.01)
+
+        async def run():
+            with mock.patch.object(gemini_client, '_get_async_state',
+                                   return_value=(aio, asyncio.Semaphore(2))):
+                return await asyncio.gather(*[gemini_client.ask_gemini_json_async('p') for _ in range(6)])
+
+        results = asyncio.run(run())
+
+        self.assertEqual(results, [{'ok': True}] * 6)
+        self.assertEqual(in_flight['max'], 2)
+
+    def test_cap_is_process_wide_across_sync_callers(self):
+        # Each async_to_sync call runs on a fresh event loop; the cap and the client must still be shared
+        aio, in_flight = self._fake_aio(delay=0.02)
+        ask = async_to_sync(gemini_client.ask_gemini_json_async)
+
+        with mock.patch.object(gemini_client, 'client', mock.Mock(aio=aio)), \
+                mock.patch.object(gemini_client, '_semaphore', asyncio.Semaphore(2)):
+            threads = [threading.Thread(target=ask, args=('p',), kwargs={'cache': False}) for _ in range(6)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(in_flight['max'], 2)
+
+    def test_timeout_raises_after_all_attempts(self):
+        aio, _ = self._fake_aio(delay=1)
+
+        async def run():
+            with mock.patch.object(gemini_client, '_get_async_state',
+                                   return_value=(aio, asyncio.Semaphore(1))):
+                await gemini_client.ask_gemini_json_async('p', attempts=2, backoff=0, timeout=0.01)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run())
+
+
+class LazyGeminiClientTests(SimpleTestCase):
+
+    def test_boot_does_not_import_genai(self):
+        script = ("import sys, django; django.setup(); import mysite.urls; "
+                  "print(sorted(m for m in ('google.genai', 'pydantic', 'httpx') if m in sys.modules))")
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'mysite.settings', 'GEMINI_API_KEY': 'key'}
+
+        result = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True)
+
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    def test_client_is_built_once_across_threads(self):
+        built = []
+
+        def build(**kwargs):
+            time.sleep(0.01)  # Widen the race window
+            built.append(object())
+            return built[-1]
+
+        clients = []
+        with mock.patch.dict(gemini_client.__dict__), \
+                mock.patch.object(gemini_client, '_build_client', side_effect=build):
+            gemini_client.__dict__.pop('client', None)
+            threads = [threading.Thread(target=lambda: clients.append(gemini_client.get_client()))
+                       for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            self.assertIs(gemini_client.client, built[0])
+
+        self.assertEqual(len(built), 1)
+        self.assertEqual(clients, built * 8)
+
+
+@override_settings(GEMINI_CACHE_ENABLED=False)
+class GeminiBackendTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        gemini_client.breaker.reset()
+        self.recordings = self.enterContext(tempfile.TemporaryDirectory())
+
+    def test_fake_backend_answers_every_prompt_shape(self):
+        fake = gemini_backends.FakeGeminiClient()
+
+        with mock.patch.object(gemini_client, 'client', fake):
+            board = gemini_client.ask_gemini_json(JeopardyGame._board_prompt(4))
+            category = gemini_client.ask_gemini_json(JeopardyGame._category_prompt('space', []))
+            typed = gemini_client.ask_gemini_structured(
+                JeopardyGame._structured_board_prompt(6), BoardSchema, context={'num_categories': 6},
+            )
+            streamed = ''.join(gemini_client.stream_gemini(JeopardyGame._board_prompt(6)))
+
+        self.assertEqual(len(board['categories']), 4)
+        self.assertEqual([q['value'] for q in category['questions']], [200, 400, 600, 800, 1000])
+        self.assertEqual(len(typed.categories), 6)
+        self.assertEqual(len(json.loads(streamed)['categories']), 6)
+
+    def test_new_game_with_fake_backend_needs_no_fallback(self):
+        with mock.patch.object(gemini_client, 'client', gemini_backends.FakeGeminiClient()):
+            game_logic = JeopardyGame()
+            game = game_logic.create_new_game()
+
+        self.assertFalse(game_logic.used_fallback)
+        self.assertEqual(Question.objects.filter(category__game=game).count(), 30)
+        # Synthesized content is never offered to real boards
+        self.assertFalse(BankQuestion.objects.filter(reusable=True).exists())
+        self.assertEqual(question_bank.assemble_categories(2), [])
+
+    @override_settings(GEMINI_BACKEND='live', GEMINI_API_KEY='')
+    @mock.patch('main.gemini_client.time.sleep')
+    def test_live_backend_without_key_serves_fallback_board_immediately(self, sleep):
+        with mock.patch.dict(gemini_client.__dict__):
+            gemini_client.__dict__.pop('client', None)
+            game_logic = JeopardyGame()
+            game_logic.create_new_game()
+
+        self.assertTrue(game_logic.used_fallback)
+        sleep.assert_not_called()
+        self.assertEqual(gemini_client.breaker.state, 'closed')
+
+    def test_recorded_responses_are_replayed(self):
+        live = gemini_backends.FakeGeminiClient(seed=1)
+        recorder = gemini_backends.RecordingGeminiClient(live, self.recordings)
+        prompt = JeopardyGame._board_prompt(6)
+
+        with mock.patch.object(gemini_client, 'client', recorder):
+            recorded = gemini_client.ask_gemini_json(prompt)
+        with mock.patch.object(gemini_client, 'client', gemini_backends.ReplayGeminiClient(self.recordings)):
+            replayed = gemini_client.ask_gemini_json(prompt)
+            # Formatting-only prompt differences still hit the recording
+            replayed_again = gemini_client.ask_gemini_json(f"  {prompt}\n")
+            unrecorded = gemini_client.ask_gemini_json(JeopardyGame._board_prompt(2))
+
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(replayed_again, recorded)
+        self.assertEqual(len(unrecorded['categories']), 2)
+        self.assertEqual(metrics.get('gemini.recorded'), 1)
+        self.assertEqual(metrics.get('gemini.replay.hits'), 2)
+        self.assertEqual(metrics.get('gemini.replay.misses'), 1)
+
+    def test_replay_ignores_titles_to_avoid(self):
+        recorder = gemini_backends.RecordingGeminiClient(gemini_backends.FakeGeminiClient(seed=1), self.recordings)
+
+        with mock.patch.object(gemini_client, 'client', recorder):
+            recorded = gemini_client.ask_gemini_json(JeopardyGame._board_prompt(4, ['Rivers', 'Opera']))
+        with mock.patch.object(gemini_client, 'client', gemini_backends.ReplayGeminiClient(self.recordings)):
+            replayed = gemini_client.ask_gemini_json(JeopardyGame._board_prompt(4, ['Volcanoes']))
+            replayed_without = gemini_client.ask_gemini_json(JeopardyGame._board_prompt(4))
+
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(replayed_without, recorded)
+        self.assertEqual(metrics.get('gemini.replay.misses'), 0)
+
+    def test_async_calls_are_recorded(self):
+        recorder = gemini_backends.RecordingGeminiClient(gemini_backends.FakeGeminiClient(), self.recordings)
+        replay = gemini_backends.ReplayGeminiClient(self.recordings)
+        prompt = JeopardyGame._category_prompt('rivers', [])
+
+        async def ask(backend):
+            with mock.patch.object(gemini_client, '_get_async_state',
+                                   return_value=(backend.aio, asyncio.Semaphore(1))):
+                return await gemini_client.ask_gemini_json_async(prompt)
+
+        recorded = asyncio.run(ask(recorder))
+
+        self.assertEqual(asyncio.run(ask(replay)), recorded)
+        self.assertEqual(metrics.get('gemini.replay.hits'), 1)
+
+    def test_backend_is_chosen_by_setting(self):
+        with override_settings(GEMINI_BACKEND='fake'):
+            self.assertIsInstance(gemini_client._build_client(), gemini_backends.FakeGeminiClient)
+        with override_settings(GEMINI_BACKEND='replay', GEMINI_RECORDINGS_DIR=self.recordings):
+            self.assertIsInstance(gemini_client._build_client(), gemini_backends.ReplayGeminiClient)
+        with override_settings(GEMINI_BACKEND='record', GEMINI_RECORDINGS_DIR=self.recordings, GEMINI_API_KEY='k'):
+            self.assertIsInstance(gemini_client._build_client(), gemini_backends.RecordingGeminiClient)
+        with override_settings(GEMINI_BACKEND='offline'), self.assertRaises(ImproperlyConfigured):
+            gemini_client._build_client()
+
+
+@override_settings(
+    GEMINI_CACHE_ENABLED=True,
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'gemini': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'gemini-tests'},
+    },
+)
+class GeminiCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        metrics.reset()
+        llm_cache.clear()
+        self.addCleanup(llm_cache.clear)
+
+    def _generate(self, text='{"ok": true}'):
+        return mock.patch.object(gemini_client.client.models, 'generate_content',
+                                 return_value=mock.Mock(text=text))
+
+    def test_identical_prompts_share_a_response(self):
+        with self._generate() as generate:
+            first = gemini_client.ask_gemini_json('Name a  planet.')
+            second = gemini_client.ask_gemini_json(' Name a planet.\n')
+
+        self.assertEqual(first, second)
+        self.assertEqual(generate.call_count, 1)
+        stats = llm_cache.get_stats()
+        self.assertEqual((stats['memory_hits'], stats['misses'], stats['hit_ratio']), (1, 1, 0.5))
+        self.assertEqual(stats['bytes_written'], len('{"ok": true}'))
+
+    def test_opt_out_always_calls_gemini(self):
+        with self._generate() as generate:
+            gemini_client.ask_gemini_json('Random board', cache=False)
+            gemini_client.ask_gemini_json('Random board', cache=False)
+
+        self.assertEqual(generate.call_count, 2)
+        self.assertIsNone(llm_cache.get_stats()['hit_ratio'])
+
+    def test_text_prompts_are_cached_by_default(self):
+        with self._generate(text='Mercury') as generate:
+            for _ in range(4):
+                self.assertEqual(gemini_client.ask_gemini('Name the closest planet to the Sun.'), 'Mercury')
+
+        self.assertEqual(generate.call_count, 1)
+        stats = gemini_client.get_stats()['cache']
+        self.assertEqual(stats['hit_ratio'], 0.75)
+        self.assertEqual((stats['bytes_written'], stats['memory_bytes']), (len('Mercury'), len('Mercury')))
+
+    def test_persistent_tier_survives_a_restart(self):
+        with self._generate(text='Mercury') as generate:
+            gemini_client.ask_gemini('Name a planet.')
+            llm_cache._memory = None  # New process: empty in-process tier
+            self.assertEqual(gemini_client.ask_gemini('Name a planet.'), 'Mercury')
+            self.assertEqual(gemini_client.ask_gemini('Name a planet.'), 'Mercury')
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(metrics.get('llm_cache.hits.persistent'), 1)
+        self.assertEqual(metrics.get('llm_cache.hits.memory'), 1)
+
+    @override_settings(GEMINI_CACHE_MEMORY_BYTES=20)
+    def test_memory_tier_evicts_least_recently_used(self):
+        llm_cache._memory = None
+        llm_cache.set('a', 'x' * 8)
+        llm_cache.set('b', 'y' * 8)
+        llm_cache.get('a')
+        llm_cache.set('c', 'z' * 8)
+
+        self.assertEqual(set(llm_cache._memory), {'a', 'c'})
+        self.assertLessEqual(llm_cache.get_stats()['memory_bytes'], 20)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.now = 100.0
+        clock = mock.patch('main.circuit_breaker.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_opens_after_consecutive_failures_and_probes_once(self):
+        breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'closed')
+
+        breaker.record_failure()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+        self.now += 30
+        breaker.before_call()  # The half-open probe
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+        self.assertEqual(breaker.get_stats()['rejected_calls'], 2)
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        self.now += 30
+        breaker.before_call()
+        breaker.record_failure()
+
+        stats = breaker.get_stats()
+        self.assertEqual((stats['state'], stats['retry_in'], stats['times_opened']), ('open', 30, 2))
+
+
+class GeminiOutageTests(TestCase):
+
+    def setUp(self):
+        gemini_client.breaker.reset()
+        self.addCleanup(gemini_client.breaker.reset)
+
+    @mock.patch('main.gemini_client.time.sleep')
+    def test_open_circuit_skips_retries(self, sleep):
+        generate = mock.Mock(side_effect=ConnectionError('unavailable'))
+        with mock.patch.object(gemini_client.client.models, 'generate_content', generate):
+            with self.assertRaises(ValueError):
+                gemini_client.ask_gemini_json('p', cache=False)
+            with self.assertRaises(CircuitOpenError):
+                gemini_client.ask_gemini_json('p', cache=False)
+
+        self.assertEqual(generate.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(gemini_client.breaker.state, 'open')
+
+    @override_settings(GENERATION_QUEUE=False)
+    def test_new_game_falls_back_immediately_while_open(self):
+        for _ in range(gemini_client.breaker.failure_threshold):
+            gemini_client.breaker.record_failure()
+
+        generate = mock.AsyncMock()
+        with mock.patch.object(gemini_client, '_get_async_state', return_value=(generate, asyncio.Semaphore(1))):
+            response = self.client.get('/new-game/')
+
+        game = Game.objects.get()
+        self.assertRedirects(response, f'/game/{game.id}/')
+        self.assertEqual(game.categories.first().title, 'Science')
+        generate.models.generate_content.assert_not_called()
+
+        health = self.client.get('/api/health/').json()
+        self.assertEqual(health['status'], 'degraded')
+        self.assertEqual(health['gemini']['state'], 'open')
+
+
+@override_settings(GENERATION_QUEUE=False)
+class AsyncNewGameTests(TestCase):
+
+    def test_new_game_generates_when_pool_is_empty(self):
+        with mock.patch('main.gemini_client.ask_gemini_json_async',
+                        new=mock.AsyncMock(return_value=make_board_payload())):
+            response = self.client.get('/new-game/')
+
+        game = Game.objects.get()
+        self.assertRedirects(response, f'/game/{game.id}/')
+        self.assertEqual(game.question_count, 30)
+        self.assertEqual(game.categories.first().title, 'Category 0')
+
+
+@override_settings(GENERATION_WORKERS=0)
+class GenerationQueueTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_new_game_returns_setup_game_and_queues_generation(self):
+        with mock.patch('main.gemini_client.ask_gemini_json') as ask:
+            response = self.client.get('/new-game/')
+
+        game = Game.objects.get()
+        self.assertRedirects(response, f'/game/{game.id}/')
+        self.assertEqual(game.phase, 'SETUP')
+        self.assertEqual(game.generation_job.status, 'QUEUED')
+        ask.assert_not_called()
+
+        with mock.patch('main.gemini_client.ask_gemini_json', return_value=make_board_payload()):
+            self.assertEqual(generation_queue.run_pending(), 1)
+
+        game.refresh_from_db()
+        self.assertEqual(game.phase, 'PLAYING')
+        self.assertEqual(game.question_count, 30)
+        self.assertEqual(game.generation_job.status, 'DONE')
+        stats = self.client.get('/api/generation/stats/').json()
+        self.assertEqual((stats['depth'], stats['running'], stats['completed']), (0, 0, 1))
+        self.assertIsNotNone(stats['avg_run_ms'])
+
+    def test_enqueue_is_idempotent_per_game(self):
+        game = generation_queue.create_game()
+        job = generation_queue.enqueue(game)
+
+        self.assertEqual(GenerationJob.objects.get().id, job.id)
+        self.assertEqual(generation_queue.get_stats()['depth'], 1)
+        self.assertEqual(generation_queue.get_stats()['enqueued'], 1)
+        with mock.patch('main.gemini_client.ask_gemini_json', return_value=make_board_payload()) as ask:
+            generation_queue.run_pending()
+            generation_queue.enqueue(game)
+            self.assertEqual(generation_queue.run_pending(), 0)
+        ask.assert_called_once()
+
+    @override_settings(GENERATION_JOB_ATTEMPTS=2)
+    def test_failing_job_is_retried_then_given_placeholder_board(self):
+        game = generation_queue.create_game()
+
+        with mock.patch.object(JeopardyGame, '_generate_categories_and_questions', side_effect=RuntimeError('boom')), \
+                self.assertLogs('main.generation_queue', 'ERROR'):
+            self.assertEqual(generation_queue.run_pending(), 2)
+
+        job = GenerationJob.objects.get()
+        self.assertEqual((job.status, job.attempts, job.error), ('FAILED', 2, 'boom'))
+        game.refresh_from_db()
+        self.assertEqual(game.phase, 'PLAYING')
+        self.assertEqual(game.categories.first().title, 'Science')
+        self.assertEqual(metrics.get('generation.retries'), 1)
+
+    def test_stale_running_job_is_requeued(self):
+        generation_queue.create_game()
+        job = generation_queue.claim_next()
+        self.assertIsNone(generation_queue.claim_next())
+
+        GenerationJob.objects.filter(id=job.id).update(started_at=timezone.now() - timedelta(minutes=10))
+
+        self.assertEqual(generation_queue.requeue_stale(timeout=60), 1)
+        self.assertEqual(generation_queue.claim_next().attempts, 2)
+
+    def test_slow_worker_result_is_dropped_once_its_job_is_taken_over(self):
+        game = generation_queue.create_game()
+        slow = generation_queue.claim_next()
+        GenerationJob.objects.filter(id=slow.id).update(started_at=timezone.now() - timedelta(minutes=10))
+        generation_queue.requeue_stale(timeout=60)
+        current = generation_queue.claim_next()
+
+        with mock.patch('main.gemini_client.ask_gemini_json', return_value=make_board_payload()), \
+                self.assertLogs('main.generation_queue', 'WARNING'):
+            generation_queue.run_job(slow)
+        game.refresh_from_db()
+        self.assertEqual((game.phase, game.categories.count()), ('SETUP', 0))
+        self.assertEqual(GenerationJob.objects.get().status, 'RUNNING')
+
+        with mock.patch('main.gemini_client.ask_gemini_json', return_value=make_board_payload()):
+            generation_queue.run_job(current)
+        game.refresh_from_db()
+        self.assertEqual((game.phase, game.question_count, game.categories.count()), ('PLAYING', 30, 6))
+        self.assertEqual(GenerationJob.objects.get().status, 'DONE')
+        self.assertEqual(metrics.get('generation.lease_lost'), 1)
+
+
+@override_settings(GEMINI_GENERATION_MODE='per_category', GEMINI_CATEGORY_ATTEMPTS=2)
+class PerCategoryGenerationTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def _fake_category(self, fail_calls=()):
+        calls = []
+
+        async def ask(prompt, **kwargs):
+            calls.append(prompt)
+            if len(calls) in fail_calls:
+                raise ValueError('bad JSON')
+            return make_board_payload(1)['categories'][0] | {'title': f'Generated {len(calls)}'}
+
+        return ask, calls
+
+    def test_only_failed_slots_are_retried(self):
+        ask, calls = self._fake_category(fail_calls=(2, 5))
+
+        with mock.patch('main.gemini_client.ask_gemini_json_async', new=ask):
+            game_logic = JeopardyGame()
+            game = game_logic.create_new_game()
+
+        self.assertEqual(len(calls), 8)
+        self.assertFalse(game_logic.used_fallback)
+        self.assertEqual(game.categories.count(), 6)
+        self.assertEqual(metrics.get('gemini.category_retries'), 2)
+        self.assertIn('Do not use any of these category titles', calls[-1])
+
+    def test_persistently_failing_slot_is_backfilled(self):
+        ask, calls = self._fake_category(fail_calls=(1, 7))
+
+        with mock.patch('main.gemini_client.ask_gemini_json_async', new=ask):
+            game_logic = JeopardyGame()
+            game = game_logic.create_new_game()
+
+        titles = list(game.categories.values_list('title', flat=True))
+        self.assertEqual(titles[0], 'Science')
+        self.assertEqual(len(set(titles)), 6)
+        self.assertEqual(Question.objects.filter(category__game=game).count(), 30)
+        self.assertEqual(metrics.get('gemini.category_backfills'), 1)
+
+
+@override_settings(GEMINI_STRUCTURED_OUTPUT=True)
+class StructuredOutputTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def _response(self, payload, tokens=1200):
+        return mock.Mock(text=json.dumps(payload), usage_metadata=mock.Mock(total_token_count=tokens))
+
+    def test_schema_rejects_wrong_shape(self):
+        short = make_board_payload(5)
+        duplicate_value = make_board_payload(6)
+        duplicate_value['categories'][2]['questions'][4]['value'] = 800
+        blank_answer = make_board_payload(6)
+        blank_answer['categories'][0]['questions'][0]['answer'] = '  '
+
+        for payload in (short, duplicate_value, blank_answer):
+            with self.assertRaises(ValueError):
+                BoardSchema.model_validate(payload, context={'num_categories': 6})
+
+        board = BoardSchema.model_validate(make_board_payload(6), context={'num_categories': 6}).to_board()
+        self.assertEqual(board, make_board(make_board_payload(6)))
+
+    def test_board_generated_with_response_schema(self):
+        generate = mock.Mock(return_value=self._response(make_board_payload(6)))
+        with mock.patch.object(gemini_client.client.models, 'generate_content', generate):
+            game_logic = JeopardyGame()
+            game = game_logic.create_new_game()
+
+        config = generate.call_args.kwargs['config']
+        self.assertIs(config.response_schema, BoardSchema)
+        self.assertFalse(game_logic.used_fallback)
+        self.assertEqual(game.categories.first().title, 'Category 0')
+        self.assertEqual(gemini_client.get_stats()['structured']['tokens_per_success'], 1200)
+
+    @mock.patch('main.gemini_client.time.sleep')
+    def test_invalid_board_is_retried_then_rejected_before_writing(self, sleep):
+        generate = mock.Mock(return_value=self._response(make_board_payload(5), tokens=1000))
+        with mock.patch.object(gemini_client.client.models, 'generate_content', generate):
+            game_logic = JeopardyGame()
+            game = game_logic.create_new_game()
+
+        stats = gemini_client.get_stats()['structured']
+        self.assertEqual(generate.call_count, 3)
+        self.assertTrue(game_logic.used_fallback)
+        self.assertEqual(game.categories.first().title, 'Science')
+        self.assertEqual((stats['retries'], stats['failures'], stats['tokens']), (2, 1, 3000))
+        self.assertEqual(stats['retry_rate'], 0.667)
+
+
+class CategoryStreamParserTests(SimpleTestCase):
+
+    def test_categories_emitted_as_they_complete(self):
+        text = '```json\n' + json.dumps(make_board_payload(3)) + '\n```'
+        parser = CategoryStreamParser()
+
+        emitted = []
+        for ch in text:
+            emitted.append(len(parser.feed(ch)))
+
+        self.assertEqual(sum(emitted), 3)
+        self.assertTrue(parser.done)
+        # The first category is available long before the text ends
+        self.assertLess(emitted.index(1), len(text) // 2)
+
+    def test_braces_inside_strings_are_ignored(self):
+        payload = make_board_payload(1)
+        payload['categories'][0]['title'] = 'Curly {braces} and "quotes" }'
+        parser = CategoryStreamParser()
+
+        found = parser.feed(json.dumps(payload))
+
+        self.assertEqual(found[0]['title'], 'Curly {braces} and "quotes" }')
+
+
+class ExtractJsonTests(SimpleTestCase):
+
+    def test_malformed_response_corpus(self):
+        expected = json.loads((GEMINI_RESPONSES / 'expected.json').read_text())
+
+        for name, outcome in expected.items():
+            with self.subTest(name):
+                text = (GEMINI_RESPONSES / name).read_text()
+
+                if outcome.get('error'):
+                    with self.assertRaises(ValueError):
+                        extract_json(text)
+                    continue
+
+                data, report = extract_json(text)
+                self.assertEqual(report['complete'], outcome['complete'])
+                self.assertEqual(len(data['categories']), outcome['categories'])
+
+    def test_salvage_reports_malformed_categories(self):
+        text = (GEMINI_RESPONSES / 'malformed_then_truncated.txt').read_text()
+
+        _, report = extract_json(text)
+
+        self.assertEqual(report, {'complete': False, 'recovered_categories': 4, 'malformed_categories': 1})
+
+    def test_truncated_response_is_salvaged_into_a_board(self):
+        text = (GEMINI_RESPONSES / 'truncated_mid_category.txt').read_text()
+        response = mock.Mock(text=text)
+
+        with mock.patch.object(gemini_client.client.models, 'generate_content', return_value=response) as call:
+            data = gemini_client.ask_gemini_json('prompt')
+
+        call.assert_called_once()
+        board = JeopardyGame()._salvage_board(data, 6)
+        self.assertEqual([c['title'] for c in board][:4], ['Ocean Life', 'Word Play', 'Space Race', 'Kitchen Science'])
+        self.assertEqual(len(board), 6)
+
+
+class StreamingGenerationTests(TestCase):
+
+    def _stream(self, text, chunk_size=40, seen=None):
+        def stream_gemini(prompt):
+            for i in range(0, len(text), chunk_size):
+                if seen is not None:
+                    seen.append(Category.objects.count())
+                yield text[i:i + chunk_size]
+        return stream_gemini
+
+    def test_categories_are_saved_while_streaming(self):
+        seen = []
+        stream = self._stream(json.dumps(make_board_payload()), seen=seen)
+
+        with mock.patch('main.gemini_client.stream_gemini', new=stream):
+            game = JeopardyGame().create_new_game(stream=True)
+
+        self.assertEqual(game.phase, 'PLAYING')
+        self.assertEqual(game.question_count, 30)
+        # Categories were written before the stream finished
+        self.assertEqual(seen[0], 0)
+        self.assertGreater(seen[len(seen) // 2], 0)
+
+    def test_truncated_stream_is_backfilled(self):
+        text = json.dumps(make_board_payload())
+        stream = self._stream(text[:len(text) // 2])
+
+        with mock.patch('main.gemini_client.stream_gemini', new=stream):
+            game_logic = JeopardyGame()
+            game = game_logic.create_new_game(stream=True)
+
+        titles = list(game.categories.values_list('title', flat=True))
+        self.assertEqual(len(titles), 6)
+        self.assertEqual(titles[:2], ['Category 0', 'Category 1'])
+        self.assertFalse(game_logic.used_fallback)
+        self.assertEqual(game.question_count, 30)
+
+    def test_stream_abandoned_early_counts_as_success(self):
+        gemini_client.breaker.reset()
+        self.addCleanup(gemini_client.breaker.reset)
+        for _ in range(2):
+            gemini_client.breaker.record_failure()
+        text = json.dumps(make_board_payload()) + '\n\nTrailing prose the parser never reads.' * 20
+        fake = mock.Mock()
+        fake.models.generate_content_stream.return_value = [mock.Mock(text=text[i:i + 40]) for i in range(0, len(text), 40)]
+
+        with mock.patch.object(gemini_client, 'client', fake):
+            game = JeopardyGame().create_new_game(stream=True)
+
+        self.assertEqual(game.question_count, 30)
+        self.assertEqual(gemini_client.breaker.get_stats()['consecutive_failures'], 0)
+
+    def test_setup_game_is_never_complete(self):
+        game = Game.objects.create(phase='SETUP')
+
+        self.assertFalse(JeopardyGame(game.id).is_board_complete())
+
+
+class StreamedNewGameTests(TransactionTestCase):
+
+    @override_settings(GEMINI_STREAMING=True, GENERATION_QUEUE=False)
+    def test_new_game_redirects_before_board_is_ready(self):
+        release = threading.Event()
+
+        def stream_gemini(prompt):
+            yield json.dumps(make_board_payload())[:50]
+            release.wait(timeout=5)
+            yield json.dumps(make_board_payload())[50:]
+
+        with mock.patch('main.gemini_client.stream_gemini', new=stream_gemini):
+            response = self.client.get('/new-game/')
+            game = Game.objects.get()
+            self.assertRedirects(response, f'/game/{game.id}/')
+            self.assertEqual(game.phase, 'SETUP')
+
+            release.set()
+            for thread in threading.enumerate():
+                if thread.name == f'stream-game-{game.id}':
+                    thread.join(timeout=5)
+
+        state = self.client.get(f'/api/game/{game.id}/state/').json()
+        self.assertEqual(state['game_phase'], 'PLAYING')
+        self.assertEqual(len(state['board_state']), 6)
+
+
+class PubSubTests(SimpleTestCase):
+
+    def test_publish_from_another_thread_reaches_subscribers(self):
+        pubsub = InProcessPubSub(max_queue=1)
+
+        async def run():
+            queue = pubsub.subscribe('game.1')
+            other = pubsub.subscribe('game.2')
+            thread = threading.Thread(target=lambda: [pubsub.publish('game.1', {'n': n}) for n in range(2)])
+            thread.start()
+            message = await asyncio.wait_for(queue.get(), timeout=1)
+            thread.join()
+            await asyncio.sleep(0)
+            pubsub.unsubscribe('game.1', queue)
+            return message, other.empty(), pubsub.subscriber_count()
+
+        message, other_empty, remaining = asyncio.run(run())
+
+        self.assertEqual(message, {'n': 0})
+        self.assertTrue(other_empty)
+        self.assertEqual(remaining, 1)
+        self.assertEqual(pubsub.publish('game.1', {'n': 2}), 0)
+
+
+class LiveUpdatesTests(TransactionTestCase):
+
+    def _connect(self, path):
+        inbox = asyncio.Queue()
+        sent = asyncio.Queue()
+        inbox.put_nowait({'type': 'websocket.connect'})
+        app = asyncio.ensure_future(websocket_application({'type': 'websocket', 'path': path}, inbox.get, sent.put))
+        return app, inbox, sent
+
+    def test_answers_are_pushed_to_connected_clients(self):
+        game_logic = JeopardyGame()
+        game = game_logic._save_board(make_board(make_board_payload(1)))
+        question = Question.objects.order_by('value').first()
+
+        async def run():
+            app, inbox, sent = self._connect(f'/ws/game/{game.id}/')
+            accept = await asyncio.wait_for(sent.get(), timeout=5)
+            snapshot = json.loads((await asyncio.wait_for(sent.get(), timeout=5))['text'])
+
+            await sync_to_async(game_logic.answer_question)(question.id, True)
+            delta = json.loads((await asyncio.wait_for(sent.get(), timeout=5))['text'])
+
+            inbox.put_nowait({'type': 'websocket.disconnect'})
+            await asyncio.wait_for(app, timeout=5)
+            return accept, snapshot, delta
+
+        accept, snapshot, delta = asyncio.run(run())
+
+        self.assertEqual(accept['type'], 'websocket.accept')
+        self.assertEqual((snapshot['type'], snapshot['version'], snapshot['current_score']), ('snapshot', 0, 0))
+        self.assertEqual(delta, {
+            'game_id': game.id, 'type': 'answer', 'question_id': question.id, 'is_correct': True,
+            'score': 200, 'answered_count': 1, 'version': 1,
+        })
+
+    @override_settings(GENERATION_WORKERS=0)
+    def test_queued_board_reaches_connected_clients(self):
+        game = generation_queue.create_game()
+
+        async def run():
+            app, inbox, sent = self._connect(f'/ws/game/{game.id}/')
+            await asyncio.wait_for(sent.get(), timeout=5)
+            snapshot = json.loads((await asyncio.wait_for(sent.get(), timeout=5))['text'])
+
+            with mock.patch('main.gemini_client.ask_gemini_json', return_value=make_board_payload()):
+                await sync_to_async(generation_queue.run_pending)()
+            delta = json.loads((await asyncio.wait_for(sent.get(), timeout=5))['text'])
+
+            inbox.put_nowait({'type': 'websocket.disconnect'})
+            await asyncio.wait_for(app, timeout=5)
+            return snapshot, delta
+
+        snapshot, delta = asyncio.run(run())
+
+        self.assertEqual((snapshot['game_phase'], snapshot['board_state']), ('SETUP', {}))
+        # The only message for the whole board: the page must refetch state on it
+        self.assertEqual((delta['type'], delta['phase'], delta['version']), ('phase', 'PLAYING', snapshot['version'] + 1))
+        page = self.client.get(f'/game/{game.id}/').content.decode()
+        self.assertIn("message.type === 'phase'", page)
+        self.assertIn('resync();', page.split("message.type === 'phase'")[1].split('function ')[0])
+
+    def test_unknown_game_is_rejected(self):
+        async def run():
+            app, _, sent = self._connect('/ws/game/999999/')
+            await asyncio.wait_for(app, timeout=5)
+            return await sent.get()
+
+        self.assertEqual(asyncio.run(run()), {'type': 'websocket.close', 'code': 4404})
+
+
+@override_settings(QUESTION_BANK_CATEGORIES=0)
+class QuestionBankTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def _save(self, payload):
+        game_logic = JeopardyGame()
+        return game_logic._save_board(make_board(payload))
+
+    def test_identical_questions_are_stored_once(self):
+        self._save(make_board_payload(2))
+        payload = make_board_payload(2)
+        # Same content with different case/whitespace/punctuation still dedups
+        payload['categories'][0]['questions'][0]['question'] = '  q 0-200  '
+        self._save(payload)
+
+        self.assertEqual(BankQuestion.objects.count(), 10)
+        self.assertEqual(Question.objects.count(), 20)
+        self.assertEqual(question_bank.get_stats()['dedup_ratio'], 2.0)
+
+    def test_game_questions_read_text_from_bank(self):
+        game = self._save(make_board_payload(1))
+        question = Question.objects.filter(category__game=game, value=600).get()
+
+        response = self.client.get(f'/api/question/{question.id}/').json()
+
+        self.assertEqual(response['question_text'], 'Q 0-600?')
+        self.assertEqual(response['answer_text'], 'A 0-600')
+
+    def test_boards_are_topped_up_from_gemini(self):
+        self._save(make_board_payload(3))
+        banked_titles = {'Category 0', 'Category 1', 'Category 2'}
+
+        with override_settings(QUESTION_BANK_CATEGORIES=2), \
+                mock.patch('main.gemini_client.ask_gemini_json', return_value=make_board_payload()) as ask:
+            game = JeopardyGame().create_new_game()
+
+        prompt = ask.call_args[0][0]
+        self.assertIn('Generate 4 Jeopardy categories', prompt)
+        titles = list(game.categories.values_list('title', flat=True))
+        self.assertEqual(len(titles), 6)
+        self.assertTrue(set(titles[:2]) <= banked_titles)
+        self.assertIn(f'Do not use any of these category titles: {", ".join(titles[:2])}.', prompt)
+        self.assertEqual(metrics.get('question_bank.reused_categories'), 2)
+        # Gemini repeated the banked titles anyway: they are numbered, so no column is lost
+        self.assertEqual(len(set(titles)), 6)
+        self.assertEqual(len(JeopardyGame(game.id).get_board_state()), 6)
+
+    def test_placeholder_questions_are_never_reused(self):
+        game_logic = JeopardyGame()
+        game_logic._save_board(game_logic._dummy_board(6))
+
+        self.assertEqual(question_bank.assemble_categories(3), [])
@@ -1,8 +1,20 @@
 # main/views.py
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.db.models import F
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from .game_logic import JeopardyGame
-from .models import Game, Question
+from .models import ArchivedGame, Game, Question
+from .pubsub import publish_game_event
+from . import (archival, board_pool, gemini_client, generation_queue, instrumentation, llm_cache, question_bank,
+               websocket)
 
 
 def home(request):
@@ -10,10 +22,29 @@ def home(request):
     return render(request, "main/index.html", {"title": "Jeopardy Game"})
 
 
-def new_game(request):
-    """Create a new Jeopardy game"""
-    game_logic = JeopardyGame()
-    game = game_logic.create_new_game(num_categories=6)
+async def new_game(request):
+    """
+    Create a new Jeopardy game, using a pre-generated board when one is ready
+    and otherwise queueing its generation (GENERATION_QUEUE). Async so that,
+    under ASGI, waiting on Gemini doesn't occupy a worker thread.
+    """
+    board_pool.ensure_worker()
+    archival.ensure_worker()
+    generation_queue.ensure_workers()
+    
+    game = await sync_to_async(board_pool.claim_board)()
+    if game is None and generation_queue.enabled():
+        # Redirect straight away; a queue worker fills in the board while the page polls
+        game = await sync_to_async(generation_queue.create_game)(num_categories=6)
+    elif game is None:
+        game_logic = JeopardyGame()
+        # While the Gemini circuit is open, generation falls back instantly,
+        # so there is nothing to stream
+        if settings.GEMINI_STREAMING and not gemini_client.breaker.is_open:
+            # Redirect straight away; the board fills in as categories stream in
+            game = await sync_to_async(game_logic.start_streamed_game)(num_categories=6)
+        else:
+            game = await game_logic.acreate_new_game(num_categories=6)
     
     return redirect('game_board', game_id=game.id)
 
@@ -30,6 +61,7 @@ def game_board(request, game_id):
             'current_score': game_logic.get_score(),
             'game_phase': game.phase,
             'values_list': [200, 400, 600, 800, 1000],
+            'num_categories': 6,
         }
         
         return render(request, "main/main_page.html", context)
@@ -37,10 +69,40 @@ def game_board(request, game_id):
         return redirect('home')
 
 
+def _question_etag(request, question_id):
+    """Question payloads never change, so the bank entry's content hash identifies them"""
+    return (
+        Question.objects.filter(id=question_id)
+        .values_list('bank_question__content_hash', flat=True)
+        .first()
+    )
+
+
+def _game_state_etag(request, game_id):
+    """Board state only changes when Game.version is bumped"""
+    version = Game.objects.filter(id=game_id).values_list('version', flat=True).first()
+    return None if version is None else f"{game_id}.{version}"
+
+
+def _cache_control_if_found(**kwargs):
+    """Like cache_control, but leaves error responses (e.g. a 404) out of shared caches"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **view_kwargs):
+            response = view(request, *args, **view_kwargs)
+            if response.status_code in (200, 304):
+                patch_cache_control(response, **kwargs)
+            return response
+        return wrapper
+    return decorator
+
+
+@_cache_control_if_found(public=True, max_age=getattr(settings, 'QUESTION_CACHE_MAX_AGE', 86400))
+@condition(etag_func=_question_etag)
 def get_question(request, question_id):
     """Get question details (AJAX)"""
     try:
-        question = Question.objects.get(id=question_id)
+        question = Question.objects.select_related('category', 'bank_question').get(id=question_id)
         return JsonResponse({
             'id': question.id,
             'value': question.value,
@@ -55,21 +117,22 @@ def get_question(request, question_id):
 def submit_answer(request, game_id, question_id):
     """Handle answer submission"""
     if request.method == "POST":
-        import json
         data = json.loads(request.body)
         
         is_correct = data.get('is_correct', False)
         
-        game_logic = JeopardyGame(game_id)
-        new_score = game_logic.answer_question(question_id, is_correct)
+        try:
+            game_logic = JeopardyGame(game_id)
+        except Game.DoesNotExist:
+            return JsonResponse({'error': 'Game not found'}, status=404)
         
-        # Check if game is complete
-        is_complete = game_logic.is_board_complete()
+        try:
+            new_score = game_logic.answer_question(question_id, is_correct)
+        except Question.DoesNotExist:
+            return JsonResponse({'error': 'Question not found'}, status=404)
         
-        if is_complete:
-            game = game_logic.game
-            game.phase = 'COMPLETE'
-            game.save()
+        # Check if game is complete
+        is_complete = _complete_if_finished(game_logic)
         
         response_data = {
             'success': True,
@@ -85,21 +148,137 @@ def submit_answer(request, game_id, question_id):
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 
+def _complete_if_finished(game_logic: JeopardyGame) -> bool:
+    """Move a fully answered game to COMPLETE (once) and report whether it is complete"""
+    if not game_logic.is_board_complete():
+        return False
+    
+    game = game_logic.game
+    if Game.objects.filter(id=game.id).exclude(phase='COMPLETE').update(phase='COMPLETE', version=F('version') + 1):
+        game.refresh_from_db(fields=['phase', 'version'])
+        publish_game_event(game.id, {'type': 'phase', 'phase': game.phase, 'version': game.version})
+    return True
+
+
+def _parse_answer_batch(body: bytes) -> list:
+    """Validate a batch answers payload; raises ValueError with a message for the client"""
+    try:
+        answers = json.loads(body).get('answers')
+    except (ValueError, AttributeError):
+        raise ValueError('Body must be a JSON object with an "answers" list')
+    
+    max_batch = getattr(settings, 'ANSWER_BATCH_MAX', 100)
+    if not isinstance(answers, list) or not 0 < len(answers) <= max_batch:
+        raise ValueError(f'"answers" must be a list of 1 to {max_batch} answers')
+    
+    for answer in answers:
+        if not (
+            isinstance(answer, dict)
+            and isinstance(answer.get('key'), str) and 0 < len(answer['key']) <= 64
+            and type(answer.get('question_id')) is int
+            and isinstance(answer.get('is_correct'), bool)
+        ):
+            raise ValueError('Each answer needs a "key" (1-64 characters), an integer "question_id" '
+                             'and a boolean "is_correct"')
+    return answers
+
+
+def submit_answers(request, game_id):
+    """
+    Apply a batch of answers, each with a client-generated idempotency key,
+    in one transaction (see JeopardyGame.apply_answers). Retrying a batch is
+    safe. Returns the per-answer results and the resulting game state, so
+    queued or offline clients can sync in one round trip.
+    """
+    if request.method != "POST":
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    
+    try:
+        answers = _parse_answer_batch(request.body)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    try:
+        game_logic = JeopardyGame(game_id)
+    except Game.DoesNotExist:
+        return JsonResponse({'error': 'Game not found'}, status=404)
+    
+    results = game_logic.apply_answers(answers)
+    is_complete = _complete_if_finished(game_logic)
+    
+    response_data = {
+        'success': True,
+        'results': results,
+        **game_logic.get_state(),
+        'game_complete': is_complete,
+    }
+    if is_complete:
+        response_data['final_stats'] = game_logic.get_final_stats()
+    
+    return JsonResponse(response_data)
+
+
+@cache_control(private=True, no_cache=True)  # Always revalidate; unchanged boards get a 304
+@condition(etag_func=_game_state_etag)
 def get_game_state_api(request, game_id):
     """API endpoint to get current game state"""
     try:
-        game_logic = JeopardyGame(game_id)
-        
-        return JsonResponse({
-            'board_state': game_logic.get_board_state(),
-            'current_score': game_logic.get_score(),
-            'game_phase': game_logic.game.phase,
-            'board_complete': game_logic.is_board_complete(),
-        })
+        return JsonResponse(JeopardyGame(game_id).get_state())
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
 
+def board_pool_stats_api(request):
+    """API endpoint exposing board pool depth, refill rate and hit/miss counts"""
+    return JsonResponse(board_pool.get_stats())
+
+
+def generation_queue_stats_api(request):
+    """API endpoint exposing generation queue depth and wait/run latency"""
+    return JsonResponse(generation_queue.get_stats())
+
+
+def question_bank_stats_api(request):
+    """API endpoint exposing question bank size and dedup ratio"""
+    return JsonResponse(question_bank.get_stats())
+
+
+def gemini_stats_api(request):
+    """API endpoint exposing Gemini retry rate and tokens per generated board"""
+    return JsonResponse(gemini_client.get_stats())
+
+
+def health_api(request):
+    """
+    Health check: Gemini circuit breaker state and board pool depth.
+    'degraded' means new boards are coming from the pool or fallback questions.
+    """
+    breaker = gemini_client.breaker.get_stats()
+    return JsonResponse({
+        'status': 'ok' if breaker['state'] == 'closed' else 'degraded',
+        'gemini': breaker,
+        'board_pool': {
+            'depth': board_pool.pool_depth(),
+            'target_depth': board_pool.target_depth(),
+        },
+    })
+
+
+def live_stats_api(request):
+    """API endpoint exposing WebSocket connections held by this worker"""
+    return JsonResponse(websocket.get_stats())
+
+
+def gemini_cache_stats_api(request):
+    """API endpoint exposing Gemini response cache hit ratio and size"""
+    return JsonResponse(llm_cache.get_stats())
+
+
+def prometheus_metrics(request):
+    """Request timing, DB, Gemini and operational counters for Prometheus to scrape"""
+    return HttpResponse(instrumentation.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def game_complete(request, game_id):
     """Show final results"""
     try:
@@ -113,4 +292,15 @@ def game_complete(request, game_id):
         
         return render(request, "main/game_complete.html", context)
     except Game.DoesNotExist:
+        pass
+    
+    # Completed games are compacted into a summary after a while
+    archived = ArchivedGame.objects.filter(game_id=game_id).first()
+    if archived is None:
         return redirect('home')
+    
+    context = {
+        'game_id': game_id,
+        'final_stats': archived.get_final_stats(),
+    }
+    return render(request, "main/game_complete.html", context)
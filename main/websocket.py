@@ -0,0 +1,98 @@
+"""
+ASGI WebSocket endpoint pushing live game updates
+
+    ws://<host>/ws/game/<game_id>/
+
+On connect the client gets a 'snapshot' (the same payload as the state
+API), then one message per change: 'answer', 'category' (streamed board
+generation) and 'phase'. Every message carries the game's version; a
+client that sees a gap should refetch the state.
+"""
+
+import asyncio
+import json
+import logging
+import re
+
+from asgiref.sync import sync_to_async
+
+from . import metrics
+from .pubsub import game_channel, get_pubsub
+
+logger = logging.getLogger(__name__)
+
+_PATH = re.compile(r'^/ws/game/(\d+)/$')
+
+_open_connections = 0
+
+
+def _snapshot(game_id: int):
+    from .game_logic import JeopardyGame
+    from .models import Game
+
+    try:
+        return {'type': 'snapshot', 'game_id': game_id, **JeopardyGame(game_id).get_state()}
+    except Game.DoesNotExist:
+        return None
+
+
+async def websocket_application(scope, receive, send):
+    """Route a 'websocket' ASGI scope; see mysite/asgi.py"""
+    global _open_connections
+
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+
+    match = _PATH.match(scope['path'])
+    if not match:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    game_id = int(match.group(1))
+
+    # Subscribe before taking the snapshot so no update can fall in between;
+    # anything already in the snapshot arrives with a version the client has
+    pubsub = get_pubsub()
+    channel = game_channel(game_id)
+    queue = pubsub.subscribe(channel)
+    forward = None
+    try:
+        snapshot = await sync_to_async(_snapshot)(game_id)
+        if snapshot is None:
+            await send({'type': 'websocket.close', 'code': 4404})
+            return
+
+        await send({'type': 'websocket.accept'})
+        _open_connections += 1
+        metrics.incr('live.connections')
+        try:
+            await send({'type': 'websocket.send', 'text': json.dumps(snapshot)})
+            forward = asyncio.ensure_future(_forward(queue, send))
+
+            # Clients only listen; wait for them to go away
+            while (await receive())['type'] != 'websocket.disconnect':
+                pass
+        finally:
+            _open_connections -= 1
+    finally:
+        if forward is not None:
+            forward.cancel()
+        pubsub.unsubscribe(channel, queue)
+
+
+async def _forward(queue: asyncio.Queue, send):
+    while True:
+        message = await queue.get()
+        await send({'type': 'websocket.send', 'text': json.dumps(message)})
+
+
+def get_stats() -> dict:
+    """Connections held by this worker process and message fan-out counts"""
+    return {
+        'open_connections': _open_connections,
+        'subscribers': get_pubsub().subscriber_count(),
+        'connections_total': metrics.get('live.connections'),
+        'published': metrics.get('live.published'),
+        'delivered': metrics.get('live.delivered'),
+        'dropped': metrics.get('live.dropped'),
+    }
@@ -29,6 +29,85 @@ SECRET_KEY = 'django-insecure-$6@g^(jkxi9*ycf74!7z-i%e^xbec_-gb%p&d09!mr@_%w0)yx
 
 # Gemini / Google GenAI settings
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
+# Where Gemini calls go (main/gemini_backends.py): 'live' API, 'record' (live,
+# saving responses to GEMINI_RECORDINGS_DIR), 'replay' (recorded responses,
+# fake ones for unrecorded prompts) or 'fake' (instant synthesized boards).
+# 'fake' and 'replay' are for benchmarks and CI only: their boards are
+# placeholder text. Without an API key, 'live' serves the built-in fallback
+# board straight away.
+GEMINI_BACKEND = os.environ.get('GEMINI_BACKEND', 'live')
+GEMINI_RECORDINGS_DIR = Path(os.environ.get('GEMINI_RECORDINGS_DIR', BASE_DIR / 'gemini_recordings'))
+GEMINI_FAKE_LATENCY = float(os.environ.get('GEMINI_FAKE_LATENCY', '0'))  # seconds per fake call
+GEMINI_TIMEOUT = float(os.environ.get('GEMINI_TIMEOUT', '30'))  # seconds per call
+GEMINI_MAX_CONCURRENCY = int(os.environ.get('GEMINI_MAX_CONCURRENCY', '4'))  # per process
+# 'board' asks for the whole board in one request; 'per_category' fans out one
+# request per category and only retries/backfills the slots that fail
+GEMINI_GENERATION_MODE = os.environ.get('GEMINI_GENERATION_MODE', 'board')
+GEMINI_CATEGORY_ATTEMPTS = int(os.environ.get('GEMINI_CATEGORY_ATTEMPTS', '2'))
+# Stream new boards so the first categories show up before generation finishes
+GEMINI_STREAMING = os.environ.get('GEMINI_STREAMING', '') == '1'
+# Pass a response schema (main/schemas.py) so Gemini returns typed boards
+# instead of free-form JSON that has to be extracted and salvaged
+GEMINI_STRUCTURED_OUTPUT = os.environ.get('GEMINI_STRUCTURED_OUTPUT', '') == '1'
+# Circuit breaker: after this many consecutive API failures/timeouts, Gemini
+# calls fail fast (fallback/pooled boards) until a probe succeeds
+GEMINI_BREAKER_FAILURES = int(os.environ.get('GEMINI_BREAKER_FAILURES', '3'))
+GEMINI_BREAKER_RESET = float(os.environ.get('GEMINI_BREAKER_RESET', '30'))  # seconds before a probe
+# Response cache keyed on model + normalized prompt: an in-process LRU tier
+# (bounded in bytes) in front of the 'gemini' cache below. Call sites that
+# need a fresh answer every time pass cache=False.
+GEMINI_CACHE_ENABLED = os.environ.get('GEMINI_CACHE_ENABLED', '1') == '1'
+GEMINI_CACHE_TTL = int(os.environ.get('GEMINI_CACHE_TTL', '86400'))  # seconds
+GEMINI_CACHE_MEMORY_BYTES = int(os.environ.get('GEMINI_CACHE_MEMORY_BYTES', str(16 * 1024 * 1024)))
+GEMINI_CACHE_ALIAS = 'gemini'
+
+# Question bank: how many categories of each new board may be reused from
+# previously generated questions (Gemini only generates the rest)
+QUESTION_BANK_CATEGORIES = int(os.environ.get('QUESTION_BANK_CATEGORIES', '2'))
+
+# Question payloads are immutable, so clients and proxies may cache them
+QUESTION_CACHE_MAX_AGE = int(os.environ.get('QUESTION_CACHE_MAX_AGE', '86400'))  # seconds
+
+# Most answers accepted in one POST to /api/game/<id>/answers/
+ANSWER_BATCH_MAX = int(os.environ.get('ANSWER_BATCH_MAX', '100'))
+
+# Live game updates pushed over WebSocket (mysite/asgi.py). The default
+# backend only reaches clients connected to the same process; point this at a
+# class with the same interface (e.g. backed by Redis pub/sub) to fan out
+# across workers.
+LIVE_UPDATES_BACKEND = os.environ.get('LIVE_UPDATES_BACKEND', 'main.pubsub.InProcessPubSub')
+LIVE_UPDATES_QUEUE_SIZE = int(os.environ.get('LIVE_UPDATES_QUEUE_SIZE', '100'))  # per connection
+
+# Board pool: pre-generated boards kept ready so /new-game/ doesn't wait on Gemini
+BOARD_POOL_DEPTH = int(os.environ.get('BOARD_POOL_DEPTH', '5'))
+BOARD_POOL_REFILL_INTERVAL = int(os.environ.get('BOARD_POOL_REFILL_INTERVAL', '30'))  # seconds
+BOARD_POOL_WORKER = os.environ.get('BOARD_POOL_WORKER', '') == '1'
+
+# Board generation queue (main/generation_queue.py): /new-game/ returns a SETUP
+# game straight away and a worker fills in the board. Each process runs
+# GENERATION_WORKERS worker threads; 0 leaves the queue to
+# `manage.py process_generation_jobs`.
+GENERATION_QUEUE = os.environ.get('GENERATION_QUEUE', '1') == '1'
+GENERATION_WORKERS = int(os.environ.get('GENERATION_WORKERS', '2'))
+GENERATION_JOB_ATTEMPTS = int(os.environ.get('GENERATION_JOB_ATTEMPTS', '3'))
+GENERATION_JOB_TIMEOUT = int(os.environ.get('GENERATION_JOB_TIMEOUT', '300'))  # seconds before a RUNNING job is requeued
+GENERATION_POLL_INTERVAL = float(os.environ.get('GENERATION_POLL_INTERVAL', '2'))  # seconds between idle queue checks
+
+# Game archival (main/archival.py, `manage.py compact_games`): completed games
+# are collapsed into ArchivedGame summaries, abandoned ones deleted
+GAME_ARCHIVE_AFTER = int(os.environ.get('GAME_ARCHIVE_AFTER', '3600'))  # seconds after completion
+GAME_STALE_TTL = int(os.environ.get('GAME_STALE_TTL', str(7 * 24 * 3600)))  # seconds since last activity
+GAME_ARCHIVE_BATCH_SIZE = int(os.environ.get('GAME_ARCHIVE_BATCH_SIZE', '100'))  # games per delete transaction
+GAME_ARCHIVE_PAUSE = float(os.environ.get('GAME_ARCHIVE_PAUSE', '0.05'))  # seconds between batches
+GAME_ARCHIVE_INTERVAL = int(os.environ.get('GAME_ARCHIVE_INTERVAL', '3600'))  # seconds between worker runs
+GAME_ARCHIVE_WORKER = os.environ.get('GAME_ARCHIVE_WORKER', '') == '1'
+
+# Per-request wall time, DB queries and Gemini time (main/instrumentation.py),
+# served in Prometheus format at /metrics. Requests slower than
+# SLOW_REQUEST_MS are logged to 'main.slow_requests' with their slowest SQL;
+# 0 turns the log off.
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '1') == '1'
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', '0'))
 
 # This is where Django will look for assets like images and audios.
 STATIC_URL = "static/"
@@ -52,6 +131,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,14 +165,58 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Seconds a connection is kept for reuse across requests
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '20000'))  # writers queue this long for the lock
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)))
+
+# SQLite, tuned for concurrent answer writes: WAL so readers never block the
+# writer, IMMEDIATE transactions so writers queue on busy_timeout instead of
+# failing a lock upgrade with "database is locked", synchronous=NORMAL and a
+# memory map
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};'
+                f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};'
+            ),
+        },
+        # File-backed test DB: the in-memory default uses shared-cache
+        # table locks, which multi-threaded tests can't run against
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Persistent tier of the Gemini response cache
+    'gemini': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'gemini_cache',
+        'TIMEOUT': GEMINI_CACHE_TTL,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('GEMINI_CACHE_MAX_ENTRIES', '5000')),
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -11,4 +11,13 @@ urlpatterns = [
     path("api/game/<int:game_id>/state/", views.get_game_state_api, name="get_game_state"),
     path("api/question/<int:question_id>/", views.get_question, name="get_question"),
     path("api/game/<int:game_id>/answer/<int:question_id>/", views.submit_answer, name="submit_answer"),
+    path("api/game/<int:game_id>/answers/", views.submit_answers, name="submit_answers"),
+    path("api/pool/stats/", views.board_pool_stats_api, name="board_pool_stats"),
+    path("api/generation/stats/", views.generation_queue_stats_api, name="generation_queue_stats"),
+    path("api/question-bank/stats/", views.question_bank_stats_api, name="question_bank_stats"),
+    path("api/live/stats/", views.live_stats_api, name="live_stats"),
+    path("api/health/", views.health_api, name="health"),
+    path("api/gemini/stats/", views.gemini_stats_api, name="gemini_stats"),
+    path("api/gemini/cache/stats/", views.gemini_cache_stats_api, name="gemini_cache_stats"),
+    path("metrics", views.prometheus_metrics, name="metrics"),
 ]
\ No newline at end of file